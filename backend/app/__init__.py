@@ -73,11 +73,11 @@ def validate_environment():
         'AWS_REGION',
         'AWS_S3_BUCKET_NAME',
         'NVIDIA_NIM_API_KEY',
-        'PINECONE_API_KEY',
-        'PINECONE_ENVIRONMENT',
         'SUPABASE_URL',
         'SUPABASE_SERVICE_ROLE_KEY'
     ]
+    if os.getenv('VECTOR_STORE', 'pinecone').lower() != 'local':
+        required_vars += ['PINECONE_API_KEY', 'PINECONE_ENVIRONMENT']
     
     missing_vars = []
     for var in required_vars:
@@ -114,10 +114,13 @@ async def lifespan(app: FastAPI):
             settings.pinecone_environment,
             settings.pinecone_index_name,
         )
+        # Build shared services once; the Pinecone index probes run here, not per request
+        from app.services.registry import registry
+        status = await asyncio.to_thread(registry.startup)
+        logger.info("Service registry initialized: %s", status)
         # Log expected embedding dimension
         try:
-            from app.services.nim_service import NIMService
-            dim = NIMService().get_embedding_dimension()
+            dim = registry.nim.get_embedding_dimension()
             logger.info("Embedding dimension: %d", dim)
         except Exception as e:
             logger.warning("Unable to determine embedding dimension at startup: %s", e)
@@ -125,6 +128,11 @@ async def lifespan(app: FastAPI):
         logger.warning("Startup logging error: %s", e)
     yield
     logger.info("Application shutting down...")
+    try:
+        from app.services.registry import registry
+        await registry.shutdown()
+    except Exception as e:
+        logger.warning("Error shutting down service registry: %s", e)
 
 if FASTAPI_AVAILABLE:
     app = FastAPI(
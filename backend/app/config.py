@@ -17,9 +17,13 @@ class Settings(BaseSettings):
 	nvidia_nim_api_key: str = Field(..., env="NVIDIA_NIM_API_KEY")
 	nvidia_nim_base_url: str = Field("https://integrate.api.nvidia.com/v1", env="NVIDIA_NIM_BASE_URL")
 
+	# Vector store: "pinecone", or "local" for the on-disk store (no Pinecone credentials needed)
+	vector_store: str = Field("pinecone", env="VECTOR_STORE")
+	local_vector_dir: str = Field("./data/vectors", env="LOCAL_VECTOR_DIR")
+
 	# Pinecone
-	pinecone_api_key: str = Field(..., env="PINECONE_API_KEY")
-	pinecone_environment: str = Field(..., env="PINECONE_ENVIRONMENT")
+	pinecone_api_key: Optional[str] = Field(None, env="PINECONE_API_KEY")
+	pinecone_environment: Optional[str] = Field(None, env="PINECONE_ENVIRONMENT")
 	pinecone_index_name: str = Field("neurospace-embeddings", env="PINECONE_INDEX_NAME")
 
 	# Supabase
@@ -40,6 +44,11 @@ class Settings(BaseSettings):
 
 	# File uploads
 	max_file_size_mb: int = Field(25, env="MAX_FILE_SIZE_MB")
+	# Safety valve for streamed ingestion (text is chunked incrementally, not held in memory)
+	max_chunks_per_file: int = Field(20000, env="MAX_CHUNKS_PER_FILE")
+	# Chunk sizing in (approximate) embedding-model tokens; overlap is whole sentences within this budget
+	chunk_max_tokens: int = Field(350, env="CHUNK_MAX_TOKENS")
+	chunk_overlap_tokens: int = Field(32, env="CHUNK_OVERLAP_TOKENS")
 
 	model_config = {
 		"env_file": str(ENV_PATH),
@@ -1,5 +1,6 @@
 from fastapi import Header, HTTPException, Request
 import os
+import hmac
 import time
 import requests
 from typing import Optional, Dict, Any
@@ -15,6 +16,18 @@ def require_backend_key(x_backend_key: str = Header(None)):
 		raise HTTPException(status_code=401, detail="Unauthorized")
 	return True
 
+def require_operator_key(x_operator_key: str = Header(None)):
+	"""
+	Guard for operational endpoints (index revalidation). Unlike the backend key, which the
+	frontend holds, OPERATOR_API_KEY is kept by operators; without it these endpoints are off.
+	"""
+	expected = os.getenv("OPERATOR_API_KEY")
+	if not expected:
+		raise HTTPException(status_code=403, detail="Operator endpoints are disabled")
+	if not x_operator_key or not hmac.compare_digest(x_operator_key, expected):
+		raise HTTPException(status_code=401, detail="Unauthorized")
+	return True
+
 _JWKS_CACHE: Dict[str, Any] = {"keys": None, "fetched_at": 0}
 
 def _get_jwks_url() -> Optional[str]:
@@ -21,6 +21,31 @@ class FileProcessingResponse(BaseModel):
     message: str
     file_key: str
 
+class BulkFileItem(BaseModel):
+    file_key: str
+    file_name: str
+    file_size: int = 0
+    content_type: str
+
+class BulkProcessingRequest(BaseModel):
+    user_id: str
+    files: List[BulkFileItem]
+
+class BulkJob(BaseModel):
+    file_key: str
+    job_id: Optional[str] = None
+    status: str
+    message: Optional[str] = None
+
+class BulkProcessingResponse(BaseModel):
+    group_id: str
+    total: int
+    queued: int
+    jobs: List[BulkJob]
+
+class JobStatusBatchRequest(BaseModel):
+    job_ids: List[str]
+
 class TextChunk(BaseModel):
     id: str
     text: str
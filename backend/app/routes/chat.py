@@ -1,8 +1,8 @@
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
-from app.services.nim_service import NIMService
-from app.services.pinecone_service import PineconeService
+from app.services.registry import get_nim_service, get_pinecone_service
+from app.services.search_executor import SearchBusyError
 from app.deps import require_backend_key, get_verified_user
 import time
 import logging
@@ -24,14 +24,6 @@ class ChatResponse(BaseModel):
     response: str
     sources: List[str] = []
 
-def get_nim_service():
-    return NIMService()
-
-def get_pinecone_service():
-    nim_service = NIMService()
-    embedding_dimension = nim_service.get_embedding_dimension()
-    return PineconeService(embedding_dimension=embedding_dimension)
-
 @router.post("/chat", response_model=ChatResponse)
 async def chat_with_sources(payload: ChatRequest, current_user: str = Depends(get_verified_user)):
     """
@@ -44,7 +36,7 @@ async def chat_with_sources(payload: ChatRequest, current_user: str = Depends(ge
     if not payload.message or not payload.message.strip():
         raise HTTPException(status_code=400, detail="Message cannot be empty")
     
-    # Initialize services
+    # Shared service instances from the process registry
     nim_service = get_nim_service()
     pinecone_service = get_pinecone_service()
     
@@ -65,10 +57,11 @@ async def chat_with_sources(payload: ChatRequest, current_user: str = Depends(ge
                 "file_key": {"$in": payload.sources}
             }
             
-            matches = pinecone_service.search_similar(
+            matches = await pinecone_service.search_similar_async(
                 embedding, 
                 top_k=5, 
-                filter_dict=filter_dict
+                filter_dict=filter_dict,
+                user_id=current_user
             )
             
             # 3) Build context from matches
@@ -119,6 +112,9 @@ async def chat_with_sources(payload: ChatRequest, current_user: str = Depends(ge
             sources=source_files
         )
         
+    except SearchBusyError as e:
+        logger.warning(f"Chat: vector search busy: {e}")
+        raise HTTPException(status_code=503, detail="Search is busy. Please try again shortly.")
     except Exception as e:
         logger.error(f"Chat error: {e}")
         raise HTTPException(status_code=500, detail=f"Chat failed: {str(e)}")
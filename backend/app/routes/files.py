@@ -3,13 +3,12 @@ from typing import List
 import os
 from app.models.file import FileUploadRequest
 from app.deps import get_verified_user
-from app.services.supabase_service import SupabaseService
-from app.services.s3_service import S3Service
+from app.services.registry import get_s3_service, get_supabase_service
 import uuid
 
 router = APIRouter()
-supabase_service = SupabaseService()
-s3_service = S3Service()
+supabase_service = get_supabase_service()
+s3_service = get_s3_service()
 
 @router.post("/upload")
 async def upload_file(
@@ -1,35 +1,24 @@
 from fastapi import APIRouter, HTTPException, Depends
-from app.models.file import FileProcessingRequest, FileProcessingResponse
-from app.services.s3_service import S3Service
+from fastapi.responses import StreamingResponse
+from app.models.file import FileProcessingRequest, FileProcessingResponse, BulkProcessingRequest, BulkProcessingResponse, BulkJob, JobStatusBatchRequest
 from app.services.text_extractor import TextExtractor
-from app.services.nim_service import NIMService
-from app.services.pinecone_service import PineconeService
-from app.services.supabase_service import SupabaseService
-from app.tasks.processing_tasks import process_file_task
+from app.services.registry import get_s3_service, get_nim_service, get_pinecone_service, get_supabase_service
+from app.services.ingest_checkpoint import job_progress
+from app.services.ingest_groups import create_group, get_group_progress
+from app.services.job_events import get_job_states, publish_job_event, publish_job_events, stream_job_states
+from app.tasks.ingest_stages import classify_ingest, enqueue_ingest
+from redis.exceptions import RedisError
 import uuid
 import os
 import re
+import json
 from datetime import datetime
+from typing import Any, Dict, List
 from app.deps import get_verified_user, require_backend_key
 from app.config import settings
 
 router = APIRouter(dependencies=[Depends(require_backend_key)])
 
-# Use lazy initialization for services to avoid OpenAI client issues at startup
-def get_s3_service():
-    return S3Service()
-
-def get_nim_service():
-    return NIMService()
-
-def get_pinecone_service():
-    nim_service = NIMService()
-    embedding_dimension = nim_service.get_embedding_dimension()
-    return PineconeService(embedding_dimension=embedding_dimension)
-
-def get_supabase_service():
-    return SupabaseService()
-
 # Security: Validate file key format
 def validate_file_key(file_key: str, user_id: str) -> bool:
     """Validate file key to prevent path traversal attacks"""
@@ -95,19 +84,19 @@ async def process_file(request: FileProcessingRequest, current_user: str = Depen
 
     # Update job to queued and enqueue task
     await supabase_service.update_job_status(job_id, 'queued')
+    # Live state for the SSE endpoint; published before enqueuing so it cannot overwrite a worker's update
+    await publish_job_event(job_id, status='queued', user_id=request.user_id)
 
-    task = process_file_task.apply_async(kwargs={
-        'payload': {
-            'file_key': request.file_key,
-            'file_name': request.file_name,
-            'user_id': request.user_id,
-            'content_type': request.content_type,
-            'job_id': job_id,
-        }
-    })
-
-    # Mark job as processing immediately after enqueuing
-    await supabase_service.update_job_status(job_id, 'processing')
+    # Single uploads go to the interactive lane (small files on the fast path) so they do not wait behind imports
+    await enqueue_ingest([{
+        'file_key': request.file_key,
+        'file_name': request.file_name,
+        'user_id': request.user_id,
+        'content_type': request.content_type,
+        'file_size': request.file_size,
+        'job_id': job_id,
+    }], lane=classify_ingest(request.file_size))
+    # The worker marks the job processing when it starts; the job may still wait in a fair-scheduling queue
 
     return FileProcessingResponse(
         job_id=job_id,
@@ -294,6 +283,202 @@ async def process_file(request: FileProcessingRequest, current_user: str = Depen
         else:
             raise HTTPException(status_code=500, detail="Internal server error")
 
+@router.post("/process/bulk", response_model=BulkProcessingResponse)
+async def process_files_bulk(request: BulkProcessingRequest, current_user: str = Depends(get_verified_user)):
+    """
+    Enqueue processing for many uploaded files as one group. File and job records are
+    read and written in batches, so a large import costs a handful of database calls
+    instead of several per file.
+    """
+    if request.user_id != current_user:
+        raise HTTPException(status_code=403, detail="Not authorized to process this user's files")
+    max_files = int(os.getenv('BULK_INGEST_MAX_FILES', '1000'))
+    if not request.files:
+        raise HTTPException(status_code=400, detail="No files to process")
+    if len(request.files) > max_files:
+        raise HTTPException(status_code=400, detail=f"Too many files; at most {max_files} per request")
+
+    # One result per distinct file key, in request order
+    results: Dict[str, BulkJob] = {}
+    items = {}
+    for item in request.files:
+        if item.file_key in results:
+            continue
+        if validate_file_key(item.file_key, request.user_id):
+            results[item.file_key] = BulkJob(file_key=item.file_key, status='pending')
+            items[item.file_key] = item
+        else:
+            results[item.file_key] = BulkJob(file_key=item.file_key, status='rejected', message='Invalid file key')
+
+    supabase_service = get_supabase_service()
+
+    # Ensure file records exist: one lookup and one insert for the whole batch
+    files = await supabase_service.get_files_by_keys(list(items), request.user_id)
+    created = await supabase_service.create_file_records([{
+        'file_key': item.file_key,
+        'file_name': item.file_name,
+        'user_id': request.user_id,
+        'file_size': item.file_size or 0,
+        'content_type': item.content_type,
+        'status': 'uploaded',
+    } for key, item in items.items() if key not in files])
+    for row in created:
+        files[row['file_key']] = row
+
+    to_process: Dict[str, Dict] = {}
+    for key in items:
+        row = files.get(key)
+        if row is None:
+            results[key] = BulkJob(file_key=key, status='error', message='Failed to ensure file record')
+        elif row.get('status') == 'processed':
+            results[key] = BulkJob(file_key=key, status='already_processed')
+        else:
+            to_process[key] = row
+
+    # Idempotency: reuse each file's latest job, create the missing ones in one insert
+    file_ids = [row['id'] for row in to_process.values()]
+    latest_jobs = await supabase_service.get_latest_jobs_by_files(file_ids, request.user_id)
+    new_jobs = await supabase_service.create_processing_jobs(
+        [file_id for file_id in file_ids if file_id not in latest_jobs], request.user_id, status='queued'
+    )
+    reused_job_ids = [job['id'] for job in latest_jobs.values()]
+    if reused_job_ids:
+        await supabase_service.update_jobs_status(reused_job_ids, 'queued')
+
+    group_id = str(uuid.uuid4())
+    payloads: List[Dict] = []
+    for key, row in to_process.items():
+        job_id = latest_jobs[row['id']]['id'] if row['id'] in latest_jobs else new_jobs.get(row['id'])
+        if not job_id:
+            results[key] = BulkJob(file_key=key, status='error', message='Failed to create job')
+            continue
+        item = items[key]
+        payloads.append({
+            'file_key': key,
+            'file_name': item.file_name,
+            'user_id': request.user_id,
+            'content_type': item.content_type,
+            'file_size': item.file_size,
+            'job_id': job_id,
+            'group_id': group_id,
+        })
+        results[key] = BulkJob(file_key=key, job_id=job_id, status='queued')
+
+    if payloads:
+        try:
+            await create_group(group_id, request.user_id, [payload['job_id'] for payload in payloads])
+        except RedisError as e:
+            # Files are still processed; only the aggregated group progress is unavailable
+            print(f"Could not record ingest group {group_id}: {e}")
+        await publish_job_events([{'job_id': payload['job_id'], 'status': 'queued', 'user_id': request.user_id} for payload in payloads])
+        await enqueue_ingest(payloads, lane=classify_ingest(None, bulk=True))
+
+    return BulkProcessingResponse(
+        group_id=group_id,
+        total=len(results),
+        queued=len(payloads),
+        jobs=list(results.values()),
+    )
+
+@router.get("/groups/{group_id}")
+async def get_group_status(group_id: str, current_user: str = Depends(get_verified_user)):
+    """
+    Aggregated progress of a bulk processing request
+    """
+    if not re.match(r'^[a-f0-9\-]+$', group_id):
+        raise HTTPException(status_code=400, detail="Invalid group ID format")
+    progress = await get_group_progress(group_id)
+    if not progress:
+        raise HTTPException(status_code=404, detail="Group not found")
+    if progress['user_id'] != current_user:
+        raise HTTPException(status_code=403, detail="Not authorized to view this group")
+    return progress
+
+def _job_status_view(job_id: str, job: Dict[str, Any]) -> Dict[str, Any]:
+    progress = job_progress(job)
+    return {
+        "job_id": job_id,
+        "status": job.get('status', 'unknown'),
+        "percent_complete": progress["percent_complete"],
+        "progress": progress,
+    }
+
+def _valid_job_id(job_id: str) -> bool:
+    return bool(re.match(r'^[a-f0-9\-]+$', job_id))
+
+@router.post("/status/batch")
+async def get_processing_status_batch(request: JobStatusBatchRequest, current_user: str = Depends(get_verified_user)):
+    """
+    Status of many jobs in one call. Live state comes from Redis; only jobs without
+    one are read from Supabase, in a single batched query.
+    """
+    max_jobs = int(os.getenv('JOB_STATUS_BATCH_MAX', '500'))
+    job_ids = list(dict.fromkeys(request.job_ids))
+    if not job_ids:
+        raise HTTPException(status_code=400, detail="No job IDs given")
+    if len(job_ids) > max_jobs:
+        raise HTTPException(status_code=400, detail=f"Too many job IDs; at most {max_jobs} per request")
+    if not all(_valid_job_id(job_id) for job_id in job_ids):
+        raise HTTPException(status_code=400, detail="Invalid job ID format")
+
+    try:
+        states = await get_job_states(job_ids)
+    except RedisError as e:
+        print(f"Could not read live job states: {e}")
+        states = {}
+    # Other users' jobs are reported as missing, not forbidden, so job ids cannot be probed
+    jobs = {job_id: state for job_id, state in states.items() if state.get('user_id') == current_user and state.get('status')}
+    unresolved = [job_id for job_id in job_ids if job_id not in jobs]
+    if unresolved:
+        jobs.update(await get_supabase_service().get_jobs_by_ids(unresolved, current_user))
+
+    return {
+        "jobs": [_job_status_view(job_id, jobs[job_id]) for job_id in job_ids if job_id in jobs],
+        "missing": [job_id for job_id in job_ids if job_id not in jobs],
+    }
+
+@router.get("/status/{job_id}/events")
+async def stream_processing_status(job_id: str, current_user: str = Depends(get_verified_user)):
+    """
+    Server-Sent Events stream of a job's status and chunk progress. Sends the current
+    state first, then every change, and closes once the job is done.
+    """
+    if not _valid_job_id(job_id):
+        raise HTTPException(status_code=400, detail="Invalid job ID format")
+
+    try:
+        state = (await get_job_states([job_id])).get(job_id)
+    except RedisError as e:
+        print(f"Could not read live state of job {job_id}: {e}")
+        state = None
+    if not state or not state.get('user_id') or not state.get('status'):
+        # No live state yet (or it expired): start from the job row
+        job = await get_supabase_service().get_job(job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        state = {**job, **(state or {}), 'status': job.get('status'), 'user_id': job.get('user_id')}
+    if state.get('user_id') != current_user:
+        raise HTTPException(status_code=403, detail="Not authorized to view this job")
+
+    async def event_generator():
+        yield "retry: 3000\n\n"
+        async for update in stream_job_states(job_id, initial=state):
+            if update is None:
+                # Comment line: keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+            else:
+                yield f"data: {json.dumps(_job_status_view(job_id, update))}\n\n"
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
 @router.get("/status/{job_id}")
 async def get_processing_status(job_id: str, current_user: str = Depends(get_verified_user)):
     """
@@ -310,9 +495,12 @@ async def get_processing_status(job_id: str, current_user: str = Depends(get_ver
     if job.get('user_id') != current_user:
         raise HTTPException(status_code=403, detail="Not authorized to view this job")
 
+    progress = job_progress(job)
     return {
         "job_id": job_id,
         "status": job.get('status', 'unknown'),
         "created_at": job.get('created_at'),
         "completed_at": job.get('completed_at'),
+        "percent_complete": progress["percent_complete"],
+        "progress": progress,
     }
\ No newline at end of file
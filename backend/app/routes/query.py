@@ -2,10 +2,12 @@ from fastapi import APIRouter, HTTPException, Depends
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
-from app.services.nim_service import NIMService, EmbeddingError
-from app.services.pinecone_service import PineconeService
-from app.deps import require_backend_key, get_verified_user
+from app.services.nim_service import EmbeddingError
+from app.services.registry import registry, get_nim_service, get_pinecone_service
+from app.services.search_executor import SearchBusyError
+from app.deps import require_backend_key, require_operator_key, get_verified_user
 import time
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -66,14 +68,6 @@ def _normalize_scores(values: List[float]) -> List[float]:
 		return [1.0 for _ in values]
 	return [(v - lo) / (hi - lo) for v in values]
 
-# Use lazy initialization for services with proper embedding dimension coordination
-def get_nim_service():
-    return NIMService()
-
-def get_pinecone_service():
-    nim_service = NIMService()
-    embedding_dimension = nim_service.get_embedding_dimension()
-    return PineconeService(embedding_dimension=embedding_dimension)
 
 @router.post("/ask", response_model=QueryResponse)
 async def ask_question(payload: QueryRequest, current_user: str = Depends(get_verified_user)):
@@ -86,7 +80,7 @@ async def ask_question(payload: QueryRequest, current_user: str = Depends(get_ve
 	if not payload.question or not payload.question.strip():
 		raise HTTPException(status_code=400, detail="Question cannot be empty")
 	
-	# Initialize services lazily
+	# Shared service instances from the process registry
 	nim_service = get_nim_service()
 	pinecone_service = get_pinecone_service()
 	
@@ -124,7 +118,11 @@ async def ask_question(payload: QueryRequest, current_user: str = Depends(get_ve
 	if payload.selected_files:
 		filter_dict["file_key"] = { "$in": payload.selected_files }
 	
-	matches = pinecone_service.search_similar(embedding, top_k=max(payload.top_k, 10), filter_dict=filter_dict)
+	try:
+		matches = await pinecone_service.search_similar_async(embedding, top_k=max(payload.top_k, 10), filter_dict=filter_dict, user_id=payload.user_id)
+	except SearchBusyError as e:
+		logger.warning("QnA: vector search busy: %s", e)
+		raise HTTPException(status_code=503, detail="Search is busy. Please try again shortly.")
 	logger.info("QnA: pinecone returned %d matches in %.2f ms", len(matches), (time.time()-pc_start)*1000)
 
 	# Hybrid: lexical re-ranking using simple keyword overlap between question and chunk text
@@ -193,7 +191,7 @@ async def ask_question_direct(payload: QueryRequest, current_user: str = Depends
 	if not payload.question or not payload.question.strip():
 		raise HTTPException(status_code=400, detail="Question cannot be empty")
 
-	# Initialize service lazily
+	# Shared service instance from the process registry
 	nim_service = get_nim_service()
 
 	ans_start = time.time()
@@ -221,7 +219,7 @@ async def ask_question_stream(payload: QueryRequest, current_user: str = Depends
 		import json
 		header_sent = False
 		try:
-			# Initialize services lazily INSIDE the stream to avoid pre-stream 500s
+			# Resolve services INSIDE the stream to avoid pre-stream 500s
 			nim_service = get_nim_service()
 			pinecone_service = get_pinecone_service()
 
@@ -259,7 +257,14 @@ async def ask_question_stream(payload: QueryRequest, current_user: str = Depends
 				filter_dict["file_key"] = { "$in": payload.selected_files }
 
 			try:
-				matches = pinecone_service.search_similar(embedding, top_k=payload.top_k, filter_dict=filter_dict)
+				matches = await pinecone_service.search_similar_async(embedding, top_k=payload.top_k, filter_dict=filter_dict, user_id=payload.user_id)
+			except SearchBusyError as e:
+				logger.warning(f"QnA Stream: vector search busy: {e}")
+				if not header_sent:
+					yield json.dumps({"mode": "document", "references": []}) + "\n"
+					header_sent = True
+				yield "Error: Search is busy. Please try again shortly.\n"
+				return
 			except Exception as e:
 				logger.error(f"QnA Stream: pinecone search failed: {e}")
 				if not header_sent:
@@ -331,7 +336,7 @@ async def ask_question_direct_stream(payload: QueryRequest, current_user: str =
 		# Always emit header first so frontend can parse the stream contract
 		yield json.dumps({"mode": "general"}) + "\n"
 		try:
-			# Initialize service lazily INSIDE the stream
+			# Resolve service INSIDE the stream
 			nim_service = get_nim_service()
 			# Then emit tokens
 			token_count = 0
@@ -410,10 +415,11 @@ async def debug_search(payload: DebugSearchRequest, current_user: str = Depends(
 	
 	start_time = time.time()
 	try:
-		matches = pinecone_service.search_similar(
+		matches = await pinecone_service.search_similar_async(
 			payload.embedding, 
 			top_k=payload.top_k, 
-			filter_dict=filter_dict
+			filter_dict=filter_dict,
+			user_id=payload.user_id
 		)
 		processing_time = (time.time() - start_time) * 1000
 		
@@ -423,6 +429,8 @@ async def debug_search(payload: DebugSearchRequest, current_user: str = Depends(
 			processing_time_ms=round(processing_time, 2)
 		)
 		
+	except SearchBusyError as e:
+		raise HTTPException(status_code=503, detail=f"Search is busy: {str(e)}")
 	except Exception as e:
 		logger.error(f"Debug search failed: {e}")
 		raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
@@ -436,7 +444,6 @@ async def health_check():
 	pinecone_service = get_pinecone_service()
 	
 	# Run health checks concurrently
-	import asyncio
 	
 	try:
 		nim_health, pinecone_health = await asyncio.gather(
@@ -497,4 +504,17 @@ async def health_check():
 				}
 			},
 			overall_status="error"
-		)
\ No newline at end of file
+		)
+
+@router.post("/health/revalidate", dependencies=[Depends(require_operator_key)])
+async def revalidate_services():
+	"""
+	Re-run the Pinecone index probes on the shared client without restarting the process.
+	Operator only: the probes can create the index and block a thread until it is ready.
+	"""
+	try:
+		result = await asyncio.to_thread(registry.revalidate)
+		return {"pinecone": result}
+	except Exception as e:
+		logger.error(f"Service revalidation failed: {e}")
+		raise HTTPException(status_code=503, detail=f"Revalidation failed: {str(e)}")
@@ -0,0 +1,262 @@
+import os
+import gzip
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Bump when extraction output changes (new extractor, different segment text) to invalidate cached artifacts
+EXTRACTOR_VERSION = "2"
+
+_READ_BLOCK_CHARS = 64 * 1024
+
+
+class LocalArtifactStore:
+    """
+    Artifacts as files under a directory, e.g. a volume shared by the workers on one host
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split('/'))
+
+    def open(self, key: str) -> Optional[BinaryIO]:
+        try:
+            return open(self._path(key), 'rb')
+        except FileNotFoundError:
+            return None
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def put_file(self, key: str, local_path: str) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Copy then rename, so readers never see a partial artifact
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        shutil.copyfile(local_path, temp_path)
+        os.replace(temp_path, path)
+
+    def delete(self, key: str) -> None:
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3ArtifactStore:
+    """
+    Artifacts as objects in the uploads bucket under their own prefix
+    """
+
+    def __init__(self, s3_client, bucket_name: str):
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+
+    def open(self, key: str) -> Optional[BinaryIO]:
+        spool = tempfile.TemporaryFile()
+        try:
+            self.s3_client.download_fileobj(self.bucket_name, key, spool)
+        except Exception as e:
+            spool.close()
+            status = getattr(e, 'response', {}).get('Error', {}).get('Code')
+            if status not in ('404', 'NoSuchKey'):
+                logger.warning(f"Could not read artifact {key} from S3: {e}")
+            return None
+        spool.seek(0)
+        return spool
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.s3_client.head_object(Bucket=self.bucket_name, Key=key)
+            return True
+        except Exception:
+            return False
+
+    def put_file(self, key: str, local_path: str) -> None:
+        self.s3_client.upload_file(local_path, self.bucket_name, key)
+
+    def delete(self, key: str) -> None:
+        self.s3_client.delete_object(Bucket=self.bucket_name, Key=key)
+
+
+def open_text(store, key: str) -> Optional[Iterator[str]]:
+    """
+    Iterate a gzip text artifact in blocks, or return None if it does not exist
+    """
+    stream = store.open(key)
+    if stream is None:
+        return None
+
+    def read_blocks() -> Iterator[str]:
+        with stream, gzip.open(stream, 'rt', encoding='utf-8') as text:
+            for block in iter(lambda: text.read(_READ_BLOCK_CHARS), ''):
+                yield block
+
+    return read_blocks()
+
+
+class ArtifactWriter:
+    """
+    Writes a gzip artifact to a temp file; commit() stores it under `key`.
+    Closing without commit() discards it, so readers never see a partial artifact.
+    """
+
+    def __init__(self, store, key: str):
+        self.store = store
+        self.key = key
+        fd, self._temp_path = tempfile.mkstemp(suffix='.gz')
+        os.close(fd)
+        self._out = gzip.open(self._temp_path, 'wt', encoding='utf-8', compresslevel=6)
+        self.count = 0
+
+    def write(self, text: str) -> None:
+        self._out.write(text)
+        self.count += 1
+
+    def write_record(self, record: Dict[str, Any]) -> None:
+        self.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+    def commit(self) -> int:
+        """
+        Store the artifact; returns its compressed size in bytes. Storage errors are raised.
+        """
+        self._out.close()
+        size = os.path.getsize(self._temp_path)
+        self.store.put_file(self.key, self._temp_path)
+        return size
+
+    def close(self) -> None:
+        self._out.close()
+        try:
+            os.unlink(self._temp_path)
+        except OSError:
+            pass
+
+    def __enter__(self) -> "ArtifactWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def iter_records(store, key: str) -> Iterator[Dict[str, Any]]:
+    """
+    Stream the JSON-lines records of an artifact written with ArtifactWriter.write_record
+    """
+    stream = store.open(key)
+    if stream is None:
+        raise FileNotFoundError(f"Artifact {key} not found")
+    with stream, gzip.open(stream, 'rt', encoding='utf-8') as lines:
+        for line in lines:
+            yield json.loads(line)
+
+
+class ExtractedTextCache:
+    """
+    Gzip-compressed extracted text, keyed by the source file's content hash, so a
+    retry or reprocess of unchanged content skips download and extraction.
+    """
+
+    def __init__(self, store, prefix: str = "extracted-text"):
+        self.store = store
+        self.prefix = prefix.strip('/')
+
+    def make_key(self, user_id: str, content_hash: str, content_type: str, variant: str = "") -> str:
+        # The digest covers everything that changes extraction output
+        digest = hashlib.sha256(
+            f"{content_hash}|{content_type}|{EXTRACTOR_VERSION}|{variant}".encode('utf-8')
+        ).hexdigest()
+        return f"{self.prefix}/{user_id}/{digest}.txt.gz"
+
+    def get(self, key: str) -> Optional[Iterator[str]]:
+        """
+        Return an iterator over the cached text in blocks, or None on a miss
+        """
+        return open_text(self.store, key)
+
+    def tee(self, key: str, segments: Iterable[str]) -> Iterator[str]:
+        """
+        Pass segments through while compressing them to a temp file; once the source
+        is exhausted the artifact is stored. Storage errors are logged, never raised.
+        If the consumer stops early, nothing is stored.
+        """
+        fd, temp_path = tempfile.mkstemp(suffix='.txt.gz')
+        os.close(fd)
+        try:
+            with gzip.open(temp_path, 'wt', encoding='utf-8', compresslevel=6) as out:
+                for segment in segments:
+                    out.write(segment)
+                    yield segment
+            try:
+                self.store.put_file(key, temp_path)
+                logger.info(f"Stored extracted text artifact {key} ({os.path.getsize(temp_path)} bytes)")
+            except Exception as e:
+                logger.warning(f"Could not store extracted text artifact {key}: {e}")
+        finally:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+
+
+def _build_store(backend: str, local_dir: str, setting: str):
+    if backend == 'local':
+        return LocalArtifactStore(local_dir)
+    if backend == 's3':
+        from app.services.registry import registry
+        s3_service = registry.s3
+        if not s3_service.s3_client:
+            logger.warning(f"{setting}=s3 but no S3 client is available")
+            return None
+        return S3ArtifactStore(s3_service.s3_client, s3_service.bucket_name)
+    logger.warning(f"Unknown {setting} backend '{backend}'")
+    return None
+
+
+_cache: Optional[ExtractedTextCache] = None
+_cache_lock = threading.Lock()
+_stage_store = None
+
+
+def get_extracted_text_cache() -> Optional[ExtractedTextCache]:
+    """
+    Process-wide extracted-text cache, configured by EXTRACTED_TEXT_CACHE
+    ("s3" (default), "local" or "none"), EXTRACTED_TEXT_PREFIX and EXTRACTED_TEXT_CACHE_DIR
+    """
+    global _cache
+    backend = os.getenv('EXTRACTED_TEXT_CACHE', 's3').lower()
+    if backend in ('', 'none', 'off', 'false', '0'):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            local_dir = os.getenv('EXTRACTED_TEXT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'neurospace-artifacts'))
+            store = _build_store(backend, local_dir, 'EXTRACTED_TEXT_CACHE')
+            if store is None:
+                logger.warning("Extracted text caching disabled")
+                return None
+            _cache = ExtractedTextCache(store, os.getenv('EXTRACTED_TEXT_PREFIX', 'extracted-text'))
+        return _cache
+
+
+def get_stage_store():
+    """
+    Process-wide store for the intermediate artifacts handed between ingest stages,
+    configured by INGEST_STAGE_STORE ("s3" (default) or "local") and INGEST_STAGE_DIR.
+    Stages may run on different hosts, so "local" needs a directory every worker shares.
+    """
+    global _stage_store
+    with _cache_lock:
+        if _stage_store is None:
+            local_dir = os.getenv('INGEST_STAGE_DIR', os.path.join(tempfile.gettempdir(), 'neurospace-stages'))
+            _stage_store = _build_store(os.getenv('INGEST_STAGE_STORE', 's3').lower(), local_dir, 'INGEST_STAGE_STORE')
+            if _stage_store is None:
+                raise RuntimeError("No artifact store available for staged ingestion")
+        return _stage_store
@@ -0,0 +1,171 @@
+import re
+import logging
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Word runs and individual punctuation marks, roughly how subword tokenizers split text
+_TOKEN_PIECE = re.compile(r"\w+|[^\w\s]")
+# End of a sentence (terminal punctuation, optional closing quotes/brackets, whitespace) or a blank line
+_SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*\s+|\n\s*\n\s*")
+# Whitespace-delimited words with their trailing whitespace, used to split oversized sentences
+_WORD = re.compile(r"\S+\s*")
+
+
+def approx_token_count(text: str) -> int:
+    """
+    Approximate model token count: one token per punctuation mark and per ~4
+    characters of each word. Tracks WordPiece/BPE counts for English prose
+    closely enough to size chunks without loading a tokenizer.
+    """
+    count = 0
+    for match in _TOKEN_PIECE.finditer(text):
+        count += 1 + (match.end() - match.start() - 1) // 4
+    return count
+
+
+class TokenChunker:
+    """
+    Streaming chunker that sizes chunks in model tokens and cuts only at sentence
+    boundaries. Boundaries are found in one pass as text arrives and each sentence
+    is tokenized once, so chunking is linear in the document length. Consecutive
+    chunks share up to overlap_tokens of whole trailing sentences.
+
+    After iter_chunks is exhausted, `stats` holds per-document figures:
+    { chunks, tokens, embedded_tokens, overlap_tokens, overlap_ratio, max_chunk_tokens }
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 400,
+        overlap_tokens: int = 40,
+        count_tokens: Callable[[str], int] = approx_token_count,
+    ):
+        if max_tokens <= 0:
+            raise ValueError("max_tokens must be positive")
+        if overlap_tokens < 0 or overlap_tokens >= max_tokens:
+            raise ValueError("overlap_tokens must be between 0 and max_tokens - 1")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.count_tokens = count_tokens
+        # Text without any sentence boundary is force-split once it grows past this
+        self._max_pending_chars = max_tokens * 16
+        self.stats: Dict[str, Any] = self._empty_stats()
+
+    @staticmethod
+    def _empty_stats() -> Dict[str, Any]:
+        return {
+            "chunks": 0,
+            "tokens": 0,
+            "embedded_tokens": 0,
+            "overlap_tokens": 0,
+            "overlap_ratio": 0.0,
+            "max_chunk_tokens": 0,
+        }
+
+    def _iter_sentences(self, segments: Iterable[str]) -> Iterator[str]:
+        buffer = ""
+        scan_from = 0
+        for segment in segments:
+            if not segment:
+                continue
+            buffer += segment
+            cut = 0
+            # Only the tail can hold a boundary that is still growing; a few characters
+            # of lookback catch punctuation whose whitespace arrives in the next segment
+            resume = max(0, len(buffer) - 8)
+            for match in _SENTENCE_END.finditer(buffer, scan_from):
+                if match.end() == len(buffer):
+                    # The boundary may continue into the next segment
+                    resume = match.start()
+                    break
+                yield buffer[cut:match.end()]
+                cut = match.end()
+            buffer = buffer[cut:]
+            resume = max(0, resume - cut)
+            while len(buffer) > self._max_pending_chars:
+                split = buffer.rfind(" ", 0, self._max_pending_chars)
+                split = split + 1 if split > 0 else self._max_pending_chars
+                yield buffer[:split]
+                buffer = buffer[split:]
+                resume = max(0, resume - split)
+            scan_from = resume
+        if buffer.strip():
+            yield buffer
+
+    def _split_oversized(self, sentence: str) -> Iterator[Tuple[str, int]]:
+        # Fall back to word units so the packer can still fill chunks to max_tokens
+        for match in _WORD.finditer(sentence):
+            word = match.group()
+            tokens = self.count_tokens(word)
+            if tokens <= self.max_tokens:
+                yield word, tokens
+                continue
+            # A single unbroken "word" (e.g. base64 or a URL dump): cut it by characters
+            step = max(1, len(word) * self.max_tokens // tokens)
+            for i in range(0, len(word), step):
+                part = word[i:i + step]
+                yield part, self.count_tokens(part)
+
+    def _iter_units(self, segments: Iterable[str]) -> Iterator[Tuple[str, int]]:
+        for sentence in self._iter_sentences(segments):
+            tokens = self.count_tokens(sentence)
+            if tokens == 0:
+                # Whitespace only: keep it for spacing, it costs nothing
+                yield sentence, 0
+            elif tokens > self.max_tokens:
+                yield from self._split_oversized(sentence)
+            else:
+                yield sentence, tokens
+
+    def iter_chunks(self, segments: Iterable[str]) -> Iterator[Tuple[int, str]]:
+        """
+        Chunk a stream of text segments, yielding (chunk_index, chunk)
+        """
+        self.stats = stats = self._empty_stats()
+        window: List[Tuple[str, int]] = []
+        window_tokens = 0
+        # Tokens in the window that were already embedded in the previous chunk
+        carried_tokens = 0
+        index = 0
+
+        def emit() -> Optional[str]:
+            chunk = "".join(text for text, _ in window).strip()
+            if not chunk:
+                return None
+            stats["chunks"] += 1
+            stats["embedded_tokens"] += window_tokens
+            stats["overlap_tokens"] += carried_tokens
+            stats["max_chunk_tokens"] = max(stats["max_chunk_tokens"], window_tokens)
+            return chunk
+
+        for text, tokens in self._iter_units(segments):
+            stats["tokens"] += tokens
+            if window and window_tokens + tokens > self.max_tokens and window_tokens > carried_tokens:
+                chunk = emit()
+                if chunk:
+                    yield index, chunk
+                    index += 1
+                # Carry whole trailing sentences into the next chunk; the budget also
+                # leaves room for the incoming unit, so the new window always fits
+                budget = min(self.overlap_tokens, self.max_tokens - tokens)
+                kept: List[Tuple[str, int]] = []
+                kept_tokens = 0
+                for unit in reversed(window):
+                    if kept_tokens + unit[1] > budget:
+                        break
+                    kept.append(unit)
+                    kept_tokens += unit[1]
+                kept.reverse()
+                window, window_tokens, carried_tokens = kept, kept_tokens, kept_tokens
+            window.append((text, tokens))
+            window_tokens += tokens
+
+        if window_tokens > carried_tokens:
+            chunk = emit()
+            if chunk:
+                yield index, chunk
+
+        if stats["embedded_tokens"]:
+            stats["overlap_ratio"] = round(stats["overlap_tokens"] / stats["embedded_tokens"], 4)
+        logger.debug(f"Chunked document: {stats}")
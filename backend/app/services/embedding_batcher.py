@@ -0,0 +1,273 @@
+import os
+import json
+import time
+import uuid
+import base64
+import socket
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from redis.exceptions import RedisError, ResponseError
+
+from app.services.embedding_cache import decode_embedding, encode_embedding
+from app.services.redis_client import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STREAM = "embed:requests"
+DEFAULT_GROUP = "embedders"
+
+
+def _stream_name() -> str:
+    return os.getenv('EMBED_BATCHER_STREAM', DEFAULT_STREAM)
+
+
+def _encode_results(embeddings: List[Optional[List[float]]]) -> str:
+    return json.dumps([
+        base64.b64encode(encode_embedding(embedding)).decode('ascii') if embedding else None
+        for embedding in embeddings
+    ])
+
+
+def _decode_results(payload: bytes) -> List[Optional[List[float]]]:
+    return [decode_embedding(base64.b64decode(item)) if item else None for item in json.loads(payload)]
+
+
+class BatchedEmbeddingClient:
+    """
+    Drop-in for NIMService.generate_embeddings_batch used by ingestion tasks: texts
+    are queued on a Redis stream and embedded by dedicated embedder processes that
+    pack requests from many tasks into full NIM batches. If no embedder answers in
+    time, the texts are embedded locally so ingestion never stalls on the batcher.
+    """
+
+    def __init__(self, nim_service, stream: Optional[str] = None, timeout_seconds: Optional[float] = None):
+        self.nim_service = nim_service
+        self.stream = stream or _stream_name()
+        self.timeout_seconds = timeout_seconds if timeout_seconds is not None else float(
+            os.getenv('EMBED_BATCHER_TIMEOUT_SECONDS', '120')
+        )
+        self.stream_maxlen = int(os.getenv('EMBED_BATCHER_STREAM_MAXLEN', '10000'))
+        # The ingest pipeline sizes its batches from these
+        self.embed_batch_max_items = nim_service.embed_batch_max_items
+        self.embed_max_concurrency = nim_service.embed_max_concurrency
+
+    async def generate_embeddings_batch(self, texts: List[str], max_concurrent: Optional[int] = None, input_type: str = "query") -> List[Optional[List[float]]]:
+        if not texts:
+            return []
+        redis = get_async_redis()
+        request_id = uuid.uuid4().hex
+        reply_key = f"{self.stream}:reply:{request_id}"
+        try:
+            await redis.xadd(
+                self.stream,
+                {
+                    'id': request_id,
+                    'reply': reply_key,
+                    'input_type': input_type,
+                    'texts': json.dumps(texts),
+                    'count': len(texts),
+                    # Embedders drop requests whose caller has already given up
+                    'deadline': f"{time.time() + self.timeout_seconds:.3f}",
+                },
+                maxlen=self.stream_maxlen,
+                approximate=True,
+            )
+            reply = await redis.blpop([reply_key], timeout=self.timeout_seconds)
+        except RedisError as e:
+            logger.warning(f"Embedding batcher unavailable ({e}); embedding {len(texts)} text(s) locally")
+            return await self.nim_service.generate_embeddings_batch(texts, max_concurrent, input_type=input_type)
+        if reply is None:
+            logger.warning(f"No embedder replied within {self.timeout_seconds}s; embedding {len(texts)} text(s) locally")
+            return await self.nim_service.generate_embeddings_batch(texts, max_concurrent, input_type=input_type)
+        return _decode_results(reply[1])
+
+
+class EmbeddingBatcher:
+    """
+    Embedder worker: reads embedding requests from the Redis stream as part of a
+    consumer group, waits up to linger_ms for enough texts to fill target_items,
+    embeds them through NIMService in full batches and pushes each request's
+    embeddings to its reply key. Several embedders can share the group; entries
+    left pending by a dead embedder are reclaimed after claim_idle_ms.
+    """
+
+    def __init__(
+        self,
+        nim_service,
+        redis=None,
+        stream: Optional[str] = None,
+        group: Optional[str] = None,
+        consumer: Optional[str] = None,
+        linger_ms: Optional[int] = None,
+        target_items: Optional[int] = None,
+        max_inflight: Optional[int] = None,
+        claim_idle_ms: Optional[int] = None,
+        reply_ttl_seconds: int = 300,
+    ):
+        self.nim_service = nim_service
+        self.redis = redis
+        self.stream = stream or _stream_name()
+        self.group = group or os.getenv('EMBED_BATCHER_GROUP', DEFAULT_GROUP)
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.linger_ms = linger_ms if linger_ms is not None else int(os.getenv('EMBED_BATCHER_LINGER_MS', '50'))
+        # Default: enough texts to keep every concurrent NIM request full
+        self.target_items = target_items or int(os.getenv('EMBED_BATCHER_TARGET_ITEMS', '0')) or (
+            nim_service.embed_batch_max_items * nim_service.embed_max_concurrency
+        )
+        self.max_inflight = max_inflight or int(os.getenv('EMBED_BATCHER_MAX_INFLIGHT', '2'))
+        self.claim_idle_ms = claim_idle_ms or int(os.getenv('EMBED_BATCHER_CLAIM_IDLE_MS', '60000'))
+        self.reply_ttl_seconds = reply_ttl_seconds
+        self._last_claim = 0.0
+        self.stats: Dict[str, int] = {"flushes": 0, "requests": 0, "texts": 0, "nim_requests": 0, "expired": 0}
+
+    def utilisation(self) -> float:
+        """
+        Share of NIM request capacity used: texts sent / (requests * max items per request)
+        """
+        capacity = self.stats["nim_requests"] * self.nim_service.embed_batch_max_items
+        return self.stats["texts"] / capacity if capacity else 0.0
+
+    async def ensure_group(self) -> None:
+        try:
+            await self.redis.xgroup_create(self.stream, self.group, id='0', mkstream=True)
+        except ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+    async def _read(self, count: int, block_ms: int) -> List[Tuple[bytes, Dict[bytes, bytes]]]:
+        response = await self.redis.xreadgroup(self.group, self.consumer, {self.stream: '>'}, count=count, block=block_ms)
+        entries: List[Tuple[bytes, Dict[bytes, bytes]]] = []
+        for _, stream_entries in response or []:
+            entries.extend(stream_entries)
+        return entries
+
+    async def _claim_stale(self) -> List[Tuple[bytes, Dict[bytes, bytes]]]:
+        now = time.monotonic()
+        if now - self._last_claim < self.claim_idle_ms / 1000:
+            return []
+        self._last_claim = now
+        result = await self.redis.xautoclaim(self.stream, self.group, self.consumer, self.claim_idle_ms, start_id='0-0', count=self.target_items)
+        claimed = [entry for entry in result[1] if entry and entry[1]]
+        if claimed:
+            logger.warning(f"Reclaimed {len(claimed)} embedding request(s) left pending by another embedder")
+        return claimed
+
+    async def collect(self, block_ms: int = 1000) -> List[Tuple[bytes, Dict[bytes, bytes]]]:
+        """
+        Wait for the first request, then linger briefly to pack more into the same flush
+        """
+        entries = await self._claim_stale()
+        if not entries:
+            entries = await self._read(self.target_items, block_ms)
+        if not entries:
+            return []
+        texts = sum(int(fields.get(b'count', 1)) for _, fields in entries)
+        deadline = time.monotonic() + self.linger_ms / 1000
+        while texts < self.target_items:
+            remaining_ms = int((deadline - time.monotonic()) * 1000)
+            if remaining_ms <= 0:
+                break
+            more = await self._read(self.target_items, remaining_ms)
+            if not more:
+                break
+            entries.extend(more)
+            texts += sum(int(fields.get(b'count', 1)) for _, fields in more)
+        return entries
+
+    async def flush(self, entries: List[Tuple[bytes, Dict[bytes, bytes]]]) -> None:
+        """
+        Embed all texts of the given requests together and reply to each request
+        """
+        now = time.time()
+        by_type: Dict[str, List[Tuple[bytes, bytes, List[str]]]] = {}
+        expired: List[bytes] = []
+        for entry_id, fields in entries:
+            deadline = float(fields.get(b'deadline') or 0)
+            if deadline and deadline < now:
+                expired.append(entry_id)
+                continue
+            input_type = fields.get(b'input_type', b'query').decode()
+            by_type.setdefault(input_type, []).append((entry_id, fields[b'reply'], json.loads(fields[b'texts'])))
+
+        replies: List[Tuple[bytes, bytes, str]] = []
+        for input_type, requests in by_type.items():
+            texts = [text for _, _, request_texts in requests for text in request_texts]
+            self.stats["nim_requests"] += len(self.nim_service._plan_embedding_batches(list(enumerate(texts))))
+            try:
+                embeddings = await self.nim_service.generate_embeddings_batch(texts, input_type=input_type)
+            except Exception as e:
+                logger.error(f"Embedding flush of {len(texts)} text(s) failed: {e}")
+                embeddings = [None] * len(texts)
+            offset = 0
+            for entry_id, reply_key, request_texts in requests:
+                replies.append((entry_id, reply_key, _encode_results(embeddings[offset:offset + len(request_texts)])))
+                offset += len(request_texts)
+            self.stats["requests"] += len(requests)
+            self.stats["texts"] += len(texts)
+
+        pipe = self.redis.pipeline(transaction=False)
+        for _, reply_key, payload in replies:
+            pipe.rpush(reply_key, payload)
+            pipe.expire(reply_key, self.reply_ttl_seconds)
+        done = [entry_id for entry_id, _, _ in replies] + expired
+        if done:
+            pipe.xack(self.stream, self.group, *done)
+            pipe.xdel(self.stream, *done)
+        try:
+            await pipe.execute()
+        except RedisError as e:
+            # Unacknowledged entries stay pending and are reclaimed after claim_idle_ms
+            logger.error(f"Could not deliver {len(replies)} embedding reply(ies): {e}")
+            return
+        self.stats["flushes"] += 1
+        self.stats["expired"] += len(expired)
+
+    async def run(self, stop: asyncio.Event) -> None:
+        """
+        Consume until `stop` is set; up to max_inflight flushes run concurrently
+        """
+        if self.redis is None:
+            self.redis = get_async_redis()
+        await self.ensure_group()
+        logger.info(
+            f"Embedder {self.consumer} consuming {self.stream} (group {self.group}, "
+            f"target {self.target_items} texts, linger {self.linger_ms}ms)"
+        )
+        slots = asyncio.Semaphore(self.max_inflight)
+        inflight = set()
+        last_report = time.monotonic()
+        try:
+            while not stop.is_set():
+                await slots.acquire()
+                try:
+                    entries = await self.collect()
+                except RedisError as e:
+                    slots.release()
+                    logger.error(f"Embedding stream read failed: {e}")
+                    await asyncio.sleep(1)
+                    continue
+                if not entries:
+                    slots.release()
+                else:
+                    task = asyncio.create_task(self.flush(entries))
+                    inflight.add(task)
+                    task.add_done_callback(inflight.discard)
+                    task.add_done_callback(lambda _: slots.release())
+                if time.monotonic() - last_report >= 60:
+                    last_report = time.monotonic()
+                    logger.info(f"Embedder stats: {self.stats}, NIM utilisation {self.utilisation():.0%}")
+        finally:
+            if inflight:
+                await asyncio.gather(*inflight, return_exceptions=True)
+
+
+def get_batch_embedder(nim_service):
+    """
+    The embedder ingestion should use: the shared batcher when EMBEDDING_BATCHER_ENABLED
+    is on (requires running `python -m app.tasks.embedder`), otherwise NIM directly
+    """
+    if os.getenv('EMBEDDING_BATCHER_ENABLED', 'false').lower() in ('1', 'true', 'yes'):
+        return BatchedEmbeddingClient(nim_service)
+    return nim_service
@@ -0,0 +1,257 @@
+import os
+import asyncio
+import hashlib
+import logging
+import tempfile
+import weakref
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Embedding keys in Redis expire after this long unless EMBEDDING_CACHE_TTL_SECONDS says otherwise,
+# so the cache cannot grow without bound in the Redis that also carries the Celery queues
+DEFAULT_REDIS_TTL_SECONDS = 7 * 24 * 3600
+
+
+def encode_embedding(embedding: List[float]) -> bytes:
+    """
+    Pack an embedding into compact float32 bytes
+    """
+    return array('f', embedding).tobytes()
+
+
+def decode_embedding(data: bytes) -> List[float]:
+    """
+    Unpack float32 bytes produced by encode_embedding
+    """
+    values = array('f')
+    values.frombytes(data)
+    return values.tolist()
+
+
+class DiskEmbeddingStore:
+    """
+    Persistent tier storing one float32 blob per key under a local directory
+    """
+    name = "disk"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        # Keys contain the model name (with '/'), so hash the whole key into a flat filename
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], f"{digest}.f32")
+
+    def _get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        results: List[Optional[bytes]] = []
+        for key in keys:
+            try:
+                with open(self._path(key), 'rb') as f:
+                    results.append(f.read())
+            except FileNotFoundError:
+                results.append(None)
+        return results
+
+    def _put_many(self, items: Dict[str, bytes]) -> None:
+        for key, data in items.items():
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp file and rename so concurrent readers never see partial blobs
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+
+    async def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        return await asyncio.to_thread(self._get_many, keys)
+
+    async def put_many(self, items: Dict[str, bytes]) -> None:
+        await asyncio.to_thread(self._put_many, items)
+
+
+class RedisEmbeddingStore:
+    """
+    Persistent tier storing float32 blobs in Redis (shared by API and Celery workers).
+    Uses the shared Redis unless redis_url points at a dedicated instance.
+    """
+    name = "redis"
+
+    def __init__(self, ttl_seconds: Optional[int] = DEFAULT_REDIS_TTL_SECONDS, prefix: str = "emb:", redis_url: Optional[str] = None):
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self.redis_url = redis_url
+        # One client per event loop for a dedicated instance, dropped with its loop
+        self._clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+    def _redis(self):
+        if not self.redis_url:
+            from app.services.redis_client import get_async_redis
+            return get_async_redis()
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            import redis.asyncio as aioredis
+            client = self._clients[loop] = aioredis.Redis.from_url(self.redis_url)
+        return client
+
+    async def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        return await self._redis().mget([self.prefix + key for key in keys])
+
+    async def put_many(self, items: Dict[str, bytes]) -> None:
+        async with self._redis().pipeline(transaction=False) as pipe:
+            for key, data in items.items():
+                pipe.set(self.prefix + key, data, ex=self.ttl_seconds)
+            await pipe.execute()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache with a bounded in-process LRU tier in front
+    of an optional persistent tier. Keys are (model, input_type, sha256(text)).
+    """
+
+    def __init__(self, max_memory_items: int = 10000, persistent=None):
+        self.max_memory_items = max(0, max_memory_items)
+        self.persistent = persistent
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._stats = {
+            "memory_hits": 0,
+            "persistent_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "writes": 0,
+            "errors": 0,
+        }
+
+    @staticmethod
+    def make_key(model: str, input_type: str, text: str) -> str:
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        return f"{model}:{input_type}:{digest}"
+
+    def _remember(self, key: str, data: bytes) -> None:
+        if self.max_memory_items == 0:
+            return
+        self._memory[key] = data
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    async def get_many(self, keys: List[str]) -> List[Optional[List[float]]]:
+        """
+        Look up embeddings for keys; misses come back as None
+        """
+        results: List[Optional[List[float]]] = [None] * len(keys)
+        pending: List[int] = []
+        for i, key in enumerate(keys):
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                results[i] = decode_embedding(data)
+            else:
+                pending.append(i)
+
+        if pending and self.persistent is not None:
+            try:
+                found = await self.persistent.get_many([keys[i] for i in pending])
+            except Exception as e:
+                logger.warning(f"Embedding cache {self.persistent.name} tier lookup failed: {e}")
+                self._stats["errors"] += 1
+                found = [None] * len(pending)
+            still_pending = []
+            for i, data in zip(pending, found):
+                if data:
+                    self._stats["persistent_hits"] += 1
+                    self._remember(keys[i], data)
+                    results[i] = decode_embedding(data)
+                else:
+                    still_pending.append(i)
+            pending = still_pending
+
+        self._stats["misses"] += len(pending)
+        return results
+
+    async def get(self, key: str) -> Optional[List[float]]:
+        return (await self.get_many([key]))[0]
+
+    async def put_many(self, items: Dict[str, List[float]]) -> None:
+        """
+        Store embeddings in both tiers; persistent-tier failures are logged, not raised
+        """
+        if not items:
+            return
+        encoded = {key: encode_embedding(embedding) for key, embedding in items.items()}
+        for key, data in encoded.items():
+            self._remember(key, data)
+        self._stats["writes"] += len(encoded)
+        if self.persistent is not None:
+            try:
+                await self.persistent.put_many(encoded)
+            except Exception as e:
+                logger.warning(f"Embedding cache {self.persistent.name} tier write failed: {e}")
+                self._stats["errors"] += 1
+
+    async def put(self, key: str, embedding: List[float]) -> None:
+        await self.put_many({key: embedding})
+
+    def stats(self) -> Dict[str, object]:
+        hits = self._stats["memory_hits"] + self._stats["persistent_hits"]
+        lookups = hits + self._stats["misses"]
+        return {
+            **self._stats,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_items": len(self._memory),
+            "max_memory_items": self.max_memory_items,
+            "persistent_backend": self.persistent.name if self.persistent is not None else None,
+        }
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_configured = False
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """
+    Return the process-wide embedding cache, or None when EMBEDDING_CACHE_ENABLED is off
+    """
+    global _cache, _cache_configured
+    if _cache_configured:
+        return _cache
+    _cache_configured = True
+
+    if os.getenv('EMBEDDING_CACHE_ENABLED', 'true').lower() not in ('1', 'true', 'yes'):
+        logger.info("Embedding cache disabled")
+        return None
+
+    redis_url = os.getenv('EMBEDDING_CACHE_REDIS_URL')
+    backend = os.getenv('EMBEDDING_CACHE_BACKEND', 'redis' if redis_url or os.getenv('REDIS_URL') else 'none').lower()
+    persistent = None
+    try:
+        if backend == 'redis':
+            # 0 keeps keys until Redis evicts them (only sensible on a dedicated, allkeys-lru instance)
+            ttl = int(os.getenv('EMBEDDING_CACHE_TTL_SECONDS') or DEFAULT_REDIS_TTL_SECONDS)
+            persistent = RedisEmbeddingStore(ttl_seconds=ttl or None, redis_url=redis_url)
+        elif backend == 'disk':
+            persistent = DiskEmbeddingStore(os.getenv('EMBEDDING_CACHE_DIR', '/tmp/neurospace-embedding-cache'))
+        elif backend != 'none':
+            logger.warning(f"Unknown EMBEDDING_CACHE_BACKEND '{backend}', using memory tier only")
+    except Exception as e:
+        logger.warning(f"Failed to initialize {backend} embedding cache tier, using memory tier only: {e}")
+        persistent = None
+
+    _cache = EmbeddingCache(
+        max_memory_items=int(os.getenv('EMBEDDING_CACHE_MEMORY_ITEMS', '10000')),
+        persistent=persistent,
+    )
+    logger.info(f"Embedding cache initialized (memory_items={_cache.max_memory_items}, persistent={backend})")
+    return _cache
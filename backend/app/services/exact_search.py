@@ -0,0 +1,104 @@
+import operator
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Exact (brute-force) cosine search over an in-memory or memory-mapped float32 matrix,
+# shared by the local vector store and the hot-tenant vector cache
+
+_RANGE_OPERATORS = {"$gt": operator.gt, "$gte": operator.ge, "$lt": operator.lt, "$lte": operator.le}
+
+
+def _hashable(value: Any) -> bool:
+    try:
+        hash(value)
+        return True
+    except TypeError:
+        return False
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """
+    Scale float32 rows to unit length so a dot product is their cosine similarity;
+    all-zero rows stay zero
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+def top_k_indices(scores: np.ndarray, mask: Optional[np.ndarray], k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores among rows where mask is set, best first.
+    argpartition selects them in O(n); only those k are sorted.
+    """
+    if mask is not None:
+        scores = np.where(mask, scores, -np.inf)
+        k = min(k, int(np.count_nonzero(mask)))
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class MetadataColumns:
+    """
+    Row metadata viewed as per-key columns, built on first use, so filters in the
+    validate_filter dialect are evaluated as numpy comparisons instead of per-row
+    Python. Equality operators compare integer codes of the values; range
+    operators compare a float column (NaN where the value is not a number).
+    """
+
+    def __init__(self, metadata: Sequence[Optional[Dict[str, Any]]]):
+        self.metadata = metadata
+        self.size = len(metadata)
+        self._codes: Dict[str, Tuple[np.ndarray, Dict[Any, int]]] = {}
+        self._numbers: Dict[str, np.ndarray] = {}
+
+    def _codes_for(self, key: str) -> Tuple[np.ndarray, Dict[Any, int]]:
+        cached = self._codes.get(key)
+        if cached is None:
+            lookup: Dict[Any, int] = {}
+            codes = np.full(self.size, -1, dtype=np.int32)
+            for row, metadata in enumerate(self.metadata):
+                if metadata and key in metadata and _hashable(metadata[key]):
+                    codes[row] = lookup.setdefault(metadata[key], len(lookup))
+            cached = self._codes[key] = (codes, lookup)
+        return cached
+
+    def _numbers_for(self, key: str) -> np.ndarray:
+        cached = self._numbers.get(key)
+        if cached is None:
+            cached = np.full(self.size, np.nan)
+            for row, metadata in enumerate(self.metadata):
+                value = metadata.get(key) if metadata else None
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    cached[row] = value
+            self._numbers[key] = cached
+        return cached
+
+    def mask(self, validated_filter: Optional[Dict[str, Dict[str, Any]]]) -> np.ndarray:
+        """
+        Rows matching every condition of a filter already passed through validate_filter.
+        A missing key matches $ne and $nin, like Pinecone.
+        """
+        mask = np.ones(self.size, dtype=bool)
+        for key, operators in (validated_filter or {}).items():
+            for op, value in operators.items():
+                if op in _RANGE_OPERATORS:
+                    if not isinstance(value, (int, float)) or isinstance(value, bool):
+                        mask[:] = False
+                        continue
+                    with np.errstate(invalid="ignore"):
+                        mask &= _RANGE_OPERATORS[op](self._numbers_for(key), value)
+                    continue
+                codes, lookup = self._codes_for(key)
+                wanted = value if op in ("$in", "$nin") else [value]
+                wanted_codes = [lookup[v] for v in wanted if _hashable(v) and v in lookup]
+                hits = np.isin(codes, wanted_codes) if wanted_codes else np.zeros(self.size, dtype=bool)
+                mask &= hits if op in ("$eq", "$in") else ~hits
+        return mask
@@ -0,0 +1,254 @@
+import os
+import sys
+import signal
+import struct
+import logging
+import tempfile
+import threading
+import subprocess
+import multiprocessing
+from multiprocessing.connection import Connection
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+_LENGTH = struct.Struct('>Q')
+# Directory holding the `app` package, so the sandbox child can import it
+_BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Sandbox child entry point; argv carries the connection's file descriptor and the CPU budget
+_CHILD_COMMAND = (
+    "import sys; from multiprocessing.connection import Connection; "
+    "from app.services.extraction_sandbox import _sandbox_main; "
+    "_sandbox_main(Connection(int(sys.argv[1])), int(sys.argv[2]))"
+)
+
+
+class ExtractionError(Exception):
+    """Structured extraction failure; error_code is stored as the file's last_error"""
+    def __init__(self, message: str, error_code: str = "extraction_failed"):
+        self.message = message
+        self.error_code = error_code
+        super().__init__(self.message)
+
+
+def _limit_child(memory_mb: int):
+    def preexec() -> None:
+        # Runs in the forked child before exec; the address-space limit then covers the interpreter too
+        import resource
+        if memory_mb > 0:
+            limit = memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    return preexec
+
+
+def _sandbox_main(conn: Connection, cpu_seconds: int) -> None:
+    """
+    Sandbox child: run extraction requests until told to stop. Each request streams
+    its text segments into a spool file so the parent never buffers the document.
+    """
+    import resource
+    from app.services.text_extractor import TextExtractor
+
+    while True:
+        request = conn.recv()
+        if request is None:
+            return
+        file_path, content_type, spool_path = request
+        if cpu_seconds > 0:
+            # RLIMIT_CPU counts the whole process lifetime; grant a fresh budget per file
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            soft = int(usage.ru_utime + usage.ru_stime) + cpu_seconds
+            _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+            resource.setrlimit(resource.RLIMIT_CPU, (soft if hard == resource.RLIM_INFINITY else min(soft, hard), hard))
+        try:
+            count = 0
+            with open(spool_path, 'wb') as spool:
+                for segment in TextExtractor.iter_text(file_path, content_type):
+                    data = segment.encode('utf-8', 'surrogatepass')
+                    spool.write(_LENGTH.pack(len(data)))
+                    spool.write(data)
+                    count += 1
+            conn.send(("ok", count))
+        except MemoryError:
+            conn.send(("error", "extraction_oom", "Extraction exceeded the memory limit"))
+            return  # Interpreter state is suspect after MemoryError; let the parent recycle us
+        except Exception as e:
+            conn.send(("error", "extraction_failed", str(e)[:500]))
+
+
+def _read_spool(spool_path: str) -> Iterator[str]:
+    try:
+        with open(spool_path, 'rb') as spool:
+            while True:
+                header = spool.read(_LENGTH.size)
+                if not header:
+                    break
+                (length,) = _LENGTH.unpack(header)
+                yield spool.read(length).decode('utf-8', 'surrogatepass')
+    finally:
+        try:
+            os.unlink(spool_path)
+        except OSError:
+            pass
+
+
+class ExtractionSandbox:
+    """
+    Runs TextExtractor in a recyclable child process with wall-clock, CPU-time and
+    address-space limits, so a pathological document cannot hang or bloat the worker.
+    """
+
+    def __init__(
+        self,
+        timeout_seconds: float = 300,
+        cpu_seconds: int = 240,
+        memory_mb: int = 2048,
+        max_tasks_per_child: int = 50,
+    ):
+        self.timeout_seconds = timeout_seconds
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.max_tasks_per_child = max_tasks_per_child
+        self._process = None
+        self._conn = None
+        self._tasks = 0
+        self._lock = threading.Lock()
+
+    def _start(self) -> None:
+        # A plain subprocess rather than multiprocessing.Process: Celery's prefork pool
+        # runs tasks in daemonic processes, which may not have multiprocessing children.
+        # exec also means we never fork a copy of a worker that is already running threads.
+        parent_conn, child_conn = multiprocessing.Pipe()
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [_BACKEND_ROOT, env.get('PYTHONPATH')]))
+        try:
+            # Own session and process group so we can kill the child together with any
+            # extraction pool it starts
+            self._process = subprocess.Popen(
+                [sys.executable, '-c', _CHILD_COMMAND, str(child_conn.fileno()), str(self.cpu_seconds)],
+                stdin=subprocess.DEVNULL,
+                pass_fds=(child_conn.fileno(),),
+                env=env,
+                start_new_session=True,
+                preexec_fn=_limit_child(self.memory_mb),
+            )
+        except (OSError, subprocess.SubprocessError) as e:
+            self._process = None
+            parent_conn.close()
+            raise ExtractionError(f"Could not start the extraction sandbox: {e}", "extraction_failed")
+        finally:
+            child_conn.close()
+        self._conn = parent_conn
+        self._tasks = 0
+
+    def _alive(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def _kill(self) -> None:
+        if self._alive():
+            try:
+                # start_new_session made the child its process group's leader
+                os.killpg(self._process.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                self._process.kill()
+        if self._process is not None:
+            try:
+                self._process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                logger.warning(f"Extraction sandbox {self._process.pid} did not exit after SIGKILL")
+        if self._conn is not None:
+            self._conn.close()
+        self._process = None
+        self._conn = None
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None and self._alive():
+                try:
+                    self._conn.send(None)
+                    self._process.wait(timeout=5)
+                except Exception:
+                    pass
+            self._kill()
+
+    def _failure_from_exit(self, exitcode: Optional[int]) -> ExtractionError:
+        if exitcode == -signal.SIGXCPU:
+            return ExtractionError(f"Extraction exceeded the {self.cpu_seconds}s CPU limit", "extraction_timeout")
+        if exitcode in (-signal.SIGKILL, -signal.SIGSEGV, -signal.SIGABRT):
+            # The kernel OOM killer and allocation failures in C extensions surface this way
+            return ExtractionError(f"Extraction process died (exit {exitcode}), likely out of memory", "extraction_oom")
+        return ExtractionError(f"Extraction process exited unexpectedly (exit {exitcode})", "extraction_failed")
+
+    def extract(self, file_path: str, content_type: str) -> Iterator[str]:
+        """
+        Extract a file in the sandbox and return an iterator over its text segments.
+        Raises ExtractionError with error_code extraction_timeout, extraction_oom or
+        extraction_failed.
+        """
+        fd, spool_path = tempfile.mkstemp(suffix='.segments')
+        os.close(fd)
+        try:
+            with self._lock:
+                if not self._alive() or self._tasks >= self.max_tasks_per_child:
+                    self._kill()
+                    self._start()
+                self._tasks += 1
+                self._conn.send((os.path.abspath(file_path), content_type, spool_path))
+
+                if not self._conn.poll(self.timeout_seconds):
+                    self._kill()
+                    raise ExtractionError(f"Extraction exceeded the {self.timeout_seconds}s wall-clock limit", "extraction_timeout")
+                try:
+                    result = self._conn.recv()
+                except EOFError:
+                    try:
+                        self._process.wait(timeout=5)
+                    except subprocess.TimeoutExpired:
+                        pass
+                    error = self._failure_from_exit(self._process.returncode)
+                    self._kill()
+                    raise error
+
+                if result[0] == "error":
+                    if result[1] == "extraction_oom":
+                        self._kill()
+                    raise ExtractionError(result[2], result[1])
+        except BaseException:
+            try:
+                os.unlink(spool_path)
+            except OSError:
+                pass
+            raise
+
+        logger.debug(f"Sandboxed extraction produced {result[1]} segment(s) for {file_path}")
+        return _read_spool(spool_path)
+
+
+_sandbox: Optional[ExtractionSandbox] = None
+_sandbox_lock = threading.Lock()
+
+
+def get_extraction_sandbox() -> Optional[ExtractionSandbox]:
+    """
+    Return the process-wide sandbox, or None when EXTRACTION_SANDBOX_ENABLED is off
+    """
+    global _sandbox
+    if os.getenv('EXTRACTION_SANDBOX_ENABLED', 'true').lower() not in ('1', 'true', 'yes'):
+        return None
+    with _sandbox_lock:
+        if _sandbox is None:
+            _sandbox = ExtractionSandbox(
+                timeout_seconds=float(os.getenv('EXTRACTION_TIMEOUT_SECONDS', '300')),
+                cpu_seconds=int(os.getenv('EXTRACTION_CPU_SECONDS', '240')),
+                memory_mb=int(os.getenv('EXTRACTION_MAX_MEMORY_MB', '2048')),
+                max_tasks_per_child=int(os.getenv('EXTRACTION_MAX_TASKS_PER_CHILD', '50')),
+            )
+        return _sandbox
+
+
+def close_extraction_sandbox() -> None:
+    global _sandbox
+    with _sandbox_lock:
+        if _sandbox is not None:
+            _sandbox.close()
+        _sandbox = None
@@ -0,0 +1,179 @@
+import os
+import json
+import math
+import time
+import logging
+from typing import Any, Dict, List, Optional
+
+from app.services.redis_client import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+# Deficit round robin across per-user sub-queues. Runs as one script so that API
+# processes and workers dispatching concurrently never hand out the same slot twice.
+#
+# Keys under ARGV[1] (the lane prefix):
+#   ring      list of users with waiting work, in service order
+#   active    set of the users in the ring
+#   q:<user>  that user's waiting entries (JSON: job, cost, payload)
+#   deficit   hash user -> unused DRR credit
+#   leases    zset job -> lease expiry of dispatched, unfinished jobs
+#   owners    hash job -> user, running hash user -> dispatched count
+_DISPATCH_SCRIPT = """
+local prefix = ARGV[1]
+local now = tonumber(ARGV[2])
+local lease_seconds = tonumber(ARGV[3])
+local max_inflight = tonumber(ARGV[4])
+local user_cap = tonumber(ARGV[5])
+local quantum = tonumber(ARGV[6])
+local ring, active, deficits = prefix .. ':ring', prefix .. ':active', prefix .. ':deficit'
+local leases, owners, running = prefix .. ':leases', prefix .. ':owners', prefix .. ':running'
+
+-- Jobs that never reported back (worker lost) give their slot back when the lease runs out
+for _, job in ipairs(redis.call('ZRANGEBYSCORE', leases, '-inf', now)) do
+  local owner = redis.call('HGET', owners, job)
+  if owner and tonumber(redis.call('HINCRBY', running, owner, -1)) <= 0 then
+    redis.call('HDEL', running, owner)
+  end
+  redis.call('HDEL', owners, job)
+  redis.call('ZREM', leases, job)
+end
+
+local inflight = redis.call('ZCARD', leases)
+local dispatched = {}
+local users = redis.call('LLEN', ring)
+local capped = 0
+while inflight < max_inflight and users > 0 and capped < users do
+  local user = redis.call('LPOP', ring)
+  local queue = prefix .. ':q:' .. user
+  local count = tonumber(redis.call('HGET', running, user) or '0')
+  if user_cap > 0 and count >= user_cap then
+    -- At its concurrency cap: skip this turn without earning credit
+    capped = capped + 1
+    redis.call('RPUSH', ring, user)
+  else
+    capped = 0
+    local deficit = tonumber(redis.call('HGET', deficits, user) or '0') + quantum
+    while inflight < max_inflight and (user_cap <= 0 or count < user_cap) do
+      local head = redis.call('LINDEX', queue, 0)
+      if not head then break end
+      local entry = cjson.decode(head)
+      if entry.cost > deficit then break end
+      redis.call('LPOP', queue)
+      deficit = deficit - entry.cost
+      count = count + 1
+      inflight = inflight + 1
+      redis.call('ZADD', leases, now + lease_seconds, entry.job)
+      redis.call('HSET', owners, entry.job, user)
+      table.insert(dispatched, head)
+    end
+    if count > 0 then
+      redis.call('HSET', running, user, count)
+    end
+    if redis.call('LLEN', queue) == 0 then
+      -- An emptied queue leaves the ring and forfeits its credit, as in DRR
+      redis.call('HDEL', deficits, user)
+      redis.call('SREM', active, user)
+      users = users - 1
+    else
+      redis.call('HSET', deficits, user, deficit)
+      redis.call('RPUSH', ring, user)
+    end
+  end
+end
+return dispatched
+"""
+
+_SUBMIT_SCRIPT = """
+local prefix, user, entry = ARGV[1], ARGV[2], ARGV[3]
+redis.call('RPUSH', prefix .. ':q:' .. user, entry)
+if redis.call('SADD', prefix .. ':active', user) == 1 then
+  redis.call('RPUSH', prefix .. ':ring', user)
+end
+return 1
+"""
+
+_RELEASE_SCRIPT = """
+local prefix, job = ARGV[1], ARGV[2]
+local owner = redis.call('HGET', prefix .. ':owners', job)
+if not owner then
+  return 0
+end
+if tonumber(redis.call('HINCRBY', prefix .. ':running', owner, -1)) <= 0 then
+  redis.call('HDEL', prefix .. ':running', owner)
+end
+redis.call('HDEL', prefix .. ':owners', job)
+redis.call('ZREM', prefix .. ':leases', job)
+return 1
+"""
+
+
+def _lane_setting(name: str, lane: str, default: str) -> str:
+    return os.getenv(f"{name}_{lane.upper()}") or os.getenv(name) or default
+
+
+def file_cost(file_size: Optional[int]) -> int:
+    """
+    DRR cost of a file: one unit per started MB, so throughput is shared by bytes, not file count
+    """
+    return max(1, math.ceil((file_size or 0) / (1024 * 1024)))
+
+
+class FairScheduler:
+    """
+    Per-user fair queueing for one ingest lane. Work is submitted to per-user sub-queues
+    in Redis; dispatch() hands out at most max_inflight jobs at a time, picking users by
+    deficit round robin weighted by file_cost, and never more than user_cap per user
+    (0 = no cap). A tenant with 2,000 queued files therefore gets its share of the lane
+    instead of all of it. Dispatched jobs hold a slot until release() or lease expiry.
+    """
+
+    def __init__(
+        self,
+        lane: str,
+        redis=None,
+        max_inflight: Optional[int] = None,
+        user_cap: Optional[int] = None,
+        quantum: Optional[int] = None,
+        lease_seconds: Optional[int] = None,
+    ):
+        self.lane = lane
+        self.redis = redis
+        self.prefix = f"{os.getenv('INGEST_FAIR_PREFIX', 'ingest:fair')}:{lane}"
+        self.max_inflight = max_inflight or int(_lane_setting('INGEST_FAIR_MAX_INFLIGHT', lane, '16'))
+        self.user_cap = user_cap if user_cap is not None else int(_lane_setting('INGEST_FAIR_USER_CAP', lane, '0'))
+        self.quantum = quantum or int(os.getenv('INGEST_FAIR_QUANTUM', '4'))
+        self.lease_seconds = lease_seconds or int(os.getenv('INGEST_FAIR_LEASE_SECONDS', '3600'))
+
+    def _redis(self):
+        return self.redis or get_async_redis()
+
+    async def submit(self, entries: List[Dict[str, Any]]) -> None:
+        """
+        Queue entries ({user_id, job_id, cost, payload}) behind their user's earlier work
+        """
+        pipe = self._redis().pipeline(transaction=False)
+        for entry in entries:
+            encoded = json.dumps({'job': entry['job_id'], 'cost': entry['cost'], 'payload': entry['payload']})
+            pipe.eval(_SUBMIT_SCRIPT, 0, self.prefix, entry['user_id'], encoded)
+        await pipe.execute()
+
+    async def dispatch(self) -> List[Dict[str, Any]]:
+        """
+        Claim slots for as much waiting work as the lane allows; returns the payloads to enqueue
+        """
+        dispatched = await self._redis().eval(
+            _DISPATCH_SCRIPT, 0, self.prefix, f"{time.time():.3f}", self.lease_seconds,
+            self.max_inflight, self.user_cap, self.quantum,
+        )
+        return [json.loads(entry)['payload'] for entry in dispatched]
+
+    async def release(self, job_id: str) -> bool:
+        """
+        Give a finished job's slot back; a no-op for jobs that hold none
+        """
+        return bool(await self._redis().eval(_RELEASE_SCRIPT, 0, self.prefix, job_id))
+
+
+def fair_scheduling_enabled() -> bool:
+    return os.getenv('INGEST_FAIR_SCHEDULING', 'true').lower() in ('1', 'true', 'yes')
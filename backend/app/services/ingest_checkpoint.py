@@ -0,0 +1,146 @@
+import os
+import time
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from app.services.ingest_pipeline import PipelineProgress
+from app.services.job_events import publish_job_event
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_VERSION = 1
+
+
+def _to_ranges(indices: Set[int]) -> List[List[int]]:
+    # Sorted, merged half-open [start, stop) ranges: a 900-chunk file is usually one pair
+    ranges: List[List[int]] = []
+    for index in sorted(indices):
+        if ranges and ranges[-1][1] == index:
+            ranges[-1][1] = index + 1
+        else:
+            ranges.append([index, index + 1])
+    return ranges
+
+
+def _from_ranges(ranges: Iterable[Iterable[int]]) -> Set[int]:
+    indices: Set[int] = set()
+    for start, stop in ranges or []:
+        indices.update(range(int(start), int(stop)))
+    return indices
+
+
+class IngestCheckpoint(PipelineProgress):
+    """
+    Chunk-level ingest progress stored on the processing_jobs row: which chunk
+    indices are embedded and which are upserted. A retry whose source fingerprint
+    matches skips chunks that are already in Pinecone (vector ids are deterministic,
+    so redoing a chunk is harmless but wasted work).
+    """
+
+    def __init__(self, supabase_service, job_id: Optional[str], fingerprint: Optional[str], flush_interval: Optional[float] = None):
+        self.supabase_service = supabase_service
+        self.job_id = job_id
+        self.fingerprint = fingerprint
+        self.flush_interval = flush_interval if flush_interval is not None else float(
+            os.getenv('INGEST_CHECKPOINT_INTERVAL_SECONDS', '2')
+        )
+        self.total_chunks: Optional[int] = None
+        self.embedded_indices: Set[int] = set()
+        self.upserted_indices: Set[int] = set()
+        self.resumed = False
+        self._last_flush = 0.0
+
+    @classmethod
+    async def load(cls, supabase_service, job_id: Optional[str], fingerprint: Optional[str]) -> "IngestCheckpoint":
+        """
+        Restore progress from the job if it was recorded for the same source and chunking
+        """
+        checkpoint = cls(supabase_service, job_id, fingerprint)
+        if not job_id or not fingerprint:
+            return checkpoint
+        job = await supabase_service.get_job(job_id)
+        saved = (job or {}).get('checkpoint') or {}
+        if saved.get('version') == CHECKPOINT_VERSION and saved.get('fingerprint') == fingerprint:
+            checkpoint.upserted_indices = _from_ranges(saved.get('upserted'))
+            checkpoint.embedded_indices = _from_ranges(saved.get('embedded')) | checkpoint.upserted_indices
+            checkpoint.total_chunks = job.get('total_chunks')
+            checkpoint.resumed = bool(checkpoint.upserted_indices)
+            if checkpoint.resumed:
+                logger.info(f"Resuming job {job_id}: {len(checkpoint.upserted_indices)} chunk(s) already upserted")
+        elif saved:
+            logger.info(f"Discarding checkpoint for job {job_id}: source or chunking changed")
+        return checkpoint
+
+    @property
+    def upserted_count(self) -> int:
+        return len(self.upserted_indices)
+
+    def should_skip(self, index: int) -> bool:
+        return index in self.upserted_indices
+
+    async def chunks_read(self, total: int) -> None:
+        self.total_chunks = total
+        await self.flush()
+
+    async def embedded(self, indices: List[int]) -> None:
+        self.embedded_indices.update(indices)
+        await self._maybe_flush()
+
+    async def upserted(self, indices: List[int]) -> None:
+        self.upserted_indices.update(indices)
+        await self._maybe_flush()
+
+    def to_row(self) -> Dict[str, Any]:
+        return {
+            'total_chunks': self.total_chunks,
+            'embedded_chunks': len(self.embedded_indices),
+            'upserted_chunks': len(self.upserted_indices),
+            'checkpoint': {
+                'version': CHECKPOINT_VERSION,
+                'fingerprint': self.fingerprint,
+                'embedded': _to_ranges(self.embedded_indices - self.upserted_indices),
+                'upserted': _to_ranges(self.upserted_indices),
+            },
+        }
+
+    async def _maybe_flush(self) -> None:
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            await self.flush()
+
+    async def flush(self) -> None:
+        if not self.job_id:
+            return
+        self._last_flush = time.monotonic()
+        row = self.to_row()
+        if not await self.supabase_service.update_job_progress(self.job_id, row):
+            logger.warning(f"Could not record ingest checkpoint for job {self.job_id}")
+        # Chunk progress for SSE subscribers, at most once per flush interval
+        await publish_job_event(
+            self.job_id,
+            total_chunks=row['total_chunks'],
+            embedded_chunks=row['embedded_chunks'],
+            upserted_chunks=row['upserted_chunks'],
+        )
+
+
+def job_progress(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Progress fields for the status endpoint. percent_complete is the share of chunks
+    upserted; it is None while a first attempt is still discovering the chunk total.
+    """
+    total = job.get('total_chunks')
+    upserted = job.get('upserted_chunks') or 0
+    if job.get('status') == 'completed':
+        percent = 100.0
+    elif total:
+        percent = round(min(100.0, 100.0 * upserted / total), 1)
+    elif total == 0:
+        percent = 0.0
+    else:
+        percent = None
+    return {
+        'total_chunks': total,
+        'embedded_chunks': job.get('embedded_chunks') or 0,
+        'upserted_chunks': upserted,
+        'percent_complete': percent,
+    }
@@ -0,0 +1,83 @@
+import os
+import time
+import logging
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from redis.exceptions import RedisError
+
+from app.services.redis_client import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ('completed', 'failed')
+
+
+def _group_ttl() -> int:
+    return int(os.getenv('INGEST_GROUP_TTL_SECONDS', str(7 * 24 * 3600)))
+
+
+def _meta_key(group_id: str) -> str:
+    return f"ingest:group:{group_id}"
+
+
+def _jobs_key(group_id: str) -> str:
+    return f"ingest:group:{group_id}:jobs"
+
+
+async def create_group(group_id: str, user_id: str, job_ids: List[str], redis=None) -> None:
+    """
+    Register a bulk ingest: the group's owner and the current status of each job.
+    Progress is derived from the job statuses, so re-recording a status (task
+    retries, redelivery) never double counts.
+    """
+    redis = redis or get_async_redis()
+    ttl = _group_ttl()
+    pipe = redis.pipeline(transaction=True)
+    pipe.hset(_meta_key(group_id), mapping={'user_id': user_id, 'total': len(job_ids), 'created_at': f"{time.time():.3f}"})
+    if job_ids:
+        pipe.hset(_jobs_key(group_id), mapping={job_id: 'queued' for job_id in job_ids})
+    pipe.expire(_meta_key(group_id), ttl)
+    pipe.expire(_jobs_key(group_id), ttl)
+    await pipe.execute()
+
+
+async def record_job_status(group_id: Optional[str], job_id: Optional[str], status: str, redis=None) -> None:
+    """
+    Record a job's status in its group. Best effort: group progress must never fail ingestion.
+    """
+    if not group_id or not job_id:
+        return
+    try:
+        redis = redis or get_async_redis()
+        # Only update jobs the group knows about, so an expired group is not recreated without its metadata
+        if await redis.hexists(_jobs_key(group_id), job_id):
+            await redis.hset(_jobs_key(group_id), job_id, status)
+    except RedisError as e:
+        logger.warning(f"Could not record status of job {job_id} in ingest group {group_id}: {e}")
+
+
+async def get_group_progress(group_id: str, redis=None) -> Optional[Dict[str, Any]]:
+    """
+    Aggregated progress of a bulk ingest, or None if the group is unknown or expired
+    """
+    redis = redis or get_async_redis()
+    pipe = redis.pipeline(transaction=False)
+    pipe.hgetall(_meta_key(group_id))
+    pipe.hgetall(_jobs_key(group_id))
+    meta, jobs = await pipe.execute()
+    if not meta:
+        return None
+    statuses = {job_id.decode(): status.decode() for job_id, status in jobs.items()}
+    counts = Counter(statuses.values())
+    total = int(meta.get(b'total', len(statuses)))
+    finished = sum(counts[status] for status in TERMINAL_STATUSES)
+    return {
+        'group_id': group_id,
+        'user_id': meta.get(b'user_id', b'').decode(),
+        'total': total,
+        'counts': dict(counts),
+        'finished': finished,
+        'percent_complete': round(100.0 * finished / total, 1) if total else 100.0,
+        'failed_job_ids': sorted(job_id for job_id, status in statuses.items() if status == 'failed'),
+    }
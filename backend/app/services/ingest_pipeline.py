@@ -0,0 +1,174 @@
+import os
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of a stage's output
+_DONE = object()
+
+
+class PipelineProgress:
+    """
+    Hooks embed_and_upsert calls as work completes. The default does nothing and
+    skips no chunks; IngestCheckpoint records progress so a retry can resume.
+    """
+
+    def should_skip(self, index: int) -> bool:
+        return False
+
+    async def chunks_read(self, total: int) -> None:
+        pass
+
+    async def embedded(self, indices: List[int]) -> None:
+        pass
+
+    async def upserted(self, indices: List[int]) -> None:
+        pass
+
+
+def _take(iterator: Iterator[Tuple[int, str]], count: int, skip: Callable[[int], bool]) -> Tuple[List[Tuple[int, str]], int, int]:
+    """
+    Read up to `count` chunks that still need work. Returns (batch, chunks read, chunks skipped).
+    """
+    batch: List[Tuple[int, str]] = []
+    read = skipped = 0
+    for item in iterator:
+        read += 1
+        if skip(item[0]):
+            skipped += 1
+            continue
+        batch.append(item)
+        if len(batch) >= count:
+            break
+    return batch, read, skipped
+
+
+def accepted_indices(indices: List[int], vectors: List[Dict[str, Any]], result: Dict[str, Any]) -> List[int]:
+    """
+    Chunk indices whose vectors an upsert accepted. With errors, only vectors outside
+    failed_ids count, so a partly failed upsert still records the batches that landed.
+    """
+    if not result.get("errors"):
+        return list(indices)
+    if "failed_ids" not in result:
+        return []
+    failed = set(result["failed_ids"])
+    return [index for index, vector in zip(indices, vectors) if vector["id"] not in failed]
+
+
+async def embed_and_upsert(
+    chunks: Iterable[Tuple[int, str]],
+    nim_service,
+    pinecone_service,
+    build_vector: Callable[[int, str, List[float]], Dict[str, Any]],
+    batch_size: Optional[int] = None,
+    queue_size: Optional[int] = None,
+    progress: Optional[PipelineProgress] = None,
+) -> Dict[str, Any]:
+    """
+    Stream (chunk_index, text) pairs through embedding and Pinecone upsert.
+
+    Three stages are connected by bounded queues: reading chunks, embedding a
+    batch through NIM, and upserting that batch's vectors. Each batch is upserted
+    as soon as its embeddings arrive, so only a few batches of vectors are held in
+    memory at once and Pinecone works while NIM is still embedding later batches.
+    INGEST_UPSERT_WORKERS batches can be upserting at the same time.
+
+    Chunks for which progress.should_skip() is true (already upserted by an earlier
+    attempt) are read but not embedded again.
+
+    Returns a summary: { chunks, resumed, embedded, batches, failed_indices, upsert: {total, accepted, skipped, errors} }
+    """
+    if progress is None:
+        progress = PipelineProgress()
+    if batch_size is None:
+        batch_size = int(os.getenv('INGEST_EMBED_BATCH_SIZE', '0')) or (
+            nim_service.embed_batch_max_items * nim_service.embed_max_concurrency
+        )
+    if queue_size is None:
+        queue_size = int(os.getenv('INGEST_QUEUE_SIZE', '2'))
+    upsert_workers = max(1, int(os.getenv('INGEST_UPSERT_WORKERS', '2')))
+    batch_size = max(1, batch_size)
+
+    embed_queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, queue_size))
+    upsert_queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, queue_size))
+    summary: Dict[str, Any] = {
+        "chunks": 0,
+        "resumed": 0,
+        "embedded": 0,
+        "batches": 0,
+        "failed_indices": [],
+        "upsert": {"total": 0, "accepted": 0, "skipped": 0, "errors": []},
+    }
+
+    async def read_chunks() -> None:
+        # Pull from the (possibly slow, synchronous) chunk iterator off the event loop
+        iterator = iter(chunks)
+        while True:
+            batch, read, skipped = await asyncio.to_thread(_take, iterator, batch_size, progress.should_skip)
+            summary["chunks"] += read
+            summary["resumed"] += skipped
+            if not batch:
+                break
+            await embed_queue.put(batch)
+        await progress.chunks_read(summary["chunks"])
+        await embed_queue.put(_DONE)
+
+    async def embed_batches() -> None:
+        while True:
+            batch = await embed_queue.get()
+            if batch is _DONE:
+                break
+            embeddings = await nim_service.generate_embeddings_batch([text for _, text in batch])
+            indices = []
+            vectors = []
+            for (index, text), embedding in zip(batch, embeddings):
+                if embedding:
+                    indices.append(index)
+                    vectors.append(build_vector(index, text, embedding))
+                else:
+                    summary["failed_indices"].append(index)
+            summary["embedded"] += len(vectors)
+            if vectors:
+                await progress.embedded(indices)
+                await upsert_queue.put((indices, vectors))
+        for _ in range(upsert_workers):
+            await upsert_queue.put(_DONE)
+
+    async def upsert_batches() -> None:
+        while True:
+            item = await upsert_queue.get()
+            if item is _DONE:
+                break
+            indices, vectors = item
+            # Pinecone's client is synchronous; keep it off the event loop
+            result = await asyncio.to_thread(pinecone_service.upsert_vectors, vectors)
+            summary["batches"] += 1
+            for key in ("total", "accepted", "skipped"):
+                summary["upsert"][key] += int(result.get(key, 0) or 0)
+            summary["upsert"]["errors"].extend(result.get("errors") or [])
+            # Vectors in failed Pinecone batches are not done; they are redone on resume
+            done = accepted_indices(indices, vectors, result)
+            if done:
+                await progress.upserted(done)
+
+    stages = [
+        asyncio.create_task(read_chunks()),
+        asyncio.create_task(embed_batches()),
+        *[asyncio.create_task(upsert_batches()) for _ in range(upsert_workers)],
+    ]
+    try:
+        await asyncio.gather(*stages)
+    except BaseException:
+        for stage in stages:
+            stage.cancel()
+        await asyncio.gather(*stages, return_exceptions=True)
+        raise
+
+    logger.info(
+        f"Ingest pipeline finished: {summary['embedded']}/{summary['chunks']} chunks embedded, "
+        f"{summary['upsert']['accepted']} vectors accepted in {summary['batches']} upsert batch(es)"
+    )
+    return summary
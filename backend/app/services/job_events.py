@@ -0,0 +1,233 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+from redis.exceptions import RedisError
+
+from app.services.redis_client import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+# Numeric snapshot fields; everything else is kept as a string
+COUNT_FIELDS = ('total_chunks', 'embedded_chunks', 'upserted_chunks')
+
+# Merge the update into the job's snapshot and publish the whole snapshot, so every
+# event is self-contained and a subscriber that misses one loses nothing
+_PUBLISH_SCRIPT = """
+local key, channel, ttl = KEYS[1], ARGV[1], tonumber(ARGV[2])
+for i = 3, #ARGV, 2 do
+  redis.call('HSET', key, ARGV[i], ARGV[i + 1])
+end
+redis.call('EXPIRE', key, ttl)
+local state = redis.call('HGETALL', key)
+redis.call('PUBLISH', channel, cjson.encode(state))
+return state
+"""
+
+
+def _channel() -> str:
+    return os.getenv('JOB_EVENTS_CHANNEL', 'ingest:job-events')
+
+
+def _state_ttl() -> int:
+    return int(os.getenv('JOB_EVENTS_TTL_SECONDS', str(24 * 3600)))
+
+
+def _state_key(job_id: str) -> str:
+    return f"ingest:job:{job_id}"
+
+
+def _decode(value) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+def _parse_state(fields) -> Dict[str, Any]:
+    # HGETALL comes back as a dict from redis-py and as a flat list from Lua
+    if not isinstance(fields, dict):
+        fields = dict(zip(fields[::2], fields[1::2]))
+    state: Dict[str, Any] = {}
+    for name, value in fields.items():
+        name, value = _decode(name), _decode(value)
+        state[name] = int(value) if name in COUNT_FIELDS and value.lstrip('-').isdigit() else value
+    if 'updated_at' in state:
+        state['updated_at'] = float(state['updated_at'])
+    return state
+
+
+async def publish_job_events(updates: List[Dict[str, Any]], redis=None) -> None:
+    """
+    Update the live state (status, user_id, chunk counts) of jobs and notify subscribers.
+    Best effort: Supabase stays the source of truth and ingestion never fails on this.
+    """
+    updates = [update for update in updates if update.get('job_id')]
+    if not updates:
+        return
+    channel, ttl, now = _channel(), _state_ttl(), f"{time.time():.3f}"
+    try:
+        redis = redis or get_async_redis()
+        pipe = redis.pipeline(transaction=False)
+        for update in updates:
+            args: List[Any] = [channel, ttl, 'updated_at', now]
+            for name, value in update.items():
+                if value is not None:
+                    args.extend([name, value])
+            pipe.eval(_PUBLISH_SCRIPT, 1, _state_key(update['job_id']), *args)
+        await pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Could not publish progress of {len(updates)} job(s): {e}")
+
+
+async def publish_job_event(job_id: Optional[str], redis=None, **fields) -> None:
+    await publish_job_events([{'job_id': job_id, **fields}], redis=redis)
+
+
+async def get_job_states(job_ids: List[str], redis=None) -> Dict[str, Dict[str, Any]]:
+    """
+    Live state of many jobs in one round trip; jobs without a snapshot are left out
+    """
+    if not job_ids:
+        return {}
+    redis = redis or get_async_redis()
+    pipe = redis.pipeline(transaction=False)
+    for job_id in job_ids:
+        pipe.hgetall(_state_key(job_id))
+    rows = await pipe.execute()
+    return {job_id: _parse_state(row) for job_id, row in zip(job_ids, rows) if row}
+
+
+class JobEventHub:
+    """
+    One pub/sub subscription per API process, fanned out to every stream watching a
+    job. Each watcher gets a one-slot queue holding the latest snapshot: events are
+    full snapshots, so a slow client skips intermediate ones instead of falling behind.
+    """
+
+    def __init__(self, redis=None):
+        self.redis = redis
+        self.watchers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        self._reader: Optional[asyncio.Task] = None
+
+    def watch(self, job_id: str) -> asyncio.Queue:
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._read())
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self.watchers[job_id].add(queue)
+        return queue
+
+    def unwatch(self, job_id: str, queue: asyncio.Queue) -> None:
+        watchers = self.watchers.get(job_id)
+        if watchers is not None:
+            watchers.discard(queue)
+            if not watchers:
+                del self.watchers[job_id]
+
+    def _deliver(self, state: Dict[str, Any]) -> None:
+        for queue in list(self.watchers.get(state.get('job_id'), ())):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(state)
+
+    async def _read(self) -> None:
+        while True:
+            pubsub = None
+            try:
+                pubsub = (self.redis or get_async_redis()).pubsub(ignore_subscribe_messages=True)
+                await pubsub.subscribe(_channel())
+                async for message in pubsub.listen():
+                    if message.get('type') == 'message':
+                        self._deliver(_parse_state(json.loads(message['data'])))
+            except asyncio.CancelledError:
+                raise
+            except (RedisError, ValueError) as e:
+                # Watchers keep waiting; they catch up from the next snapshot after reconnecting
+                logger.warning(f"Job event subscription interrupted: {e}")
+                await asyncio.sleep(1.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+
+    async def close(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._reader = None
+        self.watchers.clear()
+
+
+_hub: Optional[JobEventHub] = None
+_hub_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_job_event_hub() -> JobEventHub:
+    """
+    Return the process-wide hub for the running event loop
+    """
+    global _hub, _hub_loop
+    loop = asyncio.get_running_loop()
+    if _hub is None or _hub_loop is not loop:
+        _hub = JobEventHub()
+        _hub_loop = loop
+    return _hub
+
+
+async def close_job_event_hub() -> None:
+    global _hub, _hub_loop
+    if _hub is not None:
+        await _hub.close()
+    _hub = None
+    _hub_loop = None
+
+
+async def stream_job_states(
+    job_id: str,
+    initial: Optional[Dict[str, Any]] = None,
+    hub: Optional[JobEventHub] = None,
+    heartbeat_seconds: Optional[float] = None,
+    max_seconds: Optional[float] = None,
+) -> AsyncIterator[Optional[Dict[str, Any]]]:
+    """
+    Yield the job's state now and on every change; None is a heartbeat. Ends once the
+    job completes or fails (a job being retried stays 'processing', so 'failed' is final).
+    """
+    hub = hub or get_job_event_hub()
+    heartbeat = heartbeat_seconds or float(os.getenv('JOB_EVENTS_HEARTBEAT_SECONDS', '15'))
+    deadline = time.monotonic() + (max_seconds or float(os.getenv('JOB_EVENTS_MAX_STREAM_SECONDS', '3600')))
+    # Watch before reading the snapshot, so a change in between is not lost
+    queue = hub.watch(job_id)
+    try:
+        state = initial
+        if state is None:
+            state = (await get_job_states([job_id], redis=hub.redis)).get(job_id)
+        last_update = None
+        while True:
+            if state is not None and (last_update is None or state.get('updated_at') != last_update):
+                yield state
+                if state.get('status') in ('completed', 'failed'):
+                    return
+                last_update = state.get('updated_at')
+            now = time.monotonic()
+            if now >= deadline:
+                return
+            wait = min(heartbeat, deadline - now)
+            try:
+                state = await asyncio.wait_for(queue.get(), timeout=wait)
+            except asyncio.TimeoutError:
+                # Re-read on quiet periods: covers events sent while the subscription was (re)connecting
+                try:
+                    state = (await get_job_states([job_id], redis=hub.redis)).get(job_id)
+                except RedisError:
+                    state = None
+                if state is None or state.get('updated_at') == last_update:
+                    yield None
+    finally:
+        hub.unwatch(job_id, queue)
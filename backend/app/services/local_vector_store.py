@@ -0,0 +1,368 @@
+import os
+import re
+import json
+import time
+import uuid
+import fcntl
+import shutil
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.exact_search import MetadataColumns, normalize, top_k_indices
+from app.services.pinecone_service import validate_filter
+from app.services.search_executor import get_search_executor
+
+logger = logging.getLogger(__name__)
+
+# Rows a partition's matrix file starts with; it doubles when full
+INITIAL_CAPACITY = 1024
+
+
+@contextmanager
+def _file_lock(path: str) -> Iterator[None]:
+    with open(path, "a+") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+class _Partition:
+    """
+    One user's vectors: unit-length float32 rows in a memory-mapped matrix file
+    (vectors.f32) and an append-only log (rows.jsonl) of which id and metadata each
+    row holds. Writers serialise on a lock file and write rows before logging them;
+    readers in any process pick up new log lines before each search.
+    """
+
+    def __init__(self, directory: str, dimension: int, user_id: str):
+        self.directory = directory
+        self.dimension = dimension
+        self.user_id = user_id
+        self.matrix_path = os.path.join(directory, "vectors.f32")
+        self.log_path = os.path.join(directory, "rows.jsonl")
+        self.lock_path = os.path.join(directory, ".lock")
+        self.lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.ids: List[Optional[str]] = []
+        self.metadata: List[Optional[Dict[str, Any]]] = []
+        self.rows: Dict[str, int] = {}
+        self.live = np.zeros(0, dtype=bool)
+        self.matrix: Optional[np.memmap] = None
+        self._log_offset = 0
+        self._columns: Optional[MetadataColumns] = None
+
+    @property
+    def count(self) -> int:
+        return len(self.rows)
+
+    def _map(self) -> None:
+        size = os.path.getsize(self.matrix_path) if os.path.exists(self.matrix_path) else 0
+        capacity = size // (4 * self.dimension)
+        self.matrix = np.memmap(self.matrix_path, dtype=np.float32, mode="r+", shape=(capacity, self.dimension)) if capacity else None
+
+    def _capacity(self) -> int:
+        return 0 if self.matrix is None else self.matrix.shape[0]
+
+    def refresh(self) -> None:
+        """
+        Apply log lines written since the last call (by this or another process)
+        """
+        size = os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0
+        if size < self._log_offset:
+            # The partition was dropped (and perhaps recreated) elsewhere
+            self._reset()
+        if size == self._log_offset:
+            return
+        with open(self.log_path, "rb") as handle:
+            handle.seek(self._log_offset)
+            data = handle.read(size - self._log_offset)
+        # A writer may be mid-line; leave the partial line for the next refresh
+        data = data[:data.rfind(b"\n") + 1]
+        self._log_offset += len(data)
+        for line in data.splitlines():
+            record = json.loads(line)
+            row = record["row"]
+            if row >= len(self.ids):
+                grow = row + 1 - len(self.ids)
+                self.ids.extend([None] * grow)
+                self.metadata.extend([None] * grow)
+            previous = self.ids[row]
+            if previous is not None and self.rows.get(previous) == row:
+                del self.rows[previous]
+            if record.get("deleted"):
+                self.ids[row] = None
+                self.metadata[row] = None
+            else:
+                self.ids[row] = record["id"]
+                self.metadata[row] = record["metadata"]
+                self.rows[record["id"]] = row
+        if len(self.ids) > self._capacity():
+            self._map()
+        self.live = np.array([vector_id is not None for vector_id in self.ids], dtype=bool)
+        self._columns = None
+
+    def _ensure_capacity(self, rows: int) -> None:
+        capacity = self._capacity()
+        if rows <= capacity:
+            return
+        # Re-read the file size: another process may have grown it already
+        self._map()
+        capacity = self._capacity()
+        if rows <= capacity:
+            return
+        capacity = max(rows, 2 * capacity, INITIAL_CAPACITY)
+        with open(self.matrix_path, "ab") as handle:
+            handle.truncate(capacity * 4 * self.dimension)
+        self._map()
+
+    def upsert(self, vectors: List[Tuple[str, np.ndarray, Dict[str, Any]]]) -> None:
+        with self.lock, _file_lock(self.lock_path):
+            self.refresh()
+            assigned: Dict[str, int] = {}
+            next_row = len(self.ids)
+            for vector_id, _, _ in vectors:
+                if vector_id not in assigned:
+                    row = self.rows.get(vector_id)
+                    if row is None:
+                        row, next_row = next_row, next_row + 1
+                    assigned[vector_id] = row
+            self._ensure_capacity(next_row)
+            rows = np.array([assigned[vector_id] for vector_id, _, _ in vectors])
+            self.matrix[rows] = normalize(np.stack([values for _, values, _ in vectors]))
+            self.matrix.flush()
+            # Rows are on disk before the log names them, so readers never see a stale row
+            with open(self.log_path, "a", encoding="utf-8") as log:
+                for vector_id, _, metadata in vectors:
+                    log.write(json.dumps({"row": assigned[vector_id], "id": vector_id, "metadata": metadata}) + "\n")
+            self.refresh()
+
+    def delete(self, vector_ids: Sequence[str]) -> int:
+        with self.lock, _file_lock(self.lock_path):
+            self.refresh()
+            rows = sorted({self.rows[vector_id] for vector_id in vector_ids if vector_id in self.rows})
+            if rows:
+                with open(self.log_path, "a", encoding="utf-8") as log:
+                    for row in rows:
+                        log.write(json.dumps({"row": row, "deleted": True}) + "\n")
+                self.refresh()
+            return len(rows)
+
+    def search(self, query: np.ndarray, top_k: int, validated_filter: Optional[Dict]) -> List[Dict[str, Any]]:
+        with self.lock:
+            self.refresh()
+            rows = len(self.ids)
+            if not self.rows:
+                return []
+            scores = self.matrix[:rows] @ query
+            # No mask at all while nothing in the partition has been deleted
+            mask = self.live if self.count < rows else None
+            if validated_filter:
+                if self._columns is None:
+                    self._columns = MetadataColumns(self.metadata)
+                matches = self._columns.mask(validated_filter)
+                mask = matches if mask is None else mask & matches
+            return [
+                {"id": self.ids[row], "score": float(scores[row]), "metadata": dict(self.metadata[row])}
+                for row in top_k_indices(scores, mask, top_k)
+            ]
+
+
+class LocalVectorStore:
+    """
+    Vector store on local disk with the PineconeService contract, for development,
+    CI load tests and air-gapped installs (VECTOR_STORE=local). Each user's vectors
+    form their own partition under LOCAL_VECTOR_DIR, searched exactly: one matrix-vector
+    product for cosine scores, metadata filters as column masks, argpartition for top-k.
+    """
+
+    def __init__(self, embedding_dimension: int = 1024, directory: Optional[str] = None):
+        self.embedding_dimension = embedding_dimension
+        self.directory = os.path.abspath(directory or os.getenv('LOCAL_VECTOR_DIR', './data/vectors'))
+        self.index_name = f"local:{self.directory}"
+        self._partitions: Dict[str, _Partition] = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        # Registry and route code checks `index is not None` for readiness
+        self.index = self
+        logger.info(f"Local vector store at {self.directory} (dimension {embedding_dimension})")
+
+    def revalidate(self):
+        """
+        Drop cached partitions so the next access reloads them from disk
+        """
+        with self._lock:
+            self._partitions.clear()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _partition_dir(self, user_id: str) -> str:
+        readable = re.sub(r"[^A-Za-z0-9_-]", "_", user_id)[:48]
+        digest = hashlib.sha1(user_id.encode("utf-8")).hexdigest()[:12]
+        return os.path.join(self.directory, f"{readable}-{digest}")
+
+    def _partition(self, user_id: str, create: bool = False) -> Optional[_Partition]:
+        with self._lock:
+            directory = self._partition_dir(user_id)
+            # Checked on every write: another process may have dropped the partition
+            if create and not os.path.isdir(directory):
+                os.makedirs(directory, exist_ok=True)
+                with open(os.path.join(directory, "partition.json"), "w", encoding="utf-8") as handle:
+                    json.dump({"user_id": user_id, "dimension": self.embedding_dimension}, handle)
+            partition = self._partitions.get(user_id)
+            if partition is None:
+                if not os.path.isdir(directory):
+                    return None
+                partition = self._partitions[user_id] = _Partition(directory, self.embedding_dimension, user_id)
+            return partition
+
+    def _all_partitions(self) -> List[_Partition]:
+        partitions = []
+        for name in sorted(os.listdir(self.directory)):
+            try:
+                with open(os.path.join(self.directory, name, "partition.json"), encoding="utf-8") as handle:
+                    user_id = json.load(handle)["user_id"]
+            except (OSError, ValueError, KeyError):
+                continue
+            partition = self._partition(user_id)
+            if partition is not None:
+                partitions.append(partition)
+        return partitions
+
+    def upsert_vectors(self, vectors: List[Dict[str, Any]], batch_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Write vectors to their metadata user_id's partition; an existing id is overwritten in place.
+        Returns: { total, accepted, skipped, errors: [str], failed_ids: [str] }
+        """
+        vectors = vectors or []
+        errors: List[str] = []
+        failed_ids: List[str] = []
+        by_user: Dict[str, List[Tuple[str, np.ndarray, Dict[str, Any]]]] = {}
+        for i, vector_data in enumerate(vectors):
+            embedding = vector_data.get('embedding') if isinstance(vector_data, dict) else None
+            metadata = (vector_data.get('metadata') or {}) if isinstance(vector_data, dict) else {}
+            problem = None
+            if not isinstance(embedding, list) or len(embedding) != self.embedding_dimension:
+                problem = "invalid embedding dimension" if isinstance(embedding, list) else "missing 'embedding'"
+            elif [k for k in ["user_id", "file_key"] if k not in metadata]:
+                problem = f"missing metadata {[k for k in ['user_id', 'file_key'] if k not in metadata]}"
+            if problem:
+                logger.error(f"Vector {i} skipped: {problem}")
+                errors.append(f"vector[{i}]: {problem}")
+                if isinstance(vector_data, dict) and vector_data.get('id'):
+                    failed_ids.append(vector_data['id'])
+                continue
+            by_user.setdefault(metadata['user_id'], []).append((vector_data.get('id') or str(uuid.uuid4()), np.asarray(embedding, dtype=np.float32), metadata))
+
+        accepted = 0
+        for user_id, user_vectors in by_user.items():
+            try:
+                self._partition(user_id, create=True).upsert(user_vectors)
+                accepted += len(user_vectors)
+            except Exception as e:
+                logger.error(f"Failed to write {len(user_vectors)} vector(s) of user {user_id}: {e}")
+                errors.append(f"user[{user_id}]: upsert failed: {str(e)[:200]}")
+                failed_ids.extend(vector_id for vector_id, _, _ in user_vectors)
+        return {"total": len(vectors), "accepted": accepted, "skipped": len(vectors) - accepted, "errors": errors, "failed_ids": failed_ids}
+
+    def search_similar(self, query_embedding: List[float], top_k: int = 5, filter_dict: Optional[Dict] = None, user_id: Optional[str] = None) -> List[Dict]:
+        """
+        Exact cosine search. With user_id (or a user_id equality filter) only that user's
+        partition is scanned; otherwise every partition is and the best matches are merged.
+        """
+        try:
+            if not isinstance(query_embedding, list) or len(query_embedding) != self.embedding_dimension:
+                logger.error(f"Invalid query embedding: expected {self.embedding_dimension} dimensions")
+                return []
+            if not isinstance(top_k, int) or top_k <= 0:
+                top_k = 5
+            validated_filter = validate_filter(filter_dict)
+            owner = user_id
+            if owner is None and validated_filter and set(validated_filter.get('user_id', {})) == {'$eq'}:
+                owner = validated_filter['user_id']['$eq']
+            query = normalize(np.asarray(query_embedding, dtype=np.float32))
+            if owner is not None:
+                partition = self._partition(owner)
+                return partition.search(query, top_k, validated_filter) if partition else []
+            matches = [match for partition in self._all_partitions() for match in partition.search(query, top_k, validated_filter)]
+            return sorted(matches, key=lambda match: match['score'], reverse=True)[:top_k]
+        except Exception as e:
+            logger.error(f"Error searching local vector store: {e}")
+            return []
+
+    async def search_similar_async(self, query_embedding: List[float], top_k: int = 5, filter_dict: Optional[Dict] = None, user_id: Optional[str] = None) -> List[Dict]:
+        """
+        search_similar on the bounded search executor; raises SearchBusyError when its queue is full
+        """
+        return await get_search_executor().run(self.search_similar, query_embedding, top_k, filter_dict, user_id)
+
+    def delete_vectors(self, vector_ids: List[str], user_id: Optional[str] = None) -> bool:
+        """
+        Delete vectors by IDs from the user's partition, or from every partition without user_id
+        """
+        try:
+            valid_ids = [vid for vid in vector_ids or [] if isinstance(vid, str) and vid.strip()]
+            if not valid_ids:
+                return not vector_ids
+            partitions = [self._partition(user_id)] if user_id else self._all_partitions()
+            deleted = sum(partition.delete(valid_ids) for partition in partitions if partition)
+            logger.info(f"Deleted {deleted} local vector(s)")
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting local vectors: {e}")
+            return False
+
+    def delete_user_vectors(self, user_id: str) -> bool:
+        """
+        Drop the user's partition
+        """
+        try:
+            partition = self._partition(user_id)
+            if partition is None:
+                return True
+            with partition.lock, _file_lock(partition.lock_path):
+                shutil.rmtree(partition.directory, ignore_errors=True)
+                partition._reset()
+            with self._lock:
+                self._partitions.pop(user_id, None)
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting local vectors of user {user_id}: {e}")
+            return False
+
+    def get_index_stats(self) -> Optional[Dict]:
+        try:
+            namespaces = {}
+            for partition in self._all_partitions():
+                with partition.lock:
+                    partition.refresh()
+                    namespaces[partition.user_id] = {"vector_count": partition.count}
+            return {
+                "dimension": self.embedding_dimension,
+                "total_vector_count": sum(namespace["vector_count"] for namespace in namespaces.values()),
+                "namespaces": namespaces,
+            }
+        except Exception as e:
+            logger.error(f"Error getting local vector store stats: {e}")
+            return None
+
+    def test_connection(self) -> bool:
+        return os.access(self.directory, os.W_OK)
+
+    def get_embedding_dimension(self) -> int:
+        return self.embedding_dimension
+
+    def health_check(self) -> Dict[str, Any]:
+        stats = self.get_index_stats()
+        healthy = stats is not None and self.test_connection()
+        details: Dict[str, Any] = {"connection": healthy, "directory": self.directory, "search_executor": get_search_executor().metrics()}
+        if stats:
+            details["index_stats"] = {"total_vector_count": stats["total_vector_count"], "dimension": stats["dimension"]}
+        return {"service": "local_vector_store", "status": "healthy" if healthy else "error", "details": details, "timestamp": time.time()}
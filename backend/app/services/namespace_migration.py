@@ -0,0 +1,166 @@
+import os
+import sys
+import logging
+import argparse
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+from app.services.pinecone_service import (
+    UPSERT_MAX_BYTES,
+    UPSERT_MAX_VECTORS,
+    namespace_mode,
+    pack_upsert_batches,
+    shared_namespace,
+    user_namespace,
+    user_vector_prefix,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _field(record: Any, name: str, default=None):
+    # The Pinecone client returns objects; tests and older clients return dicts
+    if isinstance(record, dict):
+        return record.get(name, default)
+    return getattr(record, name, default)
+
+
+class NamespaceMigrator:
+    """
+    Copies vectors from the shared namespace into per-user namespaces while the
+    service keeps running (PINECONE_NAMESPACE_MODE=migrating dual-writes new vectors
+    meanwhile). Ids are listed page by page and each page is fetched and upserted
+    into its owners' namespaces on a worker pool, with a bounded number of pages in
+    flight. Upserts are idempotent, so re-running or resuming from an earlier
+    pagination token is safe.
+    """
+
+    def __init__(self, pinecone_service, workers: int = 8, page_size: int = 100, delete_source: bool = False):
+        self.pinecone_service = pinecone_service
+        self.index = pinecone_service.index
+        self.workers = max(1, workers)
+        self.page_size = max(1, min(page_size, UPSERT_MAX_VECTORS))
+        self.delete_source = delete_source
+        self.source = shared_namespace()
+        self.stats: Dict[str, int] = {"pages": 0, "listed": 0, "copied": 0, "deleted": 0, "orphaned": 0, "failed": 0}
+        self.resume_token: Optional[str] = None
+
+    def _copy_page(self, ids: List[str]) -> Dict[str, int]:
+        fetched = _field(self.index.fetch(ids=ids, namespace=self.source), 'vectors') or {}
+        by_user: Dict[str, List[Dict[str, Any]]] = {}
+        orphaned = 0
+        for vector_id, vector in fetched.items():
+            metadata = dict(_field(vector, 'metadata') or {})
+            user_id = metadata.get('user_id')
+            if not user_id:
+                orphaned += 1
+                continue
+            by_user.setdefault(user_id, []).append({'id': vector_id, 'values': list(_field(vector, 'values')), 'metadata': metadata})
+
+        copied: List[str] = []
+        failed = 0
+        for user_id, vectors in by_user.items():
+            for batch in pack_upsert_batches(vectors, UPSERT_MAX_BYTES, UPSERT_MAX_VECTORS):
+                try:
+                    self.pinecone_service._upsert_batch(batch, user_namespace(user_id))
+                    copied.extend(vector['id'] for vector in batch)
+                except Exception as e:
+                    logger.error(f"Could not copy {len(batch)} vector(s) of user {user_id}: {e}")
+                    failed += len(batch)
+
+        deleted = 0
+        if self.delete_source and copied:
+            # Only vectors now present in their user's namespace leave the shared one
+            self.index.delete(ids=copied, namespace=self.source)
+            deleted = len(copied)
+        return {"copied": len(copied), "deleted": deleted, "orphaned": orphaned, "failed": failed}
+
+    def _collect(self, future: Future) -> None:
+        try:
+            result = future.result()
+        except Exception as e:
+            logger.error(f"Migration page failed: {e}")
+            result = {"failed": 1}
+        self.stats["pages"] += 1
+        for key, value in result.items():
+            self.stats[key] += value
+
+    def migrate(self, user_id: Optional[str] = None, pagination_token: Optional[str] = None) -> Dict[str, int]:
+        """
+        Copy every vector in the shared namespace (or only `user_id`'s, listed by id prefix).
+        resume_token tracks the listing position before the oldest unfinished page: pass
+        it as pagination_token to continue an interrupted run.
+        """
+        prefix = user_vector_prefix(user_id) if user_id else None
+        token = pagination_token
+        # (token the page was listed from, its future), oldest first
+        pages: Deque[Tuple[Optional[str], Future]] = deque()
+        pending = set()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="namespace-migration") as pool:
+            while True:
+                listing = self.index.list_paginated(prefix=prefix, limit=self.page_size, pagination_token=token, namespace=self.source)
+                ids = [_field(vector, 'id') for vector in _field(listing, 'vectors') or []]
+                if ids:
+                    # Bound memory: at most two pages per worker fetched or waiting
+                    while len(pending) >= 2 * self.workers:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            self._collect(future)
+                        self._advance(pages)
+                    future = pool.submit(self._copy_page, ids)
+                    pending.add(future)
+                    pages.append((token, future))
+                    self.stats["listed"] += len(ids)
+                pagination = _field(listing, 'pagination')
+                token = _field(pagination, 'next') if pagination else None
+                if not token:
+                    break
+            for future in list(pending):
+                self._collect(future)
+            pages.clear()
+        self.resume_token = None
+        return dict(self.stats)
+
+    def _advance(self, pages: Deque[Tuple[Optional[str], Future]]) -> None:
+        while pages and pages[0][1].done():
+            pages.popleft()
+        if pages:
+            self.resume_token = pages[0][0]
+            logger.info(f"Migration progress: {self.stats}; resume token {self.resume_token}")
+
+
+def main(argv: Sequence[str] = None) -> None:
+    """
+    Copy existing vectors from the shared namespace into per-user namespaces, e.g.
+    PINECONE_NAMESPACE_MODE=migrating python -m app.services.namespace_migration --workers 16
+    then switch to PINECONE_NAMESPACE_MODE=per_user once it reports no failures
+    """
+    parser = argparse.ArgumentParser(prog="python -m app.services.namespace_migration")
+    parser.add_argument("--user", help="only migrate this user's vectors")
+    parser.add_argument("--workers", type=int, default=int(os.getenv('NAMESPACE_MIGRATION_WORKERS', '8')))
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--resume-token", help="pagination token logged by an interrupted run")
+    parser.add_argument("--delete-source", action="store_true", help="remove copied vectors from the shared namespace")
+    args = parser.parse_args(argv)
+
+    if os.getenv('VECTOR_STORE', 'pinecone').lower() == 'local':
+        parser.error("the local vector store already keeps one partition per user")
+    if args.delete_source and namespace_mode() != 'per_user':
+        # Until the switch, searches still read the shared namespace
+        parser.error("--delete-source needs PINECONE_NAMESPACE_MODE=per_user")
+
+    logging.basicConfig(level=logging.INFO)
+    from app.services.registry import registry
+    migrator = NamespaceMigrator(registry.pinecone, workers=args.workers, page_size=args.page_size, delete_source=args.delete_source)
+    try:
+        stats = migrator.migrate(user_id=args.user, pagination_token=args.resume_token)
+    except KeyboardInterrupt:
+        sys.exit(f"Interrupted: {migrator.stats}; resume with --resume-token {migrator.resume_token}")
+    print(f"Namespace migration finished: {stats}")
+    if stats["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,82 @@
 import os
-import requests
-import requests.exceptions
+import asyncio
+import importlib.util
+import threading
+import weakref
+import httpx
 import json
-import time
 from typing import List, Optional, Tuple, Dict, Any
 import logging
 from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_exception_type
 import pybreaker
+from app.services.embedding_cache import EmbeddingCache, get_embedding_cache
 
 logger = logging.getLogger(__name__)
 
+# Pooled HTTP clients shared by every NIMService instance. httpx clients are bound to
+# the event loop they were first used on, so each loop (the API loop, every worker
+# thread's loop, a script's asyncio.run) gets its own client, dropped with its loop.
+_http_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+_http_clients_lock = threading.Lock()
+
+
+def _http2_enabled() -> bool:
+    if os.getenv('NIM_HTTP2', 'true').lower() not in ('1', 'true', 'yes'):
+        return False
+    if importlib.util.find_spec('h2') is None:
+        logger.warning("NIM_HTTP2 is enabled but the 'h2' package is not installed; falling back to HTTP/1.1")
+        return False
+    return True
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the shared keep-alive NIM HTTP client for the running event loop
+    """
+    loop = asyncio.get_running_loop()
+    with _http_clients_lock:
+        client = _http_clients.get(loop)
+        if client is not None and not client.is_closed:
+            return client
+        limits = httpx.Limits(
+            max_connections=int(os.getenv('NIM_HTTP_MAX_CONNECTIONS', '100')),
+            max_keepalive_connections=int(os.getenv('NIM_HTTP_MAX_KEEPALIVE', '20')),
+            keepalive_expiry=float(os.getenv('NIM_HTTP_KEEPALIVE_EXPIRY', '30')),
+        )
+        http2 = _http2_enabled()
+        client = httpx.AsyncClient(
+            http2=http2,
+            limits=limits,
+            timeout=httpx.Timeout(60.0, connect=10.0),
+        )
+        _http_clients[loop] = client
+    logger.info(
+        "NIM HTTP client created (http2=%s, max_connections=%s, max_keepalive=%s)",
+        http2,
+        limits.max_connections,
+        limits.max_keepalive_connections,
+    )
+    return client
+
+
+async def close_http_client() -> None:
+    """
+    Close every NIM HTTP client (called on application shutdown). The running loop's
+    client is closed here; clients of other open loops are closed on their own loop
+    the next time it runs.
+    """
+    loop = asyncio.get_running_loop()
+    with _http_clients_lock:
+        clients = list(_http_clients.items())
+        _http_clients.clear()
+    for client_loop, client in clients:
+        if client.is_closed:
+            continue
+        if client_loop is loop:
+            await client.aclose()
+        elif not client_loop.is_closed():
+            asyncio.run_coroutine_threadsafe(client.aclose(), client_loop)
+
 class EmbeddingError(Exception):
     """Custom exception for embedding-related errors"""
     def __init__(self, message: str, error_code: str = None, status_code: int = None):
@@ -34,9 +101,19 @@ class NIMService:
             'Authorization': auth_header,
             'Content-Type': 'application/json'
         }
-        # Use direct HTTP requests instead of OpenAI client to avoid proxy issues
-        self.client = None  # Will use direct requests
-        logger.info("NIM Service initialized with direct HTTP client")
+        # Use direct HTTP requests instead of OpenAI client to avoid proxy issues;
+        # the pooled async client is shared process-wide, see get_http_client()
+        self.client = None
+
+        # Embedding model and multi-input batching limits
+        self.embedding_model = os.getenv('NIM_EMBEDDING_MODEL', 'nvidia/nv-embedqa-e5-v5')
+        self.embed_batch_max_items = max(1, int(os.getenv('NIM_EMBED_BATCH_MAX_ITEMS', '50')))
+        self.embed_batch_max_tokens = max(1, int(os.getenv('NIM_EMBED_BATCH_MAX_TOKENS', '16384')))
+        self.embed_max_concurrency = max(1, int(os.getenv('NIM_EMBED_MAX_CONCURRENCY', '4')))
+
+        # Content-addressed embedding cache shared by all instances in this process
+        self.cache = get_embedding_cache()
+        logger.info("NIM Service initialized with shared async HTTP client")
 
     # Circuit breaker for NIM API
     _breaker = pybreaker.CircuitBreaker(
@@ -45,8 +122,8 @@ class NIMService:
         name="nim_embeddings_breaker"
     )
 
-    @retry(wait=wait_exponential(multiplier=1, min=1, max=8), stop=stop_after_attempt(3), retry=retry_if_exception_type((requests.exceptions.Timeout, requests.exceptions.ConnectionError)))
-    async def generate_embedding(self, text: str, max_retries: int = 2) -> Optional[List[float]]:
+    @retry(wait=wait_exponential(multiplier=1, min=1, max=8), stop=stop_after_attempt(3), retry=retry_if_exception_type((httpx.TimeoutException, httpx.TransportError)))
+    async def generate_embedding(self, text: str, max_retries: int = 2, input_type: str = "query") -> Optional[List[float]]:
         """
         Generate embedding for a text using Nvidia NIM API with detailed error handling
         """
@@ -67,41 +144,72 @@ class NIMService:
         # Check text length (NVIDIA models typically have limits)
         if len(text) > 8192:  # Conservative limit
             logger.warning(f"Input text is very long ({len(text)} chars), might cause issues")
-        
+
+        cache_key = EmbeddingCache.make_key(self.embedding_model, input_type, text)
+        if self.cache is not None:
+            cached = await self.cache.get(cache_key)
+            if cached:
+                logger.debug("Embedding served from cache")
+                return cached
+
+        embeddings = await self._request_embeddings([text], input_type=input_type, max_retries=max_retries)
+        embedding = embeddings[0]
+        if not embedding:
+            raise EmbeddingError(
+                "No valid embedding found in response",
+                error_code="INVALID_RESPONSE_FORMAT"
+            )
+        logger.debug(f"Embedding generated successfully, dimension: {len(embedding)}")
+        if self.cache is not None:
+            await self.cache.put(cache_key, embedding)
+        return embedding
+
+    async def _request_embeddings(self, inputs: List[str], input_type: str = "query", max_retries: int = 2) -> List[Optional[List[float]]]:
+        """
+        Send one /embeddings request for a list of inputs and return embeddings aligned
+        with the input order. Entries missing from the response come back as None.
+        """
         for attempt in range(max_retries + 1):
             try:
                 # Use the correct embeddings endpoint
                 url = f"{self.base_url}/embeddings"
                 
                 payload = {
-                    "model": "nvidia/nv-embedqa-e5-v5",
-                    "input": text,
-                    "input_type": "query",
+                    "model": self.embedding_model,
+                    "input": inputs if len(inputs) > 1 else inputs[0],
+                    "input_type": input_type,
                     "encoding_format": "float"
                 }
 
-                logger.debug(f"Attempting embedding generation (attempt {attempt + 1}/{max_retries + 1})")
+                logger.debug(f"Attempting embedding generation for {len(inputs)} input(s) (attempt {attempt + 1}/{max_retries + 1})")
                 
-                response = self._breaker.call(requests.post,
-                    url, 
-                    headers=self.headers, 
-                    json=payload,
-                    timeout=(10, 30)  # 10s connect, 30s read timeout
-                )
+                with self._breaker.calling():
+                    response = await get_http_client().post(
+                        url,
+                        headers=self.headers,
+                        json=payload,
+                        timeout=httpx.Timeout(30.0, connect=10.0)  # 10s connect, 30s read timeout
+                    )
                 
                 if response.status_code == 200:
                     result = response.json()
-                    # Extract embedding from response
+                    # Extract embeddings from response, mapping data[i].index back to input positions
                     if 'data' in result and len(result['data']) > 0:
-                        embedding = result['data'][0].get('embedding')
-                        if embedding and isinstance(embedding, list) and len(embedding) > 0:
-                            logger.debug(f"Embedding generated successfully, dimension: {len(embedding)}")
-                            return embedding
-                        else:
+                        embeddings: List[Optional[List[float]]] = [None] * len(inputs)
+                        for position, item in enumerate(result['data']):
+                            index = item.get('index', position)
+                            embedding = item.get('embedding')
+                            if not isinstance(index, int) or not 0 <= index < len(inputs):
+                                logger.warning(f"Ignoring embedding with out-of-range index {index}")
+                                continue
+                            if embedding and isinstance(embedding, list) and len(embedding) > 0:
+                                embeddings[index] = embedding
+                        if not any(embeddings):
                             raise EmbeddingError(
                                 f"No valid embedding found in response. Data structure: {result['data'][0].keys() if result['data'] else 'empty'}",
                                 error_code="INVALID_RESPONSE_FORMAT"
                             )
+                        return embeddings
                     else:
                         raise EmbeddingError(
                             f"Unexpected response format from NIM API. Response keys: {list(result.keys())}",
@@ -124,7 +232,7 @@ class NIMService:
                     if attempt < max_retries:
                         wait_time = (attempt + 1) * 2  # Exponential backoff
                         logger.warning(f"Rate limited, retrying in {wait_time}s...")
-                        time.sleep(wait_time)
+                        await asyncio.sleep(wait_time)
                         continue
                     else:
                         raise EmbeddingError(
@@ -136,7 +244,7 @@ class NIMService:
                     if attempt < max_retries:
                         wait_time = (attempt + 1) * 2
                         logger.warning(f"Server error {response.status_code}, retrying in {wait_time}s...")
-                        time.sleep(wait_time)
+                        await asyncio.sleep(wait_time)
                         continue
                     else:
                         raise EmbeddingError(
@@ -152,7 +260,7 @@ class NIMService:
                         status_code=response.status_code
                     )
 
-            except requests.exceptions.Timeout:
+            except httpx.TimeoutException:
                 if attempt < max_retries:
                     logger.warning(f"Request timeout, retrying (attempt {attempt + 1})...")
                     continue
@@ -161,10 +269,10 @@ class NIMService:
                         "Request timed out after multiple attempts",
                         error_code="TIMEOUT"
                     )
-            except requests.exceptions.ConnectionError as e:
+            except httpx.TransportError as e:
                 if attempt < max_retries:
                     logger.warning(f"Connection error, retrying (attempt {attempt + 1}): {str(e)[:100]}")
-                    time.sleep(1)  # Brief pause before retry
+                    await asyncio.sleep(1)  # Brief pause before retry
                     continue
                 else:
                     raise EmbeddingError(
@@ -213,71 +321,136 @@ class NIMService:
         except Exception:
             return []
 
-    async def generate_embeddings_batch(self, texts: List[str], max_concurrent: int = 5) -> List[Optional[List[float]]]:
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
         """
-        Generate embeddings for multiple texts with improved batch processing,
-        retry logic, and error aggregation
+        Cheap token estimate (~4 characters per token) used to size request batches
+        """
+        return max(1, (len(text) + 3) // 4)
+
+    def _plan_embedding_batches(self, items: List[Tuple[int, str]]) -> List[List[Tuple[int, str]]]:
+        """
+        Pack (index, text) items into request batches bounded by the configured
+        item count and estimated token budget, preserving input order
+        """
+        batches: List[List[Tuple[int, str]]] = []
+        current: List[Tuple[int, str]] = []
+        current_tokens = 0
+        for index, text in items:
+            tokens = self._estimate_tokens(text)
+            if current and (
+                len(current) >= self.embed_batch_max_items
+                or current_tokens + tokens > self.embed_batch_max_tokens
+            ):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+            current.append((index, text))
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    async def generate_embeddings_batch(self, texts: List[str], max_concurrent: Optional[int] = None, input_type: str = "query") -> List[Optional[List[float]]]:
+        """
+        Generate embeddings for multiple texts by packing them into multi-input
+        /embeddings requests. Returns a list aligned with texts; entries that could
+        not be embedded are None.
         """
-        import asyncio
-        from concurrent.futures import ThreadPoolExecutor
-        
         if not texts:
             logger.warning("No texts provided for batch embedding generation")
             return []
-        
-        logger.info(f"Generating embeddings for {len(texts)} texts with max_concurrent={max_concurrent}")
+
+        max_concurrent = max_concurrent or self.embed_max_concurrency
         
         # Track results and errors
-        results = [None] * len(texts)
-        failed_indices = []
-        
-        async def process_text_with_retry(index: int, text: str, max_retries: int = 2) -> None:
-            """Process a single text with retry logic"""
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        failed_indices: List[int] = []
+
+        items: List[Tuple[int, str]] = []
+        for index, text in enumerate(texts):
+            if not text or not isinstance(text, str) or not text.strip():
+                logger.error(f"Skipping text {index}: empty or not a string")
+                failed_indices.append(index)
+                continue
+            items.append((index, text.strip()))
+
+        # Serve cached embeddings and collapse duplicate texts so each unique text is sent once
+        keys = {index: EmbeddingCache.make_key(self.embedding_model, input_type, text) for index, text in items}
+        if self.cache is not None and items:
+            cached = await self.cache.get_many([keys[index] for index, _ in items])
+            for (index, _), embedding in zip(items, cached):
+                results[index] = embedding
+        duplicates: Dict[str, List[int]] = {}
+        pending: List[Tuple[int, str]] = []
+        for index, text in items:
+            if results[index] is not None:
+                continue
+            if keys[index] in duplicates:
+                duplicates[keys[index]].append(index)
+                continue
+            duplicates[keys[index]] = []
+            pending.append((index, text))
+
+        batches = self._plan_embedding_batches(pending)
+        logger.info(f"Generating embeddings for {len(texts)} texts ({len(items) - len(pending)} cached or duplicate) in {len(batches)} request(s) with max_concurrent={max_concurrent}")
+
+        semaphore = asyncio.Semaphore(max_concurrent)
+
+        async def process_batch(batch: List[Tuple[int, str]], max_retries: int = 2) -> None:
+            """Embed one packed batch, bisecting it when the API rejects its contents"""
             for attempt in range(max_retries + 1):
                 try:
-                    embedding = await self.generate_embedding(text, max_retries=1)  # Single retry per call
-                    results[index] = embedding
+                    async with semaphore:
+                        embeddings = await self._request_embeddings([text for _, text in batch], input_type=input_type, max_retries=1)
+                    for (index, _), embedding in zip(batch, embeddings):
+                        if embedding:
+                            results[index] = embedding
+                        else:
+                            logger.error(f"No embedding returned for text {index}")
+                            failed_indices.append(index)
                     return
                 except EmbeddingError as e:
                     if e.error_code in ["RATE_LIMITED", "TIMEOUT", "CONNECTION_ERROR", "SERVER_ERROR"] and attempt < max_retries:
                         wait_time = (attempt + 1) * 2  # Exponential backoff
-                        logger.warning(f"Retrying text {index} in {wait_time}s due to {e.error_code}")
+                        logger.warning(f"Retrying batch of {len(batch)} in {wait_time}s due to {e.error_code}")
                         await asyncio.sleep(wait_time)
                         continue
-                    else:
-                        logger.error(f"Failed to generate embedding for text {index}: {e.message}")
-                        failed_indices.append(index)
+                    if e.error_code in ["API_ERROR", "INVALID_RESPONSE_FORMAT"] and len(batch) > 1:
+                        # One bad input can fail the whole request; split to isolate it
+                        middle = len(batch) // 2
+                        logger.warning(f"Splitting batch of {len(batch)} after {e.error_code}")
+                        await asyncio.gather(process_batch(batch[:middle]), process_batch(batch[middle:]))
                         return
+                    logger.error(f"Failed to generate embeddings for texts {[index for index, _ in batch]}: {e.message}")
+                    failed_indices.extend(index for index, _ in batch)
+                    return
                 except Exception as e:
-                    logger.error(f"Unexpected error for text {index}: {e}")
-                    failed_indices.append(index)
+                    logger.error(f"Unexpected error for texts {[index for index, _ in batch]}: {e}")
+                    failed_indices.extend(index for index, _ in batch)
                     return
-        
-        # Process texts in batches to respect rate limits
-        batch_size = min(max_concurrent, len(texts))
-        for i in range(0, len(texts), batch_size):
-            batch_end = min(i + batch_size, len(texts))
-            batch_tasks = [
-                process_text_with_retry(idx, texts[idx])
-                for idx in range(i, batch_end)
-            ]
-            
-            logger.debug(f"Processing batch {i//batch_size + 1}/{(len(texts) + batch_size - 1)//batch_size}")
-            await asyncio.gather(*batch_tasks, return_exceptions=True)
-            
-            # Add delay between batches to respect rate limits
-            if batch_end < len(texts):
-                await asyncio.sleep(0.5)
+
+        await asyncio.gather(*(process_batch(batch) for batch in batches))
+
+        new_embeddings: Dict[str, List[float]] = {}
+        for index, _ in pending:
+            if results[index] is None:
+                failed_indices.extend(duplicates[keys[index]])
+                continue
+            new_embeddings[keys[index]] = results[index]
+            for duplicate_index in duplicates[keys[index]]:
+                results[duplicate_index] = results[index]
+        if self.cache is not None:
+            await self.cache.put_many(new_embeddings)
         
         # Log results summary
         successful = len([r for r in results if r is not None])
-        failed = len(failed_indices)
         success_rate = successful / len(texts) if texts else 0
         
         logger.info(f"Batch embedding generation completed: {successful}/{len(texts)} successful ({success_rate:.2%})")
         
         if failed_indices:
-            logger.warning(f"Failed to generate embeddings for texts at indices: {failed_indices}")
+            logger.warning(f"Failed to generate embeddings for texts at indices: {sorted(failed_indices)}")
         
         return results
 
@@ -316,6 +489,8 @@ class NIMService:
             
             health_status["details"]["api_key_configured"] = True
             health_status["details"]["base_url"] = self.base_url
+            if self.cache is not None:
+                health_status["details"]["embedding_cache"] = self.cache.stats()
             
             # Test embedding generation
             start_time = time.time()
@@ -408,11 +583,11 @@ class NIMService:
                 "stream": False
             }
             
-            response = requests.post(
+            response = await get_http_client().post(
                 f"{self.base_url}/chat/completions",
                 headers=self.headers,
                 json=payload,
-                timeout=60
+                timeout=60.0
             )
             
             if response.status_code == 200:
@@ -453,17 +628,16 @@ class NIMService:
             }
             
             try:
-                with requests.post(
+                async with get_http_client().stream(
+                    "POST",
                     f"{self.base_url}/chat/completions",
                     headers=self.headers,
                     json=payload,
-                    stream=True,
-                    timeout=(10, 60)  # (connect timeout, read timeout)
+                    timeout=httpx.Timeout(60.0, connect=10.0)  # (connect timeout, read timeout)
                 ) as response:
                     if response.status_code == 200:
-                        for line in response.iter_lines():
-                            if line:
-                                line_str = line.decode('utf-8')
+                        async for line_str in response.aiter_lines():
+                            if line_str:
                                 if line_str.startswith('data: '):
                                     data_str = line_str[6:]
                                     if data_str.strip() == '[DONE]':
@@ -478,13 +652,14 @@ class NIMService:
                                     except json.JSONDecodeError:
                                         continue
                     else:
+                        await response.aread()
                         error_msg = f"HTTP {response.status_code}: {response.text[:200]}"
                         print(f"NIM API streaming error: {error_msg}")
                         yield f"Error: API request failed ({response.status_code})\n"
-            except requests.exceptions.Timeout:
+            except httpx.TimeoutException:
                 print("NIM API timeout during streaming")
                 yield "Error: Request timed out. Please try again.\n"
-            except requests.exceptions.ConnectionError:
+            except httpx.TransportError:
                 print("NIM API connection error during streaming")
                 yield "Error: Connection failed. Please check your internet connection.\n"
                     
@@ -516,11 +691,11 @@ class NIMService:
                 "stream": False
             }
             
-            response = requests.post(
+            response = await get_http_client().post(
                 f"{self.base_url}/chat/completions",
                 headers=self.headers,
                 json=payload,
-                timeout=60
+                timeout=60.0
             )
             
             if response.status_code == 200:
@@ -560,17 +735,16 @@ class NIMService:
             }
             
             try:
-                with requests.post(
+                async with get_http_client().stream(
+                    "POST",
                     f"{self.base_url}/chat/completions",
                     headers=self.headers,
                     json=payload,
-                    stream=True,
-                    timeout=(10, 60)  # (connect timeout, read timeout)
+                    timeout=httpx.Timeout(60.0, connect=10.0)  # (connect timeout, read timeout)
                 ) as response:
                     if response.status_code == 200:
-                        for line in response.iter_lines():
-                            if line:
-                                line_str = line.decode('utf-8')
+                        async for line_str in response.aiter_lines():
+                            if line_str:
                                 if line_str.startswith('data: '):
                                     data_str = line_str[6:]
                                     if data_str.strip() == '[DONE]':
@@ -585,13 +759,14 @@ class NIMService:
                                     except json.JSONDecodeError:
                                         continue
                     else:
+                        await response.aread()
                         error_msg = f"HTTP {response.status_code}: {response.text[:200]}"
                         print(f"NIM API streaming error: {error_msg}")
                         yield f"Error: API request failed ({response.status_code})\n"
-            except requests.exceptions.Timeout:
+            except httpx.TimeoutException:
                 print("NIM API timeout during streaming")
                 yield "Error: Request timed out. Please try again.\n"
-            except requests.exceptions.ConnectionError:
+            except httpx.TransportError:
                 print("NIM API connection error during streaming")
                 yield "Error: Connection failed. Please check your internet connection.\n"
                     
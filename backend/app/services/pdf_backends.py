@@ -0,0 +1,275 @@
+import os
+import io
+import logging
+import importlib
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Preference order used when PDF_BACKENDS is not set; engines that are not installed are skipped
+DEFAULT_PDF_BACKENDS = "pymupdf,pypdfium2,pypdf,pypdf2"
+
+
+class PdfDocument:
+    """
+    An open PDF. Pages are requested in increasing order, so sequential engines
+    (pdfminer) do not need random access.
+    """
+    page_count: int = 0
+
+    def page_text(self, page_number: int) -> str:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "PdfDocument":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class PdfBackend:
+    """
+    A PDF text engine. `module` is imported lazily so that optional engines only
+    need to be installed where they are configured.
+    """
+    name = ""
+    module = ""
+
+    def is_available(self) -> bool:
+        try:
+            importlib.import_module(self.module)
+            return True
+        except ImportError:
+            return False
+
+    def open(self, file_path: str) -> PdfDocument:
+        raise NotImplementedError
+
+
+class _PdfReaderDocument(PdfDocument):
+    # PyPDF2 and pypdf share the PdfReader API
+    def __init__(self, reader_class, file_path: str):
+        self._file = open(file_path, 'rb')
+        try:
+            self._reader = reader_class(self._file)
+            self.page_count = len(self._reader.pages)
+        except Exception:
+            self._file.close()
+            raise
+
+    def page_text(self, page_number: int) -> str:
+        return self._reader.pages[page_number].extract_text() or ""
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class PyPDF2Backend(PdfBackend):
+    name = "pypdf2"
+    module = "PyPDF2"
+
+    def open(self, file_path: str) -> PdfDocument:
+        import PyPDF2
+        return _PdfReaderDocument(PyPDF2.PdfReader, file_path)
+
+
+class PypdfBackend(PdfBackend):
+    name = "pypdf"
+    module = "pypdf"
+
+    def open(self, file_path: str) -> PdfDocument:
+        import pypdf
+        return _PdfReaderDocument(pypdf.PdfReader, file_path)
+
+
+class _PyMuPDFDocument(PdfDocument):
+    def __init__(self, fitz, file_path: str):
+        self._document = fitz.open(file_path)
+        self.page_count = self._document.page_count
+
+    def page_text(self, page_number: int) -> str:
+        return self._document.load_page(page_number).get_text("text")
+
+    def close(self) -> None:
+        self._document.close()
+
+
+class PyMuPDFBackend(PdfBackend):
+    name = "pymupdf"
+    module = "fitz"
+
+    def open(self, file_path: str) -> PdfDocument:
+        import fitz
+        return _PyMuPDFDocument(fitz, file_path)
+
+
+class _PdfiumDocument(PdfDocument):
+    def __init__(self, pdfium, file_path: str):
+        self._document = pdfium.PdfDocument(file_path)
+        self.page_count = len(self._document)
+
+    def page_text(self, page_number: int) -> str:
+        page = self._document[page_number]
+        try:
+            textpage = page.get_textpage()
+            try:
+                return textpage.get_text_range()
+            finally:
+                textpage.close()
+        finally:
+            page.close()
+
+    def close(self) -> None:
+        self._document.close()
+
+
+class PdfiumBackend(PdfBackend):
+    name = "pypdfium2"
+    module = "pypdfium2"
+
+    def open(self, file_path: str) -> PdfDocument:
+        import pypdfium2
+        return _PdfiumDocument(pypdfium2, file_path)
+
+
+class _PdfminerDocument(PdfDocument):
+    def __init__(self, file_path: str):
+        from pdfminer.pdfparser import PDFParser
+        from pdfminer.pdfdocument import PDFDocument
+        from pdfminer.pdftypes import resolve1
+        self._file = open(file_path, 'rb')
+        try:
+            self._document = PDFDocument(PDFParser(self._file))
+            self.page_count = int(resolve1(self._document.catalog['Pages'])['Count'])
+        except Exception:
+            self._file.close()
+            raise
+        self._pages = None
+        self._next_page = 0
+
+    def page_text(self, page_number: int) -> str:
+        from pdfminer.converter import TextConverter
+        from pdfminer.layout import LAParams
+        from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+        from pdfminer.pdfpage import PDFPage
+
+        if self._pages is None or page_number < self._next_page:
+            self._pages = PDFPage.create_pages(self._document)
+            self._next_page = 0
+        page = None
+        while self._next_page <= page_number:
+            page = next(self._pages)
+            self._next_page += 1
+        output = io.StringIO()
+        manager = PDFResourceManager()
+        with TextConverter(manager, output, laparams=LAParams()) as converter:
+            PDFPageInterpreter(manager, converter).process_page(page)
+        return output.getvalue()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class PdfminerBackend(PdfBackend):
+    name = "pdfminer"
+    module = "pdfminer"
+
+    def open(self, file_path: str) -> PdfDocument:
+        return _PdfminerDocument(file_path)
+
+
+PDF_BACKENDS: Dict[str, PdfBackend] = {
+    backend.name: backend
+    for backend in (PyMuPDFBackend(), PdfiumBackend(), PypdfBackend(), PyPDF2Backend(), PdfminerBackend())
+}
+
+
+def get_pdf_backends(names: Optional[str] = None) -> List[PdfBackend]:
+    """
+    Installed backends in preference order, from `names` or PDF_BACKENDS
+    (comma-separated, e.g. "pymupdf,pypdf2"). The first is used for each document;
+    the rest are per-document fallbacks.
+    """
+    if names is None:
+        names = os.getenv('PDF_BACKENDS', DEFAULT_PDF_BACKENDS)
+    backends: List[PdfBackend] = []
+    for name in (part.strip().lower() for part in names.split(',')):
+        if not name:
+            continue
+        backend = PDF_BACKENDS.get(name)
+        if backend is None:
+            logger.warning(f"Unknown PDF backend '{name}' in PDF_BACKENDS; known: {', '.join(PDF_BACKENDS)}")
+        elif backend.is_available() and backend not in backends:
+            backends.append(backend)
+    if not backends:
+        # PyPDF2 is a hard requirement, so there is always an engine to use
+        backends.append(PDF_BACKENDS["pypdf2"])
+    return backends
+
+
+def open_pdf(file_path: str, backends: Sequence[PdfBackend]) -> Tuple[int, PdfDocument]:
+    """
+    Open a PDF with the first backend that can parse it. Returns (backend index, document).
+    """
+    for index, backend in enumerate(backends):
+        try:
+            return index, backend.open(file_path)
+        except Exception as e:
+            if index + 1 == len(backends):
+                raise
+            logger.warning(f"PDF backend {backend.name} could not open {file_path} ({e}); trying {backends[index + 1].name}")
+    raise ValueError("No PDF backends configured")
+
+
+def iter_page_texts(
+    file_path: str,
+    start: int = 0,
+    stop: Optional[int] = None,
+    backends: Optional[Sequence[PdfBackend]] = None,
+) -> Iterator[str]:
+    """
+    Yield the non-empty text of pages [start, stop) in order. If the current backend
+    fails, the rest of the document is read with the next configured backend, starting
+    from the page that failed. Pages that the last backend cannot read are skipped.
+    """
+    if backends is None:
+        backends = get_pdf_backends()
+    index, document = open_pdf(file_path, backends)
+    try:
+        page_count = document.page_count if stop is None else min(stop, document.page_count)
+        page = start
+        while page < page_count:
+            try:
+                page_text = document.page_text(page)
+            except Exception as e:
+                fallback = None
+                if index + 1 < len(backends):
+                    logger.warning(
+                        f"PDF backend {backends[index].name} failed on page {page} of {file_path} ({e}); "
+                        f"continuing with {backends[index + 1].name}"
+                    )
+                    try:
+                        offset, fallback = open_pdf(file_path, backends[index + 1:])
+                    except Exception as open_error:
+                        logger.warning(f"No fallback PDF backend could open {file_path}: {open_error}")
+                if fallback is not None:
+                    document.close()
+                    document = fallback
+                    index += 1 + offset
+                    continue
+                # Skip pages that fail extraction instead of failing the whole file
+                page_text = ""
+            if page_text:
+                yield page_text
+            page += 1
+    finally:
+        document.close()
+
+
+def pdf_page_count(file_path: str, backends: Optional[Sequence[PdfBackend]] = None) -> int:
+    _, document = open_pdf(file_path, backends or get_pdf_backends())
+    with document:
+        return document.page_count
@@ -1,14 +1,155 @@
 import os
 from pinecone import Pinecone, ServerlessSpec
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterator
 import uuid
+import json
+import asyncio
 import logging
-from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_exception_type
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_exception_type, retry_if_not_exception_type
 import pybreaker
 import re
+from app.services.search_executor import SearchBusyError, get_search_executor
+from app.services.vector_cache import TenantVectors, bump_user_versions, get_vector_cache
 
 logger = logging.getLogger(__name__)
 
+# Pinecone rejects upsert requests over 2MB or 1000 vectors. Batches are packed to a
+# byte budget below that, since the size of a vector's JSON depends on its metadata.
+UPSERT_MAX_VECTORS = 1000
+UPSERT_MAX_BYTES = int(1.5 * 1024 * 1024)
+# A float serialises to up to ~20 characters of JSON ("-0.012345678901234567,")
+_FLOAT_JSON_BYTES = 20
+_VECTOR_OVERHEAD_BYTES = 64
+
+# Ids per fetch request when loading a user into the vector cache (fetch ids travel in the URL)
+FETCH_BATCH_IDS = 100
+
+# Search attempts and the cap on the exponential backoff between them
+QUERY_ATTEMPTS = 3
+QUERY_RETRY_MAX_SECONDS = 8
+
+# Namespace layout. "shared": every user in one namespace, searches filter on user_id.
+# "migrating": writes go to the user's namespace and the shared one, searches still use
+# the shared one while namespace_migration copies existing vectors. "per_user": each
+# user's vectors and searches live in their own namespace.
+NAMESPACE_MODES = ("shared", "migrating", "per_user")
+
+_upsert_executor: Optional[ThreadPoolExecutor] = None
+_upsert_executor_lock = threading.Lock()
+
+
+def _get_upsert_executor(workers: int) -> ThreadPoolExecutor:
+    # One pool per process: it bounds in-flight upserts across all concurrent callers
+    global _upsert_executor
+    with _upsert_executor_lock:
+        if _upsert_executor is None:
+            _upsert_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pinecone-upsert")
+        return _upsert_executor
+
+
+def namespace_mode() -> str:
+    mode = os.getenv('PINECONE_NAMESPACE_MODE', 'shared').lower()
+    return mode if mode in NAMESPACE_MODES else 'shared'
+
+
+def shared_namespace() -> str:
+    return os.getenv('PINECONE_SHARED_NAMESPACE', '')
+
+
+def user_namespace(user_id: str) -> str:
+    return f"{os.getenv('PINECONE_USER_NAMESPACE_PREFIX', 'user-')}{user_id}"
+
+
+def user_vector_prefix(user_id: str) -> str:
+    """
+    Id prefix of a user's vectors: ids are {file_key}_chunk_{i} and file keys start with uploads/{user_id}/
+    """
+    return f"uploads/{user_id}/"
+
+
+def vector_owner(vector_id: str) -> Optional[str]:
+    """
+    user_id encoded in a vector id by user_vector_prefix, if any
+    """
+    match = re.match(r"uploads/([^/]+)/", vector_id)
+    return match.group(1) if match else None
+
+
+def estimate_upsert_bytes(vector: Dict[str, Any]) -> int:
+    """
+    Approximate size of one vector in an upsert request body
+    """
+    metadata = json.dumps(vector.get('metadata') or {}, ensure_ascii=False)
+    return len(str(vector.get('id', ''))) + len(metadata.encode('utf-8')) + _FLOAT_JSON_BYTES * len(vector['values']) + _VECTOR_OVERHEAD_BYTES
+
+
+def pack_upsert_batches(vectors: List[Dict[str, Any]], max_bytes: int, max_count: int) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Split vectors, in order, into batches of at most max_count vectors and about max_bytes each
+    """
+    batch: List[Dict[str, Any]] = []
+    batch_bytes = 0
+    for vector in vectors:
+        size = estimate_upsert_bytes(vector)
+        if batch and (batch_bytes + size > max_bytes or len(batch) >= max_count):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(vector)
+        batch_bytes += size
+    if batch:
+        yield batch
+
+
+def validate_filter(filter_dict: Optional[Dict]) -> Optional[Dict]:
+    """
+    Validate and clean a metadata filter dictionary for Pinecone compatibility (also the
+    filter dialect of the local vector store): bare values become {"$eq": value}
+    """
+    if not filter_dict:
+        return None
+        
+    try:
+        validated_filter = {}
+        
+        for key, value in filter_dict.items():
+            if not isinstance(key, str):
+                logger.warning(f"Skipping non-string filter key: {key}")
+                continue
+                
+            # Handle various filter value types
+            if isinstance(value, dict):
+                # Validate operator structure (e.g., {"$eq": "value"} or {"$in": ["val1", "val2"]})
+                validated_operators = {}
+                for op, op_value in value.items():
+                    if op in ["$eq", "$ne", "$gt", "$gte", "$lt", "$lte", "$in", "$nin"]:
+                        if op in ["$in", "$nin"] and isinstance(op_value, list):
+                            # Ensure list values are not empty
+                            if op_value:
+                                validated_operators[op] = op_value
+                            else:
+                                logger.warning(f"Empty list for operator {op}, skipping")
+                        elif op not in ["$in", "$nin"]:
+                            validated_operators[op] = op_value
+                        else:
+                            logger.warning(f"Invalid value type for operator {op}: expected list, got {type(op_value)}")
+                    else:
+                        logger.warning(f"Unsupported filter operator: {op}")
+                
+                if validated_operators:
+                    validated_filter[key] = validated_operators
+            else:
+                # Simple equality filter
+                validated_filter[key] = {"$eq": value}
+        
+        return validated_filter if validated_filter else None
+        
+    except Exception as e:
+        logger.error(f"Error validating filter: {e}")
+        return None
+
+
 class PineconeService:
     def __init__(self, embedding_dimension: int = 1024):
         # Validate required environment variables
@@ -43,6 +184,13 @@ class PineconeService:
         # Get or create index
         self.index = self._get_or_create_index()
 
+    def revalidate(self):
+        """
+        Re-run the index existence, dimension and readiness probes and rebind the index handle
+        """
+        self.index = self._get_or_create_index()
+        return self.index
+
     def _get_or_create_index(self):
         """
         Get existing index or create a new one with proper error handling
@@ -146,25 +294,90 @@ class PineconeService:
     _upsert_breaker = pybreaker.CircuitBreaker(fail_max=5, reset_timeout=30, name="pinecone_upsert_breaker")
     _query_breaker = pybreaker.CircuitBreaker(fail_max=5, reset_timeout=30, name="pinecone_query_breaker")
 
-    @retry(wait=wait_exponential(multiplier=1, min=1, max=8), stop=stop_after_attempt(3))
-    def upsert_vectors(self, vectors: List[Dict[str, Any]], batch_size: int = 100) -> Dict[str, Any]:
+    @retry(
+        wait=wait_exponential(multiplier=1, min=1, max=8),
+        stop=stop_after_attempt(3),
+        retry=retry_if_not_exception_type(pybreaker.CircuitBreakerError),
+        reraise=True,
+    )
+    def _upsert_batch(self, batch: List[Dict[str, Any]], namespace: str) -> int:
         """
-        Upsert vectors to Pinecone index with configurable batch size and detailed result summary
-        Returns: { total, accepted, skipped, errors: [str] }
+        Upsert one batch, retried on its own so batches that succeeded are never re-sent
+        """
+        # calling() records the outcome in the breaker without holding its lock for the
+        # request; breaker.call() would serialise every upsert in the process
+        with self._upsert_breaker.calling():
+            response = self.index.upsert(vectors=batch, namespace=namespace)
+        # Pinecone v5 returns dict-like with upserted_count possibly
+        upserted_count = None
+        try:
+            if isinstance(response, dict):
+                upserted_count = response.get('upserted_count') or response.get('count')
+            else:
+                upserted_count = getattr(response, 'upserted_count', None)
+        except Exception:
+            upserted_count = None
+        return upserted_count if isinstance(upserted_count, int) else len(batch)
+
+    def write_namespaces(self, user_id: Optional[str]) -> List[str]:
+        """
+        Namespaces a user's vectors are written to under PINECONE_NAMESPACE_MODE; the first is the primary one
+        """
+        mode = namespace_mode()
+        if not user_id or mode == 'shared':
+            return [shared_namespace()]
+        if mode == 'migrating':
+            return [user_namespace(user_id), shared_namespace()]
+        return [user_namespace(user_id)]
+
+    def read_namespace(self, user_id: Optional[str]) -> str:
+        if user_id and namespace_mode() == 'per_user':
+            return user_namespace(user_id)
+        return shared_namespace()
+
+    def fetch_user_vectors(self, user_id: str, max_vectors: int) -> Optional[TenantVectors]:
+        """
+        Every vector of a user, listed by id prefix in their read namespace and fetched in
+        pages, for the vector cache. Returns None as soon as there are more than max_vectors.
+        """
+        namespace = self.read_namespace(user_id)
+        ids: List[str] = []
+        for page in self.index.list(prefix=user_vector_prefix(user_id), namespace=namespace):
+            ids.extend(page)
+            if len(ids) > max_vectors:
+                return None
+        vectors: TenantVectors = []
+        for i in range(0, len(ids), FETCH_BATCH_IDS):
+            response = self.index.fetch(ids=ids[i:i + FETCH_BATCH_IDS], namespace=namespace)
+            fetched = response.get('vectors') if isinstance(response, dict) else getattr(response, 'vectors', None)
+            for vector_id, vector in (fetched or {}).items():
+                values = vector.get('values') if isinstance(vector, dict) else getattr(vector, 'values', None)
+                metadata = vector.get('metadata') if isinstance(vector, dict) else getattr(vector, 'metadata', None)
+                vectors.append((vector_id, list(values), dict(metadata or {})))
+        return vectors
+
+    def upsert_vectors(self, vectors: List[Dict[str, Any]], batch_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Upsert vectors to Pinecone index in batches sized by request bytes, with up to
+        PINECONE_UPSERT_CONCURRENCY batches in flight (1 = one after another). Each vector
+        goes to the namespace(s) of its metadata user_id (see write_namespaces).
+        Returns: { total, accepted, skipped, errors: [str], failed_ids: [str] }
         """
         try:
             if not self.index:
                 logger.error("Pinecone index not initialized")
-                return {"total": len(vectors or []), "accepted": 0, "skipped": len(vectors or []), "errors": ["Index not initialized"]}
+                return {"total": len(vectors or []), "accepted": 0, "skipped": len(vectors or []), "errors": ["Index not initialized"],
+                        "failed_ids": [v.get('id') for v in vectors or [] if v.get('id')]}
 
             if not vectors:
                 logger.warning("No vectors provided for upsert")
-                return {"total": 0, "accepted": 0, "skipped": 0, "errors": []}
+                return {"total": 0, "accepted": 0, "skipped": 0, "errors": [], "failed_ids": []}
 
             # Validate vectors and prepare for upsert
             upsert_data = []
             validation_skipped = 0
             errors: List[str] = []
+            failed_ids: List[str] = []
             for i, vector_data in enumerate(vectors):
                 try:
                     if 'embedding' not in vector_data:
@@ -199,31 +412,55 @@ class PineconeService:
                     validation_skipped += 1
                     errors.append(f"vector[{i}]: exception during preparation: {str(e)[:120]}")
                     continue
+            prepared_ids = {vector['id'] for vector in upsert_data}
+            failed_ids.extend(v.get('id') for v in vectors if isinstance(v, dict) and v.get('id') and v.get('id') not in prepared_ids)
 
             if not upsert_data:
                 logger.error("No valid vectors to upsert after validation")
-                return {"total": len(vectors), "accepted": 0, "skipped": len(vectors), "errors": errors or ["No valid vectors after validation"]}
-
-            logger.info(f"Upserting {len(upsert_data)} vectors in batches of {batch_size}")
+                return {"total": len(vectors), "accepted": 0, "skipped": len(vectors), "errors": errors or ["No valid vectors after validation"], "failed_ids": failed_ids}
+
+            max_count = min(batch_size or int(os.getenv('PINECONE_UPSERT_BATCH_SIZE', str(UPSERT_MAX_VECTORS))), UPSERT_MAX_VECTORS)
+            max_bytes = int(os.getenv('PINECONE_UPSERT_MAX_BYTES', str(UPSERT_MAX_BYTES)))
+            concurrency = max(1, int(os.getenv('PINECONE_UPSERT_CONCURRENCY', '4')))
+            # Group by target namespace; only the primary namespace counts towards accepted
+            targets: Dict[tuple, List[Dict[str, Any]]] = {}
+            for vector in upsert_data:
+                for position, namespace in enumerate(self.write_namespaces(vector['metadata'].get('user_id'))):
+                    targets.setdefault((namespace, position == 0), []).append(vector)
+            batches = [
+                (namespace, primary, batch)
+                for (namespace, primary), namespace_vectors in targets.items()
+                for batch in pack_upsert_batches(namespace_vectors, max_bytes, max(1, max_count))
+            ]
+            logger.info(f"Upserting {len(upsert_data)} vectors in {len(batches)} batch(es) across {len(targets)} namespace(s), up to {concurrency} in flight")
 
             # Upsert in batches with error handling
-            accepted = 0
-            for i in range(0, len(upsert_data), batch_size):
-                batch = upsert_data[i:i + batch_size]
-                try:
-                    response = self._upsert_breaker.call(self.index.upsert, vectors=batch)
-                    # Pinecone v5 returns dict-like with upserted_count possibly
-                    upserted_count = None
+            if concurrency == 1 or len(batches) == 1:
+                outcomes = []
+                for namespace, _, batch in batches:
                     try:
-                        if isinstance(response, dict):
-                            upserted_count = response.get('upserted_count') or response.get('count')
-                    except Exception:
-                        upserted_count = None
-                    accepted += upserted_count if isinstance(upserted_count, int) else len(batch)
-                    logger.debug(f"Successfully upserted batch {i//batch_size + 1}")
-                except Exception as e:
-                    logger.error(f"Failed to upsert batch {i//batch_size + 1}: {e}")
-                    errors.append(f"batch[{i//batch_size + 1}]: upsert failed: {str(e)[:200]}")
+                        outcomes.append(self._upsert_batch(batch, namespace))
+                    except Exception as e:
+                        outcomes.append(e)
+            else:
+                executor = _get_upsert_executor(concurrency)
+                futures = [executor.submit(self._upsert_batch, batch, namespace) for namespace, _, batch in batches]
+                outcomes = [future.exception() or future.result() for future in futures]
+
+            accepted = 0
+            failed = set()
+            for number, ((namespace, primary, batch), outcome) in enumerate(zip(batches, outcomes), start=1):
+                if isinstance(outcome, BaseException):
+                    logger.error(f"Failed to upsert batch {number} (namespace '{namespace}'): {outcome}")
+                    errors.append(f"batch[{number}]: upsert failed: {str(outcome)[:200]}")
+                    # A vector is only done once every namespace it is written to has it
+                    failed.update(vector['id'] for vector in batch)
+                else:
+                    accepted += outcome if primary else 0
+                    logger.debug(f"Successfully upserted batch {number}")
+            failed_ids.extend(vector['id'] for vector in upsert_data if vector['id'] in failed)
+            # Even a failed batch may have partly landed; cached copies of these users are out of date
+            bump_user_versions(vector['metadata'].get('user_id') for vector in upsert_data)
 
             total = len(vectors)
             skipped = (total - accepted)
@@ -236,117 +473,131 @@ class PineconeService:
             else:
                 logger.info(f"Upsert completed successfully. accepted={accepted}, total={total}")
 
-            return {"total": total, "accepted": accepted, "skipped": skipped, "errors": errors}
+            return {"total": total, "accepted": accepted, "skipped": skipped, "errors": errors, "failed_ids": failed_ids}
 
         except Exception as e:
             logger.error(f"Error upserting vectors to Pinecone: {e}")
-            return {"total": len(vectors or []), "accepted": 0, "skipped": len(vectors or []), "errors": [str(e)]}
+            return {"total": len(vectors or []), "accepted": 0, "skipped": len(vectors or []), "errors": [str(e)],
+                    "failed_ids": [v.get('id') for v in vectors or [] if isinstance(v, dict) and v.get('id')]}
 
-    @retry(wait=wait_exponential(multiplier=1, min=1, max=8), stop=stop_after_attempt(3))
-    def search_similar(self, query_embedding: List[float], top_k: int = 5, filter_dict: Optional[Dict] = None) -> List[Dict]:
+    def _prepare_search(self, query_embedding: List[float], top_k: int) -> Optional[int]:
         """
-        Search for similar vectors with comprehensive validation and error handling
+        Validate a search request; returns the effective top_k, or None if it cannot run
         """
-        try:
-            if not self.index:
-                logger.error("Pinecone index not initialized")
-                return []
-
-            # Validate query embedding
-            if not query_embedding or not isinstance(query_embedding, list):
-                logger.error("Invalid query embedding: must be a non-empty list")
-                return []
-            
-            if len(query_embedding) != self.embedding_dimension:
-                logger.error(f"Query embedding dimension mismatch: expected {self.embedding_dimension}, got {len(query_embedding)}")
-                return []
-
-            # Validate top_k parameter
-            if not isinstance(top_k, int) or top_k <= 0:
-                logger.warning(f"Invalid top_k value: {top_k}, using default of 5")
-                top_k = 5
-            elif top_k > 10000:  # Pinecone limit
-                logger.warning(f"top_k value {top_k} exceeds Pinecone limit, capping at 10000")
-                top_k = 10000
+        if not self.index:
+            logger.error("Pinecone index not initialized")
+            return None
 
-            # Validate and clean filter dictionary
-            validated_filter = self._validate_filter(filter_dict)
-            
-            logger.debug(f"Searching with top_k={top_k}, filter={validated_filter}")
+        # Validate query embedding
+        if not query_embedding or not isinstance(query_embedding, list):
+            logger.error("Invalid query embedding: must be a non-empty list")
+            return None
+        
+        if len(query_embedding) != self.embedding_dimension:
+            logger.error(f"Query embedding dimension mismatch: expected {self.embedding_dimension}, got {len(query_embedding)}")
+            return None
 
-            # Perform search
-            results = self._query_breaker.call(self.index.query,
+        # Validate top_k parameter
+        if not isinstance(top_k, int) or top_k <= 0:
+            logger.warning(f"Invalid top_k value: {top_k}, using default of 5")
+            top_k = 5
+        elif top_k > 10000:  # Pinecone limit
+            logger.warning(f"top_k value {top_k} exceeds Pinecone limit, capping at 10000")
+            top_k = 10000
+        return top_k
+
+    def _query(self, query_embedding: List[float], top_k: int, validated_filter: Optional[Dict], namespace: str) -> List[Dict]:
+        logger.debug(f"Searching namespace '{namespace}' with top_k={top_k}, filter={validated_filter}")
+
+        # Perform search; calling() keeps the breaker lock out of the request (see _upsert_batch)
+        with self._query_breaker.calling():
+            results = self.index.query(
                 vector=query_embedding,
                 top_k=top_k,
                 include_metadata=True,
-                filter=validated_filter
+                filter=validated_filter,
+                namespace=namespace
             )
 
-            # Format results
-            formatted_results = []
-            for match in results.matches:
-                formatted_results.append({
-                    'id': match.id,
-                    'score': match.score,
-                    'metadata': match.metadata or {}
-                })
-
-            logger.info(f"Search returned {len(formatted_results)} results")
-            return formatted_results
-
+        # Format results
+        formatted_results = []
+        for match in results.matches:
+            formatted_results.append({
+                'id': match.id,
+                'score': match.score,
+                'metadata': match.metadata or {}
+            })
+
+        logger.info(f"Search returned {len(formatted_results)} results")
+        return formatted_results
+
+    @retry(
+        wait=wait_exponential(multiplier=1, min=1, max=QUERY_RETRY_MAX_SECONDS),
+        stop=stop_after_attempt(QUERY_ATTEMPTS),
+        retry=retry_if_not_exception_type(pybreaker.CircuitBreakerError),
+        reraise=True,
+    )
+    def _query_with_retry(self, query_embedding: List[float], top_k: int, validated_filter: Optional[Dict], namespace: str) -> List[Dict]:
+        return self._query(query_embedding, top_k, validated_filter, namespace)
+
+    def search_similar(self, query_embedding: List[float], top_k: int = 5, filter_dict: Optional[Dict] = None, user_id: Optional[str] = None) -> List[Dict]:
+        """
+        Search for similar vectors with comprehensive validation and error handling.
+        With user_id the search runs in that user's namespace when namespaces are per user.
+        Blocks the calling thread, retry backoff included: async code uses search_similar_async.
+        """
+        try:
+            top_k = self._prepare_search(query_embedding, top_k)
+            if top_k is None:
+                return []
+            # Validate and clean filter dictionary
+            validated_filter = self._validate_filter(filter_dict)
+            return self._query_with_retry(query_embedding, top_k, validated_filter, self.read_namespace(user_id))
         except Exception as e:
             logger.error(f"Error searching Pinecone: {e}")
             return []
 
-    def _validate_filter(self, filter_dict: Optional[Dict]) -> Optional[Dict]:
+    async def search_similar_async(self, query_embedding: List[float], top_k: int = 5, filter_dict: Optional[Dict] = None, user_id: Optional[str] = None) -> List[Dict]:
         """
-        Validate and clean filter dictionary for Pinecone compatibility
+        search_similar for async handlers. Each attempt runs on the bounded search executor
+        and the backoff between attempts is an asyncio.sleep, so neither a slow query nor a
+        retry holds the event loop. Raises SearchBusyError when the executor queue is full.
         """
-        if not filter_dict:
-            return None
-            
-        try:
-            validated_filter = {}
-            
-            for key, value in filter_dict.items():
-                if not isinstance(key, str):
-                    logger.warning(f"Skipping non-string filter key: {key}")
-                    continue
-                    
-                # Handle various filter value types
-                if isinstance(value, dict):
-                    # Validate operator structure (e.g., {"$eq": "value"} or {"$in": ["val1", "val2"]})
-                    validated_operators = {}
-                    for op, op_value in value.items():
-                        if op in ["$eq", "$ne", "$gt", "$gte", "$lt", "$lte", "$in", "$nin"]:
-                            if op in ["$in", "$nin"] and isinstance(op_value, list):
-                                # Ensure list values are not empty
-                                if op_value:
-                                    validated_operators[op] = op_value
-                                else:
-                                    logger.warning(f"Empty list for operator {op}, skipping")
-                            elif op not in ["$in", "$nin"]:
-                                validated_operators[op] = op_value
-                            else:
-                                logger.warning(f"Invalid value type for operator {op}: expected list, got {type(op_value)}")
-                        else:
-                            logger.warning(f"Unsupported filter operator: {op}")
-                    
-                    if validated_operators:
-                        validated_filter[key] = validated_operators
-                else:
-                    # Simple equality filter
-                    validated_filter[key] = {"$eq": value}
-            
-            return validated_filter if validated_filter else None
-            
-        except Exception as e:
-            logger.error(f"Error validating filter: {e}")
-            return None
+        top_k = self._prepare_search(query_embedding, top_k)
+        if top_k is None:
+            return []
+        validated_filter = self._validate_filter(filter_dict)
+        # Users cached in this process (VECTOR_CACHE_MAX_MB) are searched in memory
+        cache = get_vector_cache(self.fetch_user_vectors) if user_id else None
+        if cache is not None:
+            cached = await cache.search(user_id, query_embedding, top_k, validated_filter)
+            if cached is not None:
+                return cached
+        namespace = self.read_namespace(user_id)
+        executor = get_search_executor()
+        for attempt in range(1, QUERY_ATTEMPTS + 1):
+            try:
+                return await executor.run(self._query, query_embedding, top_k, validated_filter, namespace)
+            except SearchBusyError:
+                raise
+            except pybreaker.CircuitBreakerError as e:
+                logger.error(f"Error searching Pinecone: {e}")
+                return []
+            except Exception as e:
+                if attempt == QUERY_ATTEMPTS:
+                    logger.error(f"Error searching Pinecone: {e}")
+                    return []
+                delay = min(QUERY_RETRY_MAX_SECONDS, 2 ** (attempt - 1))
+                logger.warning(f"Pinecone search attempt {attempt} failed, retrying in {delay}s: {e}")
+                await asyncio.sleep(delay)
+        return []
 
-    def delete_vectors(self, vector_ids: List[str]) -> bool:
+    def _validate_filter(self, filter_dict: Optional[Dict]) -> Optional[Dict]:
+        return validate_filter(filter_dict)
+
+    def delete_vectors(self, vector_ids: List[str], user_id: Optional[str] = None) -> bool:
         """
-        Delete vectors by IDs with validation
+        Delete vectors by IDs with validation, from every namespace the user's vectors are written to
         """
         try:
             if not self.index:
@@ -367,13 +618,45 @@ class PineconeService:
                 return False
 
             logger.info(f"Deleting {len(valid_ids)} vectors")
-            self.index.delete(ids=valid_ids)
+            try:
+                for namespace in self.write_namespaces(user_id):
+                    for i in range(0, len(valid_ids), UPSERT_MAX_VECTORS):
+                        self.index.delete(ids=valid_ids[i:i + UPSERT_MAX_VECTORS], namespace=namespace)
+            finally:
+                bump_user_versions([user_id] if user_id else [vector_owner(vid) for vid in valid_ids])
             return True
 
         except Exception as e:
             logger.error(f"Error deleting vectors from Pinecone: {e}")
             return False
 
+    def delete_user_vectors(self, user_id: str) -> bool:
+        """
+        Delete all of a user's vectors. A per-user namespace is dropped in one call; in the
+        shared namespace the user's ids are listed by prefix and deleted page by page.
+        """
+        try:
+            if not self.index:
+                logger.error("Pinecone index not initialized")
+                return False
+            mode = namespace_mode()
+            try:
+                if mode in ('migrating', 'per_user'):
+                    self.index.delete(delete_all=True, namespace=user_namespace(user_id))
+                if mode in ('shared', 'migrating'):
+                    deleted = 0
+                    for ids in self.index.list(prefix=user_vector_prefix(user_id), namespace=shared_namespace()):
+                        if ids:
+                            self.index.delete(ids=list(ids), namespace=shared_namespace())
+                            deleted += len(ids)
+                    logger.info(f"Deleted {deleted} vectors of user {user_id} from the shared namespace")
+            finally:
+                bump_user_versions([user_id])
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting vectors of user {user_id} from Pinecone: {e}")
+            return False
+
     def get_index_stats(self) -> Optional[Dict]:
         """
         Get index statistics
@@ -455,6 +738,12 @@ class PineconeService:
                     "dimension": stats.get('dimension')
                 }
             
+            # Queue depth and wait times of the search executor used by async handlers
+            health_status["details"]["search_executor"] = get_search_executor().metrics()
+            cache = get_vector_cache(self.fetch_user_vectors)
+            if cache is not None:
+                health_status["details"]["vector_cache"] = cache.metrics()
+
             # Test connection
             connection_ok = self.test_connection()
             health_status["details"]["connection"] = connection_ok
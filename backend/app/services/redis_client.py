@@ -0,0 +1,71 @@
+import os
+import asyncio
+import logging
+import threading
+import weakref
+from typing import Optional
+
+import redis
+import redis.asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+# Same default as the Celery broker so API processes and workers share one Redis
+DEFAULT_REDIS_URL = "redis://redis:6379/0"
+
+_sync_client: Optional[redis.Redis] = None
+# asyncio clients are bound to the event loop they connect on, so each loop (the API
+# loop, every worker thread's loop) gets its own client, dropped with its loop
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aioredis.Redis]" = weakref.WeakKeyDictionary()
+_async_clients_lock = threading.Lock()
+
+
+def get_redis_url() -> str:
+    return os.getenv("REDIS_URL", DEFAULT_REDIS_URL)
+
+
+def get_redis() -> redis.Redis:
+    """
+    Return the process-wide synchronous Redis client
+    """
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = redis.Redis.from_url(get_redis_url())
+    return _sync_client
+
+
+def get_async_redis() -> aioredis.Redis:
+    """
+    Return the process-wide asyncio Redis client for the running event loop
+    """
+    loop = asyncio.get_running_loop()
+    with _async_clients_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = aioredis.Redis.from_url(get_redis_url())
+            _async_clients[loop] = client
+    return client
+
+
+async def _close_client(client: aioredis.Redis) -> None:
+    try:
+        await client.aclose()
+    except Exception as e:
+        logger.warning(f"Error closing Redis client: {e}")
+
+
+async def close_async_redis() -> None:
+    """
+    Close every asyncio Redis client (called on application shutdown). The running
+    loop's client is closed here; clients of other open loops are closed on their own
+    loop the next time it runs.
+    """
+    loop = asyncio.get_running_loop()
+    with _async_clients_lock:
+        clients = list(_async_clients.items())
+        _async_clients.clear()
+    for client_loop, client in clients:
+        if client_loop is loop:
+            await _close_client(client)
+        elif not client_loop.is_closed():
+            asyncio.run_coroutine_threadsafe(_close_client(client), client_loop)
@@ -0,0 +1,149 @@
+import os
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from app.services.nim_service import NIMService
+from app.services.pinecone_service import PineconeService
+from app.services.s3_service import S3Service
+from app.services.supabase_service import SupabaseService
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceRegistry:
+    """
+    Process-level holder for long-lived service clients. Services are built once
+    (eagerly from the FastAPI lifespan, or lazily on first use) and shared by every
+    request, so expensive setup such as the Pinecone index probes runs only once.
+    """
+
+    SERVICE_NAMES = ("nim", "pinecone", "s3", "supabase")
+
+    def __init__(self):
+        self._services: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+        self._factories: Dict[str, Callable[[], Any]] = {
+            "nim": NIMService,
+            "pinecone": self._build_vector_store,
+            "s3": S3Service,
+            "supabase": SupabaseService,
+        }
+
+    def _build_vector_store(self) -> PineconeService:
+        # VECTOR_STORE=local swaps in the on-disk store, which has the same interface
+        if os.getenv('VECTOR_STORE', 'pinecone').lower() == 'local':
+            from app.services.local_vector_store import LocalVectorStore
+            return LocalVectorStore(embedding_dimension=self.nim.get_embedding_dimension())
+        return PineconeService(embedding_dimension=self.nim.get_embedding_dimension())
+
+    def get(self, name: str) -> Any:
+        """
+        Return the shared instance for a service, building it on first use
+        """
+        service = self._services.get(name)
+        if service is not None:
+            return service
+        with self._lock:
+            service = self._services.get(name)
+            if service is None:
+                factory = self._factories.get(name)
+                if factory is None:
+                    raise KeyError(f"Unknown service: {name}")
+                logger.info(f"Initializing shared {name} service")
+                service = factory()
+                self._services[name] = service
+            return service
+
+    @property
+    def nim(self) -> NIMService:
+        return self.get("nim")
+
+    @property
+    def pinecone(self) -> PineconeService:
+        return self.get("pinecone")
+
+    @property
+    def s3(self) -> S3Service:
+        return self.get("s3")
+
+    @property
+    def supabase(self) -> SupabaseService:
+        return self.get("supabase")
+
+    def startup(self, names: Optional[Iterable[str]] = None) -> Dict[str, bool]:
+        """
+        Eagerly build services. Failures are logged rather than raised so the
+        process can start; a failed service is retried lazily on first use.
+        """
+        status: Dict[str, bool] = {}
+        for name in names or self.SERVICE_NAMES:
+            try:
+                self.get(name)
+                status[name] = True
+            except Exception as e:
+                logger.error(f"Failed to initialize {name} service at startup: {e}")
+                status[name] = False
+        return status
+
+    def refresh(self, name: str) -> Any:
+        """
+        Drop and rebuild a service, e.g. after rotating credentials or recreating the index
+        """
+        with self._lock:
+            self._services.pop(name, None)
+            return self.get(name)
+
+    def revalidate(self) -> Dict[str, Any]:
+        """
+        Re-run the Pinecone index probes (existence, dimension, readiness) on the shared client
+        """
+        pinecone_service = self.pinecone
+        pinecone_service.revalidate()
+        return {"index_name": pinecone_service.index_name, "ready": pinecone_service.index is not None}
+
+    async def shutdown(self) -> None:
+        """
+        Release pooled clients and forget all instances
+        """
+        from app.services.nim_service import close_http_client
+        from app.services.redis_client import close_async_redis
+        from app.services.job_events import close_job_event_hub
+        from app.services.search_executor import shutdown_search_executor
+        from app.services.vector_cache import shutdown_vector_cache
+        try:
+            await close_http_client()
+        except Exception as e:
+            logger.warning(f"Error closing NIM HTTP client: {e}")
+        try:
+            await close_job_event_hub()
+        except Exception as e:
+            logger.warning(f"Error closing job event subscription: {e}")
+        try:
+            await close_async_redis()
+        except Exception as e:
+            logger.warning(f"Error closing Redis client: {e}")
+        shutdown_search_executor()
+        shutdown_vector_cache()
+        with self._lock:
+            self._services.clear()
+
+
+registry = ServiceRegistry()
+
+
+# FastAPI dependencies handing out the shared instances
+def get_nim_service() -> NIMService:
+    return registry.nim
+
+
+def get_pinecone_service() -> PineconeService:
+    return registry.pinecone
+
+
+def get_s3_service() -> S3Service:
+    return registry.s3
+
+
+def get_supabase_service() -> SupabaseService:
+    return registry.supabase
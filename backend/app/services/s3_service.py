@@ -96,6 +96,21 @@ class S3Service:
             print(f"Error getting file size from S3: {e}")
             return None
 
+    async def get_object_info(self, file_key: str) -> Optional[dict]:
+        """
+        Get size and content identity (ETag) of a file in S3 with a single HEAD request
+        """
+        try:
+            response = self.s3_client.head_object(Bucket=self.bucket_name, Key=file_key)
+            return {
+                'size': response.get('ContentLength', 0),
+                'etag': (response.get('ETag') or '').strip('"') or None,
+                'content_type': response.get('ContentType'),
+            }
+        except ClientError as e:
+            print(f"Error getting file info from S3: {e}")
+            return None
+
     def cleanup_temp_file(self, file_path: str):
         """
         Clean up temporary file
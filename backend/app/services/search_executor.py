@@ -0,0 +1,123 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SearchBusyError(Exception):
+    """The search executor's queue is full; the caller should back off"""
+    pass
+
+
+class BoundedExecutor:
+    """
+    Dedicated thread pool for blocking vector-search calls made from async handlers.
+    At most `workers` calls run at once and at most `max_queue` more wait for a
+    thread; beyond that run() raises SearchBusyError instead of queueing without
+    limit. Keeps queue-depth and wait-time metrics for the health endpoint.
+    """
+
+    def __init__(self, name: str, workers: int, max_queue: int):
+        self.name = name
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self.stats: Dict[str, float] = {
+            "submitted": 0, "completed": 0, "failed": 0, "rejected": 0,
+            "max_queue_depth": 0, "wait_seconds": 0.0, "run_seconds": 0.0,
+        }
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            done = self.stats["completed"] + self.stats["failed"]
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "queue_depth": self._queued,
+                "running": self._running,
+                **{key: value for key, value in self.stats.items() if key not in ("wait_seconds", "run_seconds")},
+                "avg_wait_ms": round(1000 * self.stats["wait_seconds"] / done, 2) if done else 0.0,
+                "avg_run_ms": round(1000 * self.stats["run_seconds"] / done, 2) if done else 0.0,
+            }
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        with self._lock:
+            if self._queued + self._running >= self.workers + self.max_queue:
+                self.stats["rejected"] += 1
+                raise SearchBusyError(f"{self.name}: {self._queued} call(s) already waiting")
+            self._queued += 1
+            self.stats["submitted"] += 1
+            self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self._queued)
+        enqueued = time.monotonic()
+        state = {"started": False, "abandoned": False}
+
+        def call() -> Optional[T]:
+            started = time.monotonic()
+            with self._lock:
+                if state["abandoned"]:
+                    return None
+                state["started"] = True
+                self._queued -= 1
+                self._running += 1
+                self.stats["wait_seconds"] += started - enqueued
+            outcome = "failed"
+            try:
+                result = func(*args)
+                outcome = "completed"
+                return result
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self.stats[outcome] += 1
+                    self.stats["run_seconds"] += time.monotonic() - started
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, call)
+        except asyncio.CancelledError:
+            # A call still waiting for a thread (client went away) is dropped, not run later
+            with self._lock:
+                if not state["started"]:
+                    state["abandoned"] = True
+                    self._queued -= 1
+            raise
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_search_executor: Optional[BoundedExecutor] = None
+_search_executor_lock = threading.Lock()
+
+
+def get_search_executor() -> BoundedExecutor:
+    """
+    Return the process-wide executor for vector searches (PINECONE_QUERY_CONCURRENCY
+    threads, PINECONE_QUERY_MAX_QUEUE waiting calls)
+    """
+    global _search_executor
+    with _search_executor_lock:
+        if _search_executor is None:
+            _search_executor = BoundedExecutor(
+                "vector-search",
+                workers=int(os.getenv('PINECONE_QUERY_CONCURRENCY', '8')),
+                max_queue=int(os.getenv('PINECONE_QUERY_MAX_QUEUE', '64')),
+            )
+        return _search_executor
+
+
+def shutdown_search_executor() -> None:
+    global _search_executor
+    with _search_executor_lock:
+        if _search_executor is not None:
+            _search_executor.shutdown()
+        _search_executor = None
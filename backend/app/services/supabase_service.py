@@ -1,8 +1,16 @@
 import os
 from supabase import create_client, Client
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional
 from datetime import datetime, timezone
 
+# Values per `in` filter: the filter is sent in the query string, so long key lists are split
+IN_FILTER_BATCH = 100
+
+
+def _batches(values: List, size: int = IN_FILTER_BATCH) -> Iterable[List]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
 class SupabaseService:
     def __init__(self):
         self.url = os.getenv('SUPABASE_URL')
@@ -120,6 +128,18 @@ class SupabaseService:
             print(f"Error updating file status: {e}")
             return False
 
+    async def update_file_last_error(self, file_id: str, last_error: str) -> bool:
+        """
+        Record an error on a file without changing its status (e.g. an ingest attempt that will be retried)
+        """
+        try:
+            result = self.client.table('files').update({'last_error': last_error}).eq('id', file_id).execute()
+            return len(result.data) > 0
+
+        except Exception as e:
+            print(f"Error updating file last error: {e}")
+            return False
+
     async def update_file_size(self, file_id: str, file_size: int) -> bool:
         """
         Update file size for an existing file record
@@ -253,6 +273,18 @@ class SupabaseService:
             print(f"Error updating job status: {e}")
             return False
 
+    async def update_job_progress(self, job_id: str, progress: Dict) -> bool:
+        """
+        Record chunk-level ingest progress (total/embedded/upserted counts and checkpoint) on a job
+        """
+        try:
+            result = self.client.table('processing_jobs').update(progress).eq('id', job_id).execute()
+            return len(result.data) > 0
+
+        except Exception as e:
+            print(f"Error updating job progress: {e}")
+            return False
+
     async def get_job(self, job_id: str) -> Optional[Dict]:
         """
         Fetch a processing job by id
@@ -292,6 +324,118 @@ class SupabaseService:
             print(f"Error fetching latest job by file: {e}")
             return None
 
+    async def get_files_by_keys(self, file_keys: List[str], user_id: str) -> Dict[str, Dict]:
+        """
+        Fetch a user's file records for many file keys at once, keyed by file_key
+        """
+        files: Dict[str, Dict] = {}
+        try:
+            for batch in _batches(file_keys):
+                result = self.client.table('files').select('*').eq('user_id', user_id).in_('file_key', batch).execute()
+                for row in result.data or []:
+                    files[row['file_key']] = row
+            return files
+        except Exception as e:
+            print(f"Error getting files by keys: {e}")
+            return files
+
+    async def create_file_records(self, files_data: List[Dict]) -> List[Dict]:
+        """
+        Insert many file records in one request; returns the created rows
+        """
+        if not files_data:
+            return []
+        try:
+            created_at = datetime.now(timezone.utc).isoformat()
+            data = [{
+                'file_key': file_data['file_key'],
+                'file_name': file_data['file_name'],
+                'user_id': file_data['user_id'],
+                'file_size': file_data.get('file_size', 0),
+                'content_type': file_data.get('content_type', ''),
+                'status': file_data.get('status', 'uploaded'),
+                'chunks_count': 0,
+                'embedding_count': 0,
+                'last_error': None,
+                'created_at': created_at,
+                'processed_at': None
+            } for file_data in files_data]
+            result = self.client.table('files').insert(data).execute()
+            return result.data or []
+        except Exception as e:
+            print(f"Error creating file records: {e}")
+            return []
+
+    async def get_latest_jobs_by_files(self, file_ids: List[str], user_id: str) -> Dict[str, Dict]:
+        """
+        Latest job per file for many files at once, keyed by file_id
+        """
+        jobs: Dict[str, Dict] = {}
+        try:
+            for batch in _batches(file_ids):
+                result = self.client.table('processing_jobs').select('id,file_id,status,created_at').eq('user_id', user_id).in_('file_id', batch).order('created_at', desc=True).execute()
+                for row in result.data or []:
+                    # Rows are newest first, so the first one seen per file is its latest job
+                    jobs.setdefault(row['file_id'], row)
+            return jobs
+        except Exception as e:
+            print(f"Error getting latest jobs by files: {e}")
+            return jobs
+
+    async def get_jobs_by_ids(self, job_ids: List[str], user_id: str) -> Dict[str, Dict]:
+        """
+        Many of a user's jobs at once, keyed by job id; other users' jobs are left out
+        """
+        jobs: Dict[str, Dict] = {}
+        try:
+            for batch in _batches(job_ids):
+                result = self.client.table('processing_jobs').select('*').eq('user_id', user_id).in_('id', batch).execute()
+                for row in result.data or []:
+                    jobs[row['id']] = row
+            return jobs
+        except Exception as e:
+            print(f"Error getting jobs by ids: {e}")
+            return jobs
+
+    async def create_processing_jobs(self, file_ids: List[str], user_id: str, status: str = 'queued') -> Dict[str, str]:
+        """
+        Insert one job per file in one request; returns {file_id: job_id}
+        """
+        if not file_ids:
+            return {}
+        try:
+            created_at = datetime.now(timezone.utc).isoformat()
+            data = [{
+                'file_id': file_id,
+                'user_id': user_id,
+                'status': status,
+                'created_at': created_at,
+                'completed_at': None
+            } for file_id in file_ids]
+            result = self.client.table('processing_jobs').insert(data).execute()
+            return {row['file_id']: row['id'] for row in result.data or []}
+        except Exception as e:
+            print(f"Error creating processing jobs: {e}")
+            return {}
+
+    async def update_jobs_status(self, job_ids: List[str], status: str) -> int:
+        """
+        Set the status of many jobs; returns how many rows were updated
+        """
+        updated = 0
+        try:
+            update_data = {
+                'status': status,
+                'completed_at': datetime.now(timezone.utc).isoformat() if status == 'completed' else None
+            }
+            for batch in _batches(job_ids):
+                result = self.client.table('processing_jobs').update(update_data).in_('id', batch).execute()
+                updated += len(result.data or [])
+            return updated
+        except Exception as e:
+            print(f"Error updating jobs status: {e}")
+            return updated
+
     async def test_connection(self) -> bool:
         """
         Test connection to Supabase
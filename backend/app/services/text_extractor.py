@@ -1,7 +1,78 @@
-import PyPDF2
-import docx
 import os
-from typing import List, Optional
+import logging
+import multiprocessing
+import threading
+import zipfile
+from xml.etree import ElementTree
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional
+
+from app.services.pdf_backends import get_pdf_backends, iter_page_texts, pdf_page_count
+
+logger = logging.getLogger(__name__)
+
+
+# WordprocessingML element tags, as ElementTree reports them
+_W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_W_BODY = _W_NS + "body"
+_W_P = _W_NS + "p"
+_W_T = _W_NS + "t"
+_W_TAB = _W_NS + "tab"
+_W_BREAKS = (_W_NS + "br", _W_NS + "cr")
+_W_TBL = _W_NS + "tbl"
+_W_TR = _W_NS + "tr"
+_W_TC = _W_NS + "tc"
+
+# Process pool for parallel PDF page extraction, created on first use and reused
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+_pdf_pool_workers = 0
+_pdf_pool_lock = threading.Lock()
+_pdf_pool_skip_logged = False
+
+
+def _pdf_pool_allowed() -> bool:
+    """
+    Daemonic processes, such as the tasks of Celery's prefork pool, may not start a
+    process pool; they extract serially. With EXTRACTION_SANDBOX_ENABLED (the default)
+    extraction runs in the sandbox child, a regular process that can use the pool.
+    """
+    global _pdf_pool_skip_logged
+    if not multiprocessing.current_process().daemon:
+        return True
+    with _pdf_pool_lock:
+        if not _pdf_pool_skip_logged:
+            _pdf_pool_skip_logged = True
+            logger.info("Running in a daemonic process: PDF pages are extracted serially here")
+    return False
+
+
+def _get_pdf_pool(workers: int) -> ProcessPoolExecutor:
+    global _pdf_pool, _pdf_pool_workers
+    with _pdf_pool_lock:
+        if _pdf_pool is None or _pdf_pool_workers != workers:
+            if _pdf_pool is not None:
+                _pdf_pool.shutdown(wait=False, cancel_futures=True)
+            # forkserver/spawn avoid forking a process that already runs threads (HTTP pools, to_thread workers)
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _pdf_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+            _pdf_pool_workers = workers
+        return _pdf_pool
+
+
+def _reset_pdf_pool() -> None:
+    global _pdf_pool, _pdf_pool_workers
+    with _pdf_pool_lock:
+        if _pdf_pool is not None:
+            _pdf_pool.shutdown(wait=False, cancel_futures=True)
+        _pdf_pool = None
+        _pdf_pool_workers = 0
+
+
+def _extract_pdf_page_range(file_path: str, start: int, stop: int) -> List[str]:
+    """
+    Pool worker: extract pages [start, stop) exactly as the serial path does
+    """
+    return list(iter_page_texts(file_path, start, stop))
 
 class TextExtractor:
     @staticmethod
@@ -10,52 +81,144 @@ class TextExtractor:
         Extract text from PDF file
         """
         try:
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                text = ""
-                for page in pdf_reader.pages:
-                    try:
-                        page_text = page.extract_text()
-                        if page_text:
-                            text += page_text + "\n"
-                    except Exception:
-                        # Skip pages that fail extraction instead of failing the whole file
-                        continue
-                text = text.strip()
-
-                # If no selectable text found, optionally attempt OCR (behind env flag)
-                if not text:
-                    enable_ocr = (os.getenv('ENABLE_OCR', '').lower() in ('1', 'true', 'yes'))
-                    if enable_ocr:
-                        # TODO: Implement OCR path (e.g., using Tesseract or an OCR service)
-                        # For now, leave a stub and return None to signal no text extracted
-                        print("OCR not implemented yet. ENABLE_OCR is true but OCR path is a TODO.")
-                        return None
-                    else:
-                        # Explicitly indicate that no text was found and OCR is disabled
-                        print("No selectable text detected in PDF and OCR is disabled.")
-                        return None
-
-                return text
+            text = "".join(page_text + "\n" for page_text in TextExtractor.iter_pdf_pages(file_path)).strip()
+
+            # If no selectable text found, optionally attempt OCR (behind env flag)
+            if not text:
+                enable_ocr = (os.getenv('ENABLE_OCR', '').lower() in ('1', 'true', 'yes'))
+                if enable_ocr:
+                    # TODO: Implement OCR path (e.g., using Tesseract or an OCR service)
+                    # For now, leave a stub and return None to signal no text extracted
+                    print("OCR not implemented yet. ENABLE_OCR is true but OCR path is a TODO.")
+                    return None
+                else:
+                    # Explicitly indicate that no text was found and OCR is disabled
+                    print("No selectable text detected in PDF and OCR is disabled.")
+                    return None
+
+            return text
         except Exception as e:
             print(f"Error extracting text from PDF: {e}")
             return None
 
+    @staticmethod
+    def iter_pdf_pages(file_path: str, workers: Optional[int] = None, parallel_min_pages: Optional[int] = None) -> Iterator[str]:
+        """
+        Yield the text of each PDF page, in page order, as it is extracted.
+
+        PDFs with at least parallel_min_pages pages (PDF_PARALLEL_MIN_PAGES) are split
+        into page ranges extracted by a pool of `workers` processes (PDF_EXTRACT_WORKERS);
+        smaller files, workers <= 1, or a daemonic caller use the serial path. Both
+        produce identical output.
+        """
+        if workers is None:
+            workers = int(os.getenv('PDF_EXTRACT_WORKERS', str(min(4, os.cpu_count() or 1))))
+        if parallel_min_pages is None:
+            parallel_min_pages = int(os.getenv('PDF_PARALLEL_MIN_PAGES', '100'))
+
+        # The engine is chosen by PDF_BACKENDS, with per-document fallback (see pdf_backends)
+        backends = get_pdf_backends()
+        page_count = pdf_page_count(file_path, backends) if workers > 1 and _pdf_pool_allowed() else 0
+        if page_count < max(parallel_min_pages, 2):
+            yield from iter_page_texts(file_path, backends=backends)
+            return
+
+        # Several ranges per worker so a slow range does not leave other workers idle
+        range_size = max(1, -(-page_count // (workers * 4)))
+        ranges = [(start, min(start + range_size, page_count)) for start in range(0, page_count, range_size)]
+        next_range = 0
+        futures = []
+        try:
+            pool = _get_pdf_pool(workers)
+            futures = [pool.submit(_extract_pdf_page_range, file_path, start, stop) for start, stop in ranges]
+            for future in futures:
+                pages = future.result()
+                next_range += 1
+                yield from pages
+        except Exception as e:
+            if next_range >= len(ranges):
+                raise
+            # A broken pool should not fail the document; finish the remaining pages serially
+            logger.warning(f"Parallel PDF extraction failed ({e}); continuing serially from page {ranges[next_range][0]}")
+            _reset_pdf_pool()
+            yield from iter_page_texts(file_path, ranges[next_range][0], backends=backends)
+        finally:
+            # Consumer stopped early or we fell back: do not leave queued ranges running
+            for future in futures:
+                future.cancel()
+
     @staticmethod
     def extract_text_from_docx(file_path: str) -> Optional[str]:
         """
         Extract text from DOCX file
         """
         try:
-            doc = docx.Document(file_path)
-            text = ""
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-            return text.strip()
+            return "".join(TextExtractor.iter_docx_paragraphs(file_path)).strip()
         except Exception as e:
             print(f"Error extracting text from DOCX: {e}")
             return None
 
+    @staticmethod
+    def iter_docx_paragraphs(file_path: str) -> Iterator[str]:
+        """
+        Stream text from a DOCX by parsing word/document.xml straight out of the zip,
+        without building the python-docx object model. Yields one line per body
+        paragraph and one line per table row (cells joined with " | "), in document
+        order. Processed elements are discarded as parsing advances.
+        """
+        with zipfile.ZipFile(file_path) as archive:
+            with archive.open('word/document.xml') as document:
+                body = None
+                depth = 0
+                # Open paragraphs (text boxes can nest one inside another) and table rows
+                paragraphs: List[List[str]] = []
+                rows: List[List[List[str]]] = []
+                for event, elem in ElementTree.iterparse(document, events=('start', 'end')):
+                    tag = elem.tag
+                    if event == 'start':
+                        depth += 1
+                        if tag == _W_BODY:
+                            body, body_depth = elem, depth
+                        elif tag == _W_P:
+                            paragraphs.append([])
+                        elif tag == _W_TR:
+                            rows.append([])
+                        elif tag == _W_TC and rows:
+                            rows[-1].append([])
+                        continue
+
+                    depth -= 1
+                    if tag == _W_T:
+                        if paragraphs and elem.text:
+                            paragraphs[-1].append(elem.text)
+                    elif tag == _W_TAB:
+                        if paragraphs:
+                            paragraphs[-1].append("\t")
+                    elif tag in _W_BREAKS:
+                        if paragraphs:
+                            paragraphs[-1].append("\n")
+                    elif tag == _W_P:
+                        text = "".join(paragraphs.pop())
+                        if paragraphs:
+                            # Nested (text box) paragraph: keep it inline with its host
+                            paragraphs[-1].append(text)
+                        elif rows and rows[-1]:
+                            rows[-1][-1].append(text)
+                        else:
+                            yield text + "\n"
+                    elif tag == _W_TR and rows:
+                        cells = rows.pop()
+                        line = " | ".join(" ".join(part for part in cell if part) for cell in cells)
+                        if rows and rows[-1]:
+                            # Nested table: the row becomes text of the enclosing cell
+                            rows[-1][-1].append(line)
+                        else:
+                            yield line + "\n"
+
+                    if body is not None and depth == body_depth:
+                        # A top-level block is finished; drop it (and everything before it)
+                        body.clear()
+
     @staticmethod
     def extract_text_from_txt(file_path: str) -> Optional[str]:
         """
@@ -83,6 +246,24 @@ class TextExtractor:
             print(f"Unsupported content type: {content_type}")
             return None
 
+    @staticmethod
+    def iter_text(file_path: str, content_type: str) -> Iterator[str]:
+        """
+        Yield text segments (pages, paragraphs or blocks) for a file based on content type.
+        Joining the segments gives the same text extract_text returns, before stripping.
+        """
+        if content_type == 'application/pdf':
+            for page_text in TextExtractor.iter_pdf_pages(file_path):
+                yield page_text + "\n"
+        elif content_type == 'application/vnd.openxmlformats-officedocument.wordprocessingml.document':
+            yield from TextExtractor.iter_docx_paragraphs(file_path)
+        elif content_type in ['text/plain', 'text/markdown']:
+            with open(file_path, 'r', encoding='utf-8') as file:
+                for block in iter(lambda: file.read(64 * 1024), ''):
+                    yield block
+        else:
+            raise ValueError(f"Unsupported content type: {content_type}")
+
     @staticmethod
     def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
         """
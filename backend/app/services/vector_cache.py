@@ -0,0 +1,254 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from redis.exceptions import RedisError
+
+from app.services.exact_search import MetadataColumns, normalize, top_k_indices
+from app.services.redis_client import get_async_redis, get_redis
+from app.services.search_executor import get_search_executor
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY_PREFIX = "vector-cache:version:"
+# Version keys only need to outlive cache entries; an expired key reads as a new version
+VERSION_TTL_SECONDS = 30 * 24 * 3600
+# Python-side cost of a row beyond its float32 values and metadata JSON
+_ROW_OVERHEAD_BYTES = 240
+
+# (vector id, values, metadata) of every vector a user owns
+TenantVectors = List[Tuple[str, List[float], Dict[str, Any]]]
+
+
+def version_key(user_id: str) -> str:
+    return f"{VERSION_KEY_PREFIX}{user_id}"
+
+
+def _new_version() -> str:
+    # Leads with the bump time so readers can tell how long ago the user's vectors changed
+    return f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+
+
+def _version_age_seconds(version: str) -> float:
+    try:
+        return time.time() - int(version.split("-", 1)[0]) / 1e9
+    except ValueError:
+        return float("inf")
+
+
+def bump_user_versions(user_ids: Iterable[str], redis=None) -> None:
+    """
+    Mark users' vectors as changed (after an upsert or delete) so every API process
+    drops its cached copy. Redis errors are logged: cached entries then live until
+    they are evicted or the next bump reaches Redis.
+    """
+    user_ids = sorted({user_id for user_id in user_ids if user_id})
+    if not user_ids:
+        return
+    cache = _vector_cache
+    if cache is not None:
+        for user_id in user_ids:
+            cache.invalidate(user_id)
+    try:
+        pipe = (redis or get_redis()).pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.set(version_key(user_id), _new_version(), ex=VERSION_TTL_SECONDS)
+        pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Could not bump vector cache version of {len(user_ids)} user(s): {e}")
+
+
+class _CachedTenant:
+    """
+    One user's vectors as a contiguous unit-length float32 matrix with their ids and metadata
+    """
+
+    def __init__(self, user_id: str, version: str, vectors: TenantVectors):
+        self.user_id = user_id
+        self.version = version
+        self.ids = [vector_id for vector_id, _, _ in vectors]
+        self.metadata = [metadata for _, _, metadata in vectors]
+        self.matrix = np.ascontiguousarray(normalize(np.array([values for _, values, _ in vectors], dtype=np.float32)))
+        self.columns = MetadataColumns(self.metadata)
+        self.nbytes = self.matrix.nbytes + sum(len(json.dumps(metadata)) + _ROW_OVERHEAD_BYTES for metadata in self.metadata)
+
+    def search(self, query_embedding: List[float], top_k: int, validated_filter: Optional[Dict]) -> List[Dict]:
+        if not self.ids:
+            return []
+        scores = self.matrix @ normalize(np.asarray(query_embedding, dtype=np.float32))
+        # Filter columns are built on first use; concurrent searches may both build one, harmlessly
+        mask = self.columns.mask(validated_filter) if validated_filter else None
+        return [
+            {"id": self.ids[row], "score": float(scores[row]), "metadata": dict(self.metadata[row])}
+            for row in top_k_indices(scores, mask, top_k)
+        ]
+
+
+class TenantVectorCache:
+    """
+    Per-process cache of active users' vectors, so searches of users with a few thousand
+    chunks are answered by exact in-memory search instead of a Pinecone round trip.
+    Entries are evicted least recently used first to stay within max_bytes, and are
+    valid only while the user's version in Redis (bumped on every upsert and delete)
+    matches the one they were loaded at. A miss falls through to Pinecone and loads
+    the user in the background; users over max_vectors are never cached.
+    """
+
+    def __init__(self, loader: Callable[[str, int], Optional[TenantVectors]], max_bytes: int, max_vectors: int = 5000,
+                 settle_seconds: float = 10.0, load_workers: int = 2):
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.max_vectors = max_vectors
+        self.settle_seconds = settle_seconds
+        self._entries: "OrderedDict[str, _CachedTenant]" = OrderedDict()
+        self._bytes = 0
+        # user_id -> version at which the user was too large to cache
+        self._oversized: Dict[str, str] = {}
+        self._loading: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._loader_pool = ThreadPoolExecutor(max_workers=max(1, load_workers), thread_name_prefix="vector-cache-load")
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "stale": 0, "loads": 0, "load_failures": 0, "evictions": 0, "oversized": 0}
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"users": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes, "loading": len(self._loading), **self.stats}
+
+    def _drop(self, user_id: str) -> None:
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            self._bytes -= entry.nbytes
+
+    def invalidate(self, user_id: str) -> None:
+        with self._lock:
+            self._drop(user_id)
+            self._oversized.pop(user_id, None)
+
+    def get(self, user_id: str, version: str) -> Optional[_CachedTenant]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry.version != version:
+                self._drop(user_id)
+                self.stats["stale"] += 1
+                entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.stats["hits"] += 1
+            return entry
+
+    def put(self, entry: _CachedTenant) -> bool:
+        with self._lock:
+            if entry.nbytes > self.max_bytes:
+                self._oversized[entry.user_id] = entry.version
+                self.stats["oversized"] += 1
+                return False
+            self._drop(entry.user_id)
+            while self._entries and self._bytes + entry.nbytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.stats["evictions"] += 1
+            self._entries[entry.user_id] = entry
+            self._bytes += entry.nbytes
+            return True
+
+    def _load(self, user_id: str, version: str) -> None:
+        try:
+            vectors = self.loader(user_id, self.max_vectors)
+            if vectors is None:
+                with self._lock:
+                    self._oversized[user_id] = version
+                    self.stats["oversized"] += 1
+                return
+            # Stored under the version read before loading: a bump meanwhile makes it stale, never wrong
+            self.put(_CachedTenant(user_id, version, vectors))
+            with self._lock:
+                self.stats["loads"] += 1
+        except Exception as e:
+            logger.warning(f"Could not load vectors of user {user_id} into the cache: {e}")
+            with self._lock:
+                self.stats["load_failures"] += 1
+        finally:
+            with self._lock:
+                self._loading.pop(user_id, None)
+
+    def schedule_load(self, user_id: str, version: str) -> bool:
+        """
+        Start loading a user's vectors in the background unless a load is running, the
+        user is known to be too large, or their vectors changed too recently for
+        Pinecone's reads to be sure to include the change
+        """
+        if _version_age_seconds(version) < self.settle_seconds:
+            return False
+        with self._lock:
+            if user_id in self._loading or self._oversized.get(user_id) == version:
+                return False
+            self._loading[user_id] = version
+        try:
+            self._loader_pool.submit(self._load, user_id, version)
+        except RuntimeError:
+            # Shut down
+            with self._lock:
+                self._loading.pop(user_id, None)
+            return False
+        return True
+
+    async def search(self, user_id: str, query_embedding: List[float], top_k: int, validated_filter: Optional[Dict]) -> Optional[List[Dict]]:
+        """
+        Matches from the cached copy of the user's vectors, or None on a miss (the caller
+        searches Pinecone). Raises SearchBusyError when the search executor is full.
+        """
+        try:
+            raw = await get_async_redis().get(version_key(user_id))
+        except RedisError as e:
+            # Without the version a cached copy could be stale
+            logger.warning(f"Vector cache bypassed, version of user {user_id} unavailable: {e}")
+            return None
+        version = raw.decode() if isinstance(raw, bytes) else (raw or "0")
+        entry = self.get(user_id, version)
+        if entry is None:
+            self.schedule_load(user_id, version)
+            return None
+        return await get_search_executor().run(entry.search, query_embedding, top_k, validated_filter)
+
+    def shutdown(self) -> None:
+        self._loader_pool.shutdown(wait=False, cancel_futures=True)
+
+
+_vector_cache: Optional[TenantVectorCache] = None
+_vector_cache_lock = threading.Lock()
+
+
+def get_vector_cache(loader: Callable[[str, int], Optional[TenantVectors]]) -> Optional[TenantVectorCache]:
+    """
+    Return the process-wide cache, or None unless VECTOR_CACHE_MAX_MB is set (off by default)
+    """
+    global _vector_cache
+    max_mb = float(os.getenv('VECTOR_CACHE_MAX_MB', '0') or 0)
+    if max_mb <= 0:
+        return None
+    with _vector_cache_lock:
+        if _vector_cache is None:
+            _vector_cache = TenantVectorCache(
+                loader,
+                max_bytes=int(max_mb * 1024 * 1024),
+                max_vectors=int(os.getenv('VECTOR_CACHE_MAX_VECTORS_PER_USER', '5000')),
+                settle_seconds=float(os.getenv('VECTOR_CACHE_SETTLE_SECONDS', '10')),
+                load_workers=int(os.getenv('VECTOR_CACHE_LOAD_WORKERS', '2')),
+            )
+        return _vector_cache
+
+
+def shutdown_vector_cache() -> None:
+    global _vector_cache
+    with _vector_cache_lock:
+        if _vector_cache is not None:
+            _vector_cache.shutdown()
+        _vector_cache = None
@@ -1,5 +1,114 @@
 from celery import Celery
+from kombu import Queue
+from kombu.utils.scheduling import round_robin_cycle
 import os
+from typing import Dict, List, Sequence, Tuple
+
+# Staged ingestion, in chain order. Each stage is routed to its own queue so workers can be
+# sized per stage: a few CPU-bound extract workers next to many I/O-bound embed/upsert workers.
+INGEST_STAGES = ("download", "extract", "chunk", "embed", "upsert", "finalize")
+
+# Every stage has a queue per lane: interactive (single uploads from the UI) and bulk (imports).
+# Small interactive files skip the chain and run end to end as one task on the fast-path queue.
+LANES = ("interactive", "bulk")
+FAST_PATH = "fast"
+
+# (concurrency, prefetch multiplier) per stage. Prefetch is kept low: messages a worker has
+# already reserved run before anything that arrives later, whatever its lane.
+STAGE_WORKER_DEFAULTS = {
+	"download": (4, 2),
+	"extract": (2, 1),
+	"chunk": (2, 1),
+	"embed": (8, 2),
+	"upsert": (8, 2),
+	"finalize": (4, 2),
+	FAST_PATH: (2, 1),
+}
+
+
+def stage_queue(stage: str, lane: str = "bulk") -> str:
+	if stage == FAST_PATH:
+		return os.getenv("INGEST_QUEUE_FAST", "ingest.fast")
+	base = os.getenv(f"INGEST_QUEUE_{stage.upper()}", f"ingest.{stage}")
+	return base if lane == "bulk" else f"{base}.{lane}"
+
+
+def stage_queues(stage: str) -> List[str]:
+	"""
+	Queues a worker for `stage` consumes: the stage's queue in every lane
+	"""
+	if stage == FAST_PATH:
+		return [stage_queue(FAST_PATH)]
+	return [stage_queue(stage, lane) for lane in LANES]
+
+
+def queue_lane(queue: str) -> str:
+	if queue == stage_queue(FAST_PATH) or queue.endswith(".interactive"):
+		return "interactive"
+	return "bulk"
+
+
+def stage_worker_options(stage: str) -> Tuple[int, int]:
+	"""
+	Concurrency and prefetch multiplier for a stage's workers, overridable with
+	INGEST_<STAGE>_CONCURRENCY and INGEST_<STAGE>_PREFETCH
+	"""
+	concurrency, prefetch = STAGE_WORKER_DEFAULTS[stage]
+	return (
+		int(os.getenv(f"INGEST_{stage.upper()}_CONCURRENCY", concurrency)),
+		int(os.getenv(f"INGEST_{stage.upper()}_PREFETCH", prefetch)),
+	)
+
+
+def lane_weights() -> Dict[str, int]:
+	"""
+	Consumption weight per lane from INGEST_LANE_WEIGHTS, e.g. "interactive=4,bulk=1"
+	"""
+	weights = {"interactive": 4, "bulk": 1}
+	for part in os.getenv("INGEST_LANE_WEIGHTS", "").split(","):
+		name, _, value = part.partition("=")
+		if name.strip() in weights and value.strip().isdigit():
+			weights[name.strip()] = max(1, int(value))
+	return weights
+
+
+def lane_schedule(weights: Dict[str, int]) -> List[str]:
+	# Smooth weighted round robin: with 4:1 the lead lane goes i, i, b, i, i rather than i, i, i, i, b
+	current = {lane: 0 for lane in weights}
+	total = sum(weights.values())
+	schedule = []
+	for _ in range(total):
+		for lane, weight in weights.items():
+			current[lane] += weight
+		lead = max(current, key=current.get)
+		current[lead] -= total
+		schedule.append(lead)
+	return schedule
+
+
+class WeightedLaneCycle(round_robin_cycle):
+	"""
+	Queue order for the Redis transport (queue_order_strategy). A worker polls all its
+	queues with one BRPOP, which takes from the first non-empty queue in the order given
+	here. The lane that goes first follows a weighted schedule, so with both lanes backed
+	up an interactive:bulk weight of 4:1 hands interactive work 4 of every 5 messages
+	while bulk keeps moving. An idle lane costs the other nothing.
+	"""
+
+	def __init__(self, it=None):
+		super().__init__(it)
+		self.weights = lane_weights()
+		self.schedule = lane_schedule(self.weights)
+		self.position = 0
+
+	def consume(self, n: int) -> Sequence[str]:
+		lead = self.schedule[self.position % len(self.schedule)]
+		# sorted() is stable, so queues within a lane keep their round-robin order
+		return sorted(self.items[:n], key=lambda queue: (queue_lane(queue) != lead, -self.weights[queue_lane(queue)]))
+
+	def rotate(self, last_used: str) -> str:
+		self.position += 1
+		return super().rotate(last_used)
 
 
 def make_celery() -> Celery:
@@ -10,7 +119,7 @@ def make_celery() -> Celery:
 		"neurospace",
 		broker=redis_url,
 		backend=backend_url,
-		include=["app.tasks.processing_tasks"],
+		include=["app.tasks.processing_tasks", "app.tasks.ingest_stages"],
 	)
 
 	celery.conf.update(
@@ -19,11 +128,21 @@ def make_celery() -> Celery:
 		accept_content=["json"],
 		task_acks_late=True,
 		worker_prefetch_multiplier=1,
-		broker_transport_options={"visibility_timeout": 3600},
+		broker_transport_options={
+			"visibility_timeout": 3600,
+			"queue_order_strategy": "app.tasks.celery_app:WeightedLaneCycle",
+		},
+		# A worker started without -Q consumes every queue, so a single worker still runs the whole pipeline
+		task_queues=[Queue("celery")] + [Queue(queue) for stage in (*INGEST_STAGES, FAST_PATH) for queue in stage_queues(stage)],
+		# Bulk lane by default; interactive jobs set their queue per signature (see ingest_signature)
+		task_routes={f"ingest.{stage}": {"queue": stage_queue(stage)} for stage in INGEST_STAGES},
+		# Safety net for fair scheduling when no job finishes to trigger a dispatch (needs celery beat)
+		beat_schedule={
+			"ingest-fair-pump": {"task": "ingest.fair_pump", "schedule": float(os.getenv("INGEST_FAIR_PUMP_SECONDS", "30"))},
+		},
 	)
 
 	return celery
 
 
 celery_app = make_celery()
-
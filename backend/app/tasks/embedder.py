@@ -0,0 +1,34 @@
+import asyncio
+import logging
+import signal
+
+from app.services.registry import registry
+from app.services.embedding_batcher import EmbeddingBatcher
+
+logger = logging.getLogger(__name__)
+
+
+async def _main() -> None:
+	stop = asyncio.Event()
+	loop = asyncio.get_running_loop()
+	for signum in (signal.SIGINT, signal.SIGTERM):
+		loop.add_signal_handler(signum, stop.set)
+	batcher = EmbeddingBatcher(registry.nim)
+	try:
+		await batcher.run(stop)
+	finally:
+		logger.info(f"Embedder stopping: {batcher.stats}, NIM utilisation {batcher.utilisation():.0%}")
+		await registry.shutdown()
+
+
+def main() -> None:
+	"""
+	Dedicated embedder process for the cross-task micro-batcher:
+	python -m app.tasks.embedder
+	"""
+	registry.startup(["nim"])
+	asyncio.run(_main())
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,538 @@
+from celery import chain, group
+
+from app.tasks.celery_app import FAST_PATH, LANES, celery_app, stage_queue
+from app.tasks.worker_runtime import run_async
+from app.tasks.processing_tasks import (
+	IngestIncomplete,
+	process_file_task,
+	_validate_file_key,
+	_iter_segments,
+	_extraction_variant,
+	_checkpoint_fingerprint,
+	_limit_chunks,
+	_make_vector,
+	_set_job_status,
+	_record_retry,
+	_fail_incomplete,
+)
+from app.services.registry import registry
+from app.services.chunker import TokenChunker
+from app.services.ingest_pipeline import _take, accepted_indices
+from app.services.extraction_sandbox import ExtractionError
+from app.services.artifact_store import (
+	ArtifactWriter,
+	S3ArtifactStore,
+	get_extracted_text_cache,
+	get_stage_store,
+	iter_records,
+	open_text,
+)
+from app.services.ingest_checkpoint import IngestCheckpoint
+from app.services.fair_scheduler import FairScheduler, fair_scheduling_enabled, file_cost
+from app.services.embedding_batcher import get_batch_embedder
+from app.services.embedding_cache import decode_embedding, encode_embedding
+from app.config import settings
+from redis.exceptions import RedisError
+import os
+import time
+import uuid
+import base64
+import shutil
+import asyncio
+import logging
+import tempfile
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Each stage takes the ingest context returned by the previous one. Artifacts handed between
+# stages (source copy, extracted text, chunks, vectors) live in the stage store, so consecutive
+# stages can run on different workers and a retry only redoes the stage that failed.
+StageBody = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+def classify_ingest(file_size: Optional[int], bulk: bool = False) -> str:
+	"""
+	Lane for a file: imports go to the bulk lane; single uploads are interactive, and
+	small ones (INGEST_FAST_PATH_MAX_BYTES, default 2MB) take the fast path. Single
+	uploads above INGEST_INTERACTIVE_MAX_BYTES (default 10MB) are treated as bulk so
+	one large document does not hold up the interactive lane.
+	"""
+	if bulk:
+		return "bulk"
+	size = file_size or 0
+	if size <= int(os.getenv('INGEST_FAST_PATH_MAX_BYTES', str(2 * 1024 * 1024))):
+		return FAST_PATH
+	if size <= int(os.getenv('INGEST_INTERACTIVE_MAX_BYTES', str(10 * 1024 * 1024))):
+		return "interactive"
+	return "bulk"
+
+
+def ingest_signature(payload: Dict[str, Any], lane: str = "bulk"):
+	"""
+	Celery signature that ingests one uploaded file in the given lane: the staged chain,
+	or the single process_file_task for the fast path and when INGEST_PIPELINE=single
+	"""
+	payload = dict(payload, lane=lane, enqueued_at=payload.get('enqueued_at') or time.time())
+	if lane == FAST_PATH:
+		return process_file_task.si(payload).set(queue=stage_queue(FAST_PATH))
+	if os.getenv('INGEST_PIPELINE', 'staged').lower() == 'single':
+		return process_file_task.si(payload).set(queue=stage_queue(FAST_PATH) if lane == "interactive" else "celery")
+	return chain(
+		download_stage.si(payload).set(queue=stage_queue("download", lane)),
+		extract_stage.s().set(queue=stage_queue("extract", lane)),
+		chunk_stage.s().set(queue=stage_queue("chunk", lane)),
+		embed_stage.s().set(queue=stage_queue("embed", lane)),
+		upsert_stage.s().set(queue=stage_queue("upsert", lane)),
+		finalize_stage.s().set(queue=stage_queue("finalize", lane)),
+	)
+
+
+async def enqueue_ingest(payloads: List[Dict[str, Any]], lane: str = "bulk") -> None:
+	"""
+	Enqueue files for ingestion in a lane. With fair scheduling (INGEST_FAIR_SCHEDULING,
+	on by default) they wait in per-user sub-queues in Redis and are released to Celery
+	as the lane has room, so one tenant's import cannot take every worker.
+	"""
+	payloads = [dict(payload, lane=lane, enqueued_at=time.time()) for payload in payloads]
+	if fair_scheduling_enabled():
+		try:
+			await FairScheduler(lane).submit([_fair_entry(dict(payload, fair=True)) for payload in payloads])
+		except RedisError as e:
+			logger.warning(f"Fair scheduler unavailable ({e}); enqueueing {len(payloads)} file(s) directly")
+		else:
+			try:
+				await pump_lane(lane)
+			except RedisError as e:
+				logger.warning(f"Could not dispatch the {lane} lane ({e}); the next pump will pick the work up")
+			return
+	if len(payloads) == 1:
+		ingest_signature(payloads[0], lane).apply_async()
+	else:
+		group(ingest_signature(payload, lane) for payload in payloads).apply_async()
+
+
+def _fair_entry(payload: Dict[str, Any]) -> Dict[str, Any]:
+	return {
+		'user_id': payload['user_id'],
+		'job_id': payload.get('job_id') or uuid.uuid4().hex,
+		'cost': file_cost(payload.get('file_size')),
+		'payload': payload,
+	}
+
+
+async def pump_lane(lane: str) -> int:
+	"""
+	Move as much of the lane's waiting work into Celery as its fair share allows
+	"""
+	scheduler = FairScheduler(lane)
+	payloads = await scheduler.dispatch()
+	for sent, payload in enumerate(payloads):
+		try:
+			ingest_signature(payload, lane).apply_async()
+		except Exception as e:
+			# Broker unavailable: give the slots back and keep the jobs waiting
+			logger.error(f"Could not enqueue ingest work for the {lane} lane: {e}")
+			entries = [_fair_entry(waiting) for waiting in payloads[sent:]]
+			for entry in entries:
+				await scheduler.release(entry['job_id'])
+			await scheduler.submit(entries)
+			return sent
+	return len(payloads)
+
+
+async def release_ingest_slot(payload: Dict[str, Any]) -> None:
+	"""
+	Called when a job finishes: frees its fair-scheduling slot and dispatches the next waiting work
+	"""
+	if not payload.get('fair') or not payload.get('job_id'):
+		return
+	lane = payload.get('lane', 'bulk')
+	try:
+		if await FairScheduler(lane).release(payload['job_id']):
+			await pump_lane(lane)
+	except RedisError as e:
+		logger.warning(f"Could not release fair-scheduling slot of job {payload['job_id']}: {e}")
+
+
+@celery_app.task(name="ingest.fair_pump")
+def fair_pump_task() -> Dict[str, int]:
+	"""
+	Periodic safety net (celery beat): expires lost leases and dispatches waiting work
+	"""
+	async def pump_all() -> Dict[str, int]:
+		return {lane: await pump_lane(lane) for lane in (FAST_PATH, *LANES)}
+	return run_async(pump_all())
+
+
+def _artifact_key(ctx: Dict[str, Any], name: str) -> str:
+	prefix = os.getenv('INGEST_STAGE_PREFIX', 'ingest-stages').strip('/')
+	return f"{prefix}/{ctx['user_id']}/{ctx['run_id']}/{name}"
+
+
+def _fetch_to_temp(store, key: str) -> str:
+	# Extractors need a file path; copy the artifact into a local temp file
+	stream = store.open(key)
+	if stream is None:
+		raise FileNotFoundError(f"Artifact {key} not found")
+	with stream, tempfile.NamedTemporaryFile(delete=False) as local_file:
+		shutil.copyfileobj(stream, local_file)
+		return local_file.name
+
+
+def _text_store(ctx: Dict[str, Any]):
+	if ctx['text']['cached']:
+		text_cache = get_extracted_text_cache()
+		if text_cache is None:
+			raise RuntimeError("Extracted text is in the cache but EXTRACTED_TEXT_CACHE is disabled on this worker")
+		return text_cache.store
+	return get_stage_store()
+
+
+async def _discard_artifacts(ctx: Dict[str, Any]) -> None:
+	if not ctx.get('artifacts'):
+		return
+	store = get_stage_store()
+	for key in ctx['artifacts']:
+		try:
+			await asyncio.to_thread(store.delete, key)
+		except Exception as e:
+			logger.warning(f"Could not delete ingest artifact {key}: {e}")
+	ctx['artifacts'] = []
+
+
+async def _record_error(ctx: Dict[str, Any], last_error: str) -> None:
+	supabase_service = registry.supabase
+	if ctx.get('file_id'):
+		await supabase_service.update_file_status(ctx['file_id'], 'error', file_size=ctx.get('file_size'), last_error=last_error)
+	else:
+		await supabase_service.create_file_record({
+			'file_key': ctx['file_key'],
+			'file_name': ctx['file_name'],
+			'user_id': ctx['user_id'],
+			'file_size': ctx.get('file_size') or 0,
+			'content_type': ctx['content_type'],
+			'status': 'error',
+			'last_error': last_error
+		})
+	await _set_job_status(ctx, 'failed')
+
+
+async def _guarded(stage: str, ctx: Dict[str, Any], body: StageBody) -> Dict[str, Any]:
+	started = time.monotonic()
+	try:
+		result = await body(ctx)
+	except IngestIncomplete:
+		# _run_stage decides between a retry and failing the job
+		raise
+	except Exception:
+		try:
+			await _set_job_status(ctx, 'failed')
+			await _discard_artifacts(ctx)
+		except Exception:
+			pass
+		raise
+	elapsed = time.monotonic() - started
+	if isinstance(result, dict) and 'run_id' in result:
+		result.setdefault('timings', {})[stage] = round(elapsed, 3)
+	logger.info(f"Ingest stage {stage} for {ctx['file_key']} took {elapsed:.2f}s")
+	return result
+
+
+def _run_stage(task, stage: str, ctx: Dict[str, Any], body: StageBody) -> Dict[str, Any]:
+	# A context that already has a result (already processed, bad input) passes through to finalize
+	if ctx.get('result') is not None and stage != 'finalize':
+		return ctx
+	try:
+		return run_async(_guarded(stage, ctx, body))
+	except IngestIncomplete as e:
+		last_error = f"ingest_incomplete: {e}"
+		max_retries = int(os.getenv('INGEST_MAX_RETRIES', '3'))
+		if task.request.retries >= max_retries:
+			run_async(_fail_incomplete(ctx, ctx.get('file_id'), last_error))
+			run_async(_discard_artifacts(ctx))
+			raise
+		# Progress is checkpointed on the job: the retry only redoes this stage's missing chunks
+		run_async(_record_retry(ctx, ctx.get('file_id'), last_error))
+		raise task.retry(
+			exc=e,
+			countdown=int(os.getenv('INGEST_RETRY_DELAY_SECONDS', '30')),
+			max_retries=max_retries,
+		)
+
+
+async def _download(payload: Dict[str, Any]) -> Dict[str, Any]:
+	s3_service = registry.s3
+	supabase_service = registry.supabase
+	user_id = payload["user_id"]
+	file_key = payload["file_key"]
+	content_type = payload.get("content_type", "application/octet-stream")
+	ctx = dict(payload, content_type=content_type, run_id=uuid.uuid4().hex, artifacts=[])
+
+	# Idempotency: ensure single processing record per {user_id, file_key}
+	file_meta = await supabase_service.get_file_by_key_and_user(file_key, user_id)
+	if file_meta and file_meta.get("status") == "processed":
+		await _set_job_status(ctx, 'completed')
+		ctx['result'] = {"status": "completed", "message": "Already processed", "file_key": file_key}
+		return ctx
+	ctx['file_id'] = file_meta['id'] if file_meta else None
+	await _set_job_status(ctx, 'processing')
+
+	object_info = await s3_service.get_object_info(file_key)
+	if object_info is None:
+		raise RuntimeError("Failed to get file size from S3")
+	ctx['file_size'] = object_info["size"]
+	if ctx['file_size'] > settings.max_file_size_mb * 1024 * 1024:
+		raise ValueError(f"File too large. Maximum {settings.max_file_size_mb}MB allowed")
+
+	etag = object_info.get("etag")
+	variant = _extraction_variant(content_type)
+	ctx['fingerprint'] = _checkpoint_fingerprint(etag, content_type, variant)
+	text_cache = get_extracted_text_cache()
+	if text_cache is not None and etag:
+		ctx['text_cache_key'] = text_cache.make_key(user_id, etag, content_type, variant)
+		if await asyncio.to_thread(text_cache.store.exists, ctx['text_cache_key']):
+			logger.info(f"Reusing extracted text for {file_key} from {ctx['text_cache_key']}")
+			ctx['text'] = {'key': ctx['text_cache_key'], 'cached': True}
+			return ctx
+
+	store = get_stage_store()
+	if isinstance(store, S3ArtifactStore) and store.bucket_name == s3_service.bucket_name:
+		# The upload is already in the bucket the stages share; extract reads it from there
+		ctx['source'] = file_key
+		return ctx
+	local_file_path = await s3_service.download_file(file_key)
+	if not local_file_path:
+		raise RuntimeError("Failed to download file from S3")
+	try:
+		key = _artifact_key(ctx, 'source')
+		await asyncio.to_thread(store.put_file, key, local_file_path)
+	finally:
+		s3_service.cleanup_temp_file(local_file_path)
+	ctx['source'] = key
+	ctx['artifacts'].append(key)
+	return ctx
+
+
+async def _extract(ctx: Dict[str, Any]) -> Dict[str, Any]:
+	if ctx.get('text'):
+		return ctx
+	store = get_stage_store()
+	# Extracted text goes straight into the text cache when it is enabled, so a later
+	# reprocess of the same content skips download and extraction
+	text_cache = get_extracted_text_cache() if ctx.get('text_cache_key') else None
+	if text_cache is not None:
+		text_store, key = text_cache.store, ctx['text_cache_key']
+	else:
+		text_store, key = store, _artifact_key(ctx, 'text.txt.gz')
+
+	def extract(local_file_path: str) -> None:
+		with ArtifactWriter(text_store, key) as writer:
+			for segment in _iter_segments(local_file_path, ctx['content_type']):
+				writer.write(segment)
+			writer.commit()
+
+	local_file_path = await asyncio.to_thread(_fetch_to_temp, store, ctx['source'])
+	try:
+		await asyncio.to_thread(extract, local_file_path)
+	except ExtractionError as e:
+		# Bad input, not a worker fault: record the structured error and finish the chain
+		await _record_error(ctx, f"{e.error_code}: {e.message}")
+		ctx['result'] = {"status": "error", "error_code": e.error_code, "message": e.message, "file_key": ctx['file_key']}
+		return ctx
+	finally:
+		try:
+			os.unlink(local_file_path)
+		except OSError:
+			pass
+
+	ctx['text'] = {'key': key, 'cached': text_cache is not None}
+	if text_cache is None:
+		ctx['artifacts'].append(key)
+	if ctx['source'] in ctx['artifacts']:
+		await asyncio.to_thread(store.delete, ctx['source'])
+		ctx['artifacts'].remove(ctx['source'])
+	return ctx
+
+
+async def _chunk(ctx: Dict[str, Any]) -> Dict[str, Any]:
+	store = get_stage_store()
+	segments = await asyncio.to_thread(open_text, _text_store(ctx), ctx['text']['key'])
+	if segments is None:
+		raise RuntimeError(f"Extracted text artifact {ctx['text']['key']} is missing")
+	chunker = TokenChunker(settings.chunk_max_tokens, settings.chunk_overlap_tokens)
+	key = _artifact_key(ctx, 'chunks.jsonl.gz')
+
+	def write_chunks() -> int:
+		with ArtifactWriter(store, key) as writer:
+			for index, chunk in _limit_chunks(chunker.iter_chunks(segments), settings.max_chunks_per_file):
+				writer.write_record({'i': index, 't': chunk})
+			writer.commit()
+			return writer.count
+
+	count = await asyncio.to_thread(write_chunks)
+	ctx['artifacts'].append(key)
+	if count == 0:
+		raise ValueError("Failed to extract text from file")
+	ctx['chunks'] = {'key': key, 'count': count}
+	ctx['chunking'] = chunker.stats
+	logger.info(f"Chunking stats for {ctx['file_key']}: {chunker.stats}")
+
+	checkpoint = await IngestCheckpoint.load(registry.supabase, ctx.get('job_id'), ctx.get('fingerprint'))
+	await checkpoint.chunks_read(count)
+	return ctx
+
+
+async def _embed(ctx: Dict[str, Any]) -> Dict[str, Any]:
+	nim_service = registry.nim
+	store = get_stage_store()
+	checkpoint = await IngestCheckpoint.load(registry.supabase, ctx.get('job_id'), ctx.get('fingerprint'))
+	# Small files share full NIM batches with other tasks when the embedding batcher is enabled
+	embedder = get_batch_embedder(nim_service)
+	batch_size = max(1, int(os.getenv('INGEST_EMBED_BATCH_SIZE', '0')) or (
+		nim_service.embed_batch_max_items * nim_service.embed_max_concurrency
+	))
+	key = _artifact_key(ctx, 'vectors.jsonl.gz')
+	records = iter_records(store, ctx['chunks']['key'])
+	chunks = ((record['i'], record['t']) for record in records)
+	failed = 0
+	try:
+		with ArtifactWriter(store, key) as writer:
+			while True:
+				batch, _, _ = await asyncio.to_thread(_take, chunks, batch_size, checkpoint.should_skip)
+				if not batch:
+					break
+				embeddings = await embedder.generate_embeddings_batch([text for _, text in batch])
+				indices = []
+				for (index, _), embedding in zip(batch, embeddings):
+					if embedding:
+						writer.write_record({'i': index, 'e': base64.b64encode(encode_embedding(embedding)).decode('ascii')})
+						indices.append(index)
+					else:
+						failed += 1
+				if indices:
+					await checkpoint.embedded(indices)
+			if failed:
+				# Re-embedding on retry is cheap: successful embeddings are in the embedding cache
+				raise IngestIncomplete(f"{failed} of {ctx['chunks']['count']} chunks not embedded")
+			await asyncio.to_thread(writer.commit)
+	finally:
+		records.close()
+		await checkpoint.flush()
+	ctx['artifacts'].append(key)
+	ctx['vectors'] = key
+	return ctx
+
+
+async def _upsert(ctx: Dict[str, Any]) -> Dict[str, Any]:
+	pinecone_service = registry.pinecone
+	store = get_stage_store()
+	checkpoint = await IngestCheckpoint.load(registry.supabase, ctx.get('job_id'), ctx.get('fingerprint'))
+	build_vector = partial(_make_vector, ctx['user_id'], ctx['file_key'], ctx['file_name'], ctx['content_type'])
+	batch_size = max(1, int(os.getenv('INGEST_UPSERT_BATCH_SIZE', '500')))
+	chunk_records = iter_records(store, ctx['chunks']['key'])
+	vector_records = iter_records(store, ctx['vectors'])
+
+	def next_batch():
+		# Join each embedding with its chunk text; both artifacts are in chunk-index order
+		indices, vectors = [], []
+		for record in vector_records:
+			index = record['i']
+			if checkpoint.should_skip(index):
+				continue
+			chunk = next(chunk_records)
+			while chunk['i'] != index:
+				chunk = next(chunk_records)
+			indices.append(index)
+			vectors.append(build_vector(index, chunk['t'], decode_embedding(base64.b64decode(record['e']))))
+			if len(vectors) >= batch_size:
+				break
+		return indices, vectors
+
+	try:
+		while True:
+			indices, vectors = await asyncio.to_thread(next_batch)
+			if not vectors:
+				break
+			# Pinecone's client is synchronous; keep it off the event loop
+			result = await asyncio.to_thread(pinecone_service.upsert_vectors, vectors)
+			# Vectors in failed Pinecone batches are not done; they are redone on retry
+			done = accepted_indices(indices, vectors, result)
+			if done:
+				await checkpoint.upserted(done)
+	finally:
+		chunk_records.close()
+		vector_records.close()
+		await checkpoint.flush()
+
+	pending = ctx['chunks']['count'] - checkpoint.upserted_count
+	if pending > 0:
+		raise IngestIncomplete(f"{pending} of {ctx['chunks']['count']} chunks not upserted")
+	ctx['upserted'] = checkpoint.upserted_count
+	return ctx
+
+
+async def _finalize(ctx: Dict[str, Any]) -> Dict[str, Any]:
+	if ctx.get('result') is not None:
+		await _discard_artifacts(ctx)
+		return ctx['result']
+	supabase_service = registry.supabase
+	file_id = ctx.get('file_id')
+	if not file_id:
+		file_record = await supabase_service.get_file_by_key_and_user(ctx['file_key'], ctx['user_id'])
+		file_id = file_record['id'] if file_record else None
+	if file_id:
+		await supabase_service.update_file_status(file_id, 'processed', ctx['upserted'], ctx['file_size'])
+	else:
+		await supabase_service.create_file_record({
+			'file_key': ctx['file_key'],
+			'file_name': ctx['file_name'],
+			'user_id': ctx['user_id'],
+			'file_size': ctx['file_size'],
+			'content_type': ctx['content_type'],
+			'status': 'processed',
+			'chunks_count': ctx['upserted']
+		})
+	# The API status endpoint reads from processing_jobs
+	await _set_job_status(ctx, 'completed')
+	await _discard_artifacts(ctx)
+	return {
+		"status": "completed",
+		"message": f"Processed {ctx['file_name']}",
+		"file_key": ctx['file_key'],
+		"chunking": ctx.get('chunking'),
+		"timings": ctx.get('timings', {}),
+	}
+
+
+@celery_app.task(bind=True, name="ingest.download")
+def download_stage(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+	if not _validate_file_key(payload["file_key"], payload["user_id"]):
+		raise ValueError("Invalid file key")
+	return _run_stage(self, "download", payload, _download)
+
+
+@celery_app.task(bind=True, name="ingest.extract")
+def extract_stage(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+	return _run_stage(self, "extract", ctx, _extract)
+
+
+@celery_app.task(bind=True, name="ingest.chunk")
+def chunk_stage(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+	return _run_stage(self, "chunk", ctx, _chunk)
+
+
+@celery_app.task(bind=True, name="ingest.embed")
+def embed_stage(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+	return _run_stage(self, "embed", ctx, _embed)
+
+
+@celery_app.task(bind=True, name="ingest.upsert")
+def upsert_stage(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+	return _run_stage(self, "upsert", ctx, _upsert)
+
+
+@celery_app.task(bind=True, name="ingest.finalize")
+def finalize_stage(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+	return _run_stage(self, "finalize", ctx, _finalize)
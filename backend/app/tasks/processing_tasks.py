@@ -1,13 +1,32 @@
 from app.tasks.celery_app import celery_app
-from app.services.s3_service import S3Service
+from app.tasks.worker_runtime import run_async
+from app.services.registry import registry
 from app.services.text_extractor import TextExtractor
-from app.services.nim_service import NIMService, EmbeddingError
-from app.services.pinecone_service import PineconeService
-from app.services.supabase_service import SupabaseService
+from app.services.chunker import TokenChunker
+from app.services.ingest_pipeline import embed_and_upsert
+from app.services.extraction_sandbox import ExtractionError, get_extraction_sandbox
+from app.services.artifact_store import EXTRACTOR_VERSION, get_extracted_text_cache
+from app.services.ingest_checkpoint import IngestCheckpoint
+from app.services.embedding_batcher import get_batch_embedder
+from app.services.ingest_groups import record_job_status
+from app.services.job_events import publish_job_event
+from app.services.pdf_backends import get_pdf_backends
+from app.services.nim_service import EmbeddingError
 from app.config import settings
 import os
 import re
-from typing import Dict, Any
+import time
+import asyncio
+import logging
+from functools import partial
+from typing import Dict, Any, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class IngestIncomplete(Exception):
+	"""Some chunks were not embedded/upserted; progress is checkpointed and the task is retried"""
+	pass
 
 
 def _validate_file_key(file_key: str, user_id: str) -> bool:
@@ -20,117 +39,245 @@ def _validate_file_key(file_key: str, user_id: str) -> bool:
 	return bool(_re.compile(r"^[a-zA-Z0-9\-_\.]+$").match(file_key.split("/")[-1]))
 
 
+def _iter_segments(file_path: str, content_type: str) -> Iterator[str]:
+	# Extraction runs in the resource-limited sandbox unless EXTRACTION_SANDBOX_ENABLED is off
+	sandbox = get_extraction_sandbox()
+	if sandbox is None:
+		yield from TextExtractor.iter_text(file_path, content_type)
+	else:
+		yield from sandbox.extract(file_path, content_type)
+
+
+def _extraction_variant(content_type: str) -> str:
+	# PDF text depends on which engine extracts it, so the configured engines are part of the cache key
+	if content_type == 'application/pdf':
+		return ",".join(backend.name for backend in get_pdf_backends())
+	return ""
+
+
+def _checkpoint_fingerprint(etag: Optional[str], content_type: str, variant: str) -> Optional[str]:
+	# Chunk indices are only comparable across attempts if source text and chunking are unchanged
+	if not etag:
+		return None
+	return "|".join([etag, content_type, variant, EXTRACTOR_VERSION, str(settings.chunk_max_tokens), str(settings.chunk_overlap_tokens)])
+
+
+async def _set_job_status(payload: Dict[str, Any], status: str) -> None:
+	# The job row drives the status endpoint; jobs started by a bulk ingest are also tracked in their group
+	if status == 'completed' and payload.get("enqueued_at"):
+		# Per-lane latency from enqueue to searchable, for watching interactive p95 under backlog
+		logger.info(f"Time to searchable for {payload['file_key']} ({payload.get('lane', 'bulk')} lane): {time.time() - payload['enqueued_at']:.1f}s")
+	job_id = payload.get("job_id")
+	if not job_id:
+		return
+	await registry.supabase.update_job_status(job_id, status)
+	await record_job_status(payload.get("group_id"), job_id, status)
+	# Pushed to SSE subscribers, so clients do not poll the job row
+	await publish_job_event(job_id, status=status, user_id=payload.get("user_id"))
+	if status in ('completed', 'failed'):
+		# Imported here: ingest_stages builds on this module
+		from app.tasks.ingest_stages import release_ingest_slot
+		await release_ingest_slot(payload)
+
+
+async def _record_retry(payload: Dict[str, Any], file_id: Optional[str], last_error: str) -> None:
+	# A retry resumes from the checkpoint: the job stays 'processing' (keeping its fair-scheduling
+	# slot) and only the error is recorded
+	if file_id:
+		await registry.supabase.update_file_last_error(file_id, last_error)
+	await publish_job_event(payload.get("job_id"), status='processing', last_error=last_error, user_id=payload.get("user_id"))
+
+
+async def _fail_incomplete(payload: Dict[str, Any], file_id: Optional[str], last_error: str) -> None:
+	# Retries ran out with chunks still missing: only now do the file and job fail
+	supabase_service = registry.supabase
+	if not file_id:
+		file_meta = await supabase_service.get_file_by_key_and_user(payload["file_key"], payload["user_id"])
+		file_id = file_meta['id'] if file_meta else None
+	if file_id:
+		await supabase_service.update_file_status(file_id, 'error', last_error=last_error)
+	await _set_job_status(payload, 'failed')
+
+
+def _limit_chunks(chunks: Iterator[Tuple[int, str]], max_chunks: int) -> Iterator[Tuple[int, str]]:
+	for index, chunk in chunks:
+		if index >= max_chunks:
+			raise ValueError(f"Too many text chunks generated (limit {max_chunks})")
+		yield index, chunk
+
+
+def _make_vector(user_id: str, file_key: str, file_name: str, content_type: str, i: int, chunk: str, embedding) -> Dict[str, Any]:
+	return {
+		'id': f"{file_key}_chunk_{i}",
+		'embedding': embedding,
+		'metadata': {
+			'file_key': file_key,
+			'file_name': file_name,
+			'user_id': user_id,
+			'chunk_index': i,
+			'text': (chunk[:500] if len(chunk) > 500 else chunk),
+			'content_type': content_type
+		}
+	}
+
+
 @celery_app.task(bind=True, name="processing.process_file_task")
 def process_file_task(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+	if not _validate_file_key(payload["file_key"], payload["user_id"]):
+		raise ValueError("Invalid file key")
+	# The whole task body runs as one coroutine on the worker's persistent loop
+	try:
+		return run_async(_process_file(payload))
+	except IngestIncomplete as e:
+		last_error = f"ingest_incomplete: {e}"
+		max_retries = int(os.getenv('INGEST_MAX_RETRIES', '3'))
+		if self.request.retries >= max_retries:
+			run_async(_fail_incomplete(payload, None, last_error))
+			raise
+		# Progress is checkpointed on the job: the retry only embeds and upserts what is missing
+		run_async(_record_retry(payload, None, last_error))
+		raise self.retry(
+			exc=e,
+			countdown=int(os.getenv('INGEST_RETRY_DELAY_SECONDS', '30')),
+			max_retries=max_retries,
+		)
+
+
+async def _process_file(payload: Dict[str, Any]) -> Dict[str, Any]:
 	user_id = payload["user_id"]
 	file_key = payload["file_key"]
 	file_name = payload["file_name"]
 	content_type = payload.get("content_type", "application/octet-stream")
 	job_id = payload.get("job_id")
 
-	if not _validate_file_key(file_key, user_id):
-		raise ValueError("Invalid file key")
-
-	s3_service = S3Service()
-	nim_service = NIMService()
-	pinecone_service = PineconeService(embedding_dimension=nim_service.get_embedding_dimension())
-	supabase_service = SupabaseService()
+	# Services are built once per worker process (see worker_runtime)
+	s3_service = registry.s3
+	nim_service = registry.nim
+	pinecone_service = registry.pinecone
+	supabase_service = registry.supabase
 
 	# Idempotency: ensure single processing record per {user_id, file_key}
-	existing = supabase_service.get_file_by_key_and_user.__wrapped__ if hasattr(supabase_service.get_file_by_key_and_user, "__wrapped__") else supabase_service.get_file_by_key_and_user
-	import asyncio
-	# The supabase client is sync; our service methods are defined async but call sync client; call via asyncio.run if needed
-	try:
-		file_meta = asyncio.run(supabase_service.get_file_by_key_and_user(file_key, user_id))
-	except RuntimeError:
-		# already in event loop (Celery worker sync context) — call directly
-		file_meta = None
-
-	# Update status to processing
+	file_meta = await supabase_service.get_file_by_key_and_user(file_key, user_id)
 	try:
 		if file_meta and file_meta.get("status") == "processed":
+			await _set_job_status(payload, 'completed')
 			return {"status": "completed", "message": "Already processed", "file_key": file_key}
 	except Exception:
 		pass
+	await _set_job_status(payload, 'processing')
+
+	# From here on any failure marks the job failed, which also frees its fair-scheduling slot
+	local_file_path = None
+	try:
+		# Determine size and content hash (ETag) from S3
+		object_info = await s3_service.get_object_info(file_key)
+		if object_info is None:
+			raise RuntimeError("Failed to get file size from S3")
+		actual_file_size = object_info["size"]
 
-	# Determine size from S3
-	actual_file_size = asyncio.run(s3_service.get_file_size(file_key))
-	if actual_file_size is None:
-		raise RuntimeError("Failed to get file size from S3")
+		# Unchanged content that was extracted before (e.g. a retry after an embed/upsert failure)
+		# skips both the download and extraction
+		etag = object_info.get("etag")
+		variant = _extraction_variant(content_type)
+		text_cache = get_extracted_text_cache()
+		cache_key = None
+		cached_segments = None
+		if text_cache is not None and etag:
+			cache_key = text_cache.make_key(user_id, etag, content_type, variant)
+			cached_segments = await asyncio.to_thread(text_cache.get, cache_key)
 
-	local_file_path = asyncio.run(s3_service.download_file(file_key))
-	if not local_file_path:
-		raise RuntimeError("Failed to download file from S3")
+		# Chunk-level progress from an earlier attempt on this job, if source and chunking still match
+		checkpoint = await IngestCheckpoint.load(supabase_service, job_id, _checkpoint_fingerprint(etag, content_type, variant))
 
-	try:
-		# Validate size
-		if not os.path.exists(local_file_path) or os.path.getsize(local_file_path) > settings.max_file_size_mb * 1024 * 1024:
-			raise ValueError(f"File too large. Maximum {settings.max_file_size_mb}MB allowed")
+		if cached_segments is None:
+			local_file_path = await s3_service.download_file(file_key)
+			if not local_file_path:
+				raise RuntimeError("Failed to download file from S3")
+
+		if cached_segments is not None:
+			logger.info(f"Reusing extracted text for {file_key} from {cache_key}")
+			segments = cached_segments
+		else:
+			# Validate size
+			if not os.path.exists(local_file_path) or os.path.getsize(local_file_path) > settings.max_file_size_mb * 1024 * 1024:
+				raise ValueError(f"File too large. Maximum {settings.max_file_size_mb}MB allowed")
+
+			# Pages/paragraphs are extracted lazily and chunked incrementally as the pipeline pulls them;
+			# the text is saved as an artifact once extraction has run to the end
+			segments = _iter_segments(local_file_path, content_type)
+			if cache_key is not None:
+				segments = text_cache.tee(cache_key, segments)
+		chunker = TokenChunker(settings.chunk_max_tokens, settings.chunk_overlap_tokens)
+		chunks = _limit_chunks(chunker.iter_chunks(segments), settings.max_chunks_per_file)
+
+		# Embed and upsert as a streaming pipeline: each batch goes to Pinecone as soon as it is embedded
+		build_vector = partial(_make_vector, user_id, file_key, file_name, content_type)
 
-		text = TextExtractor.extract_text(local_file_path, content_type)
-		if not text:
+		try:
+			# Small files share full NIM batches with other tasks when the embedding batcher is enabled
+			embedder = get_batch_embedder(nim_service)
+			summary = await embed_and_upsert(chunks, embedder, pinecone_service, build_vector, progress=checkpoint)
+		finally:
+			await checkpoint.flush()
+		if summary["chunks"] == 0:
 			raise ValueError("Failed to extract text from file")
-		if len(text) > 10 * 1024 * 1024:
-			raise ValueError("Extracted text too large")
-
-		chunks = TextExtractor.chunk_text(text)
-		if len(chunks) > 1000:
-			raise ValueError("Too many text chunks generated")
-
-		# Embeddings
-		import asyncio as _asyncio
-		embeddings = _asyncio.run(nim_service.generate_embeddings_batch(chunks))
-		valid_embeddings = []
-		for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-			if embedding:
-				valid_embeddings.append({
-					'id': f"{file_key}_chunk_{i}",
-					'embedding': embedding,
-					'metadata': {
-						'file_key': file_key,
-						'file_name': file_name,
-						'user_id': user_id,
-						'chunk_index': i,
-						'text': (chunk[:500] if len(chunk) > 500 else chunk),
-						'content_type': content_type
-					}
-				})
-
-		if valid_embeddings:
-			pinecone_service.upsert_vectors(valid_embeddings)
+		logger.info(f"Chunking stats for {file_key}: {chunker.stats}")
+		if summary["resumed"]:
+			logger.info(f"Resumed {file_key}: skipped {summary['resumed']} chunk(s) upserted by an earlier attempt")
+
+		pending = summary["chunks"] - checkpoint.upserted_count
+		if pending > 0:
+			raise IngestIncomplete(f"{pending} of {summary['chunks']} chunks not embedded/upserted")
+		embedded_count = checkpoint.upserted_count
 
 		# Update file record
-		file_record = _asyncio.run(supabase_service.get_file_by_key_and_user(file_key, user_id))
+		file_record = file_meta or await supabase_service.get_file_by_key_and_user(file_key, user_id)
 		if file_record:
-			_asyncio.run(supabase_service.update_file_status(file_record['id'], 'processed', len(valid_embeddings), actual_file_size))
+			await supabase_service.update_file_status(file_record['id'], 'processed', embedded_count, actual_file_size)
 		else:
-			_asyncio.run(supabase_service.create_file_record({
+			await supabase_service.create_file_record({
 				'file_key': file_key,
 				'file_name': file_name,
 				'user_id': user_id,
 				'file_size': actual_file_size,
 				'content_type': content_type,
 				'status': 'processed',
-				'chunks_count': len(valid_embeddings)
-			}))
-
-		# Mark job as completed in processing_jobs
-		# Since Celery task doesn't know job_id, update file status only; the API status endpoint reads from processing_jobs
-		# Update job status if known
-		if job_id:
-			_asyncio.run(supabase_service.update_job_status(job_id, 'completed'))
-		return {"status": "completed", "message": f"Processed {file_name}", "file_key": file_key}
+				'chunks_count': embedded_count
+			})
+
+		# Mark job as completed in processing_jobs; the API status endpoint reads from processing_jobs
+		await _set_job_status(payload, 'completed')
+		return {"status": "completed", "message": f"Processed {file_name}", "file_key": file_key, "chunking": chunker.stats}
+	except ExtractionError as e:
+		# Bad input, not a worker fault: record the structured error and finish the task
+		last_error = f"{e.error_code}: {e.message}"
+		if file_meta:
+			await supabase_service.update_file_status(file_meta['id'], 'error', file_size=actual_file_size, last_error=last_error)
+		else:
+			await supabase_service.create_file_record({
+				'file_key': file_key,
+				'file_name': file_name,
+				'user_id': user_id,
+				'file_size': actual_file_size,
+				'content_type': content_type,
+				'status': 'error',
+				'last_error': last_error
+			})
+		await _set_job_status(payload, 'failed')
+		return {"status": "error", "error_code": e.error_code, "message": e.message, "file_key": file_key}
+	except IngestIncomplete:
+		# process_file_task decides between a retry and failing the job
+		raise
 	except Exception as e:
 		# Update job status to failed on error
 		try:
-			if job_id:
-				_asyncio.run(supabase_service.update_job_status(job_id, 'failed'))
+			await _set_job_status(payload, 'failed')
 		except Exception:
 			pass
 		raise
 	finally:
 		try:
-			S3Service().cleanup_temp_file(local_file_path)
+			if local_file_path:
+				s3_service.cleanup_temp_file(local_file_path)
 		except Exception:
 			pass
-
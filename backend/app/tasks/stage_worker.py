@@ -0,0 +1,40 @@
+import sys
+from typing import List, Sequence
+
+from app.tasks.celery_app import STAGE_WORKER_DEFAULTS, celery_app, stage_queues, stage_worker_options
+
+
+def worker_argv(stages: Sequence[str]) -> List[str]:
+	"""
+	Celery worker arguments for the given ingest stages, consuming both lanes of each.
+	A worker serving several stages gets the largest of their concurrencies and the
+	smallest prefetch.
+	"""
+	options = [stage_worker_options(stage) for stage in stages]
+	return [
+		"worker",
+		"--loglevel=INFO",
+		f"--queues={','.join(queue for stage in stages for queue in stage_queues(stage))}",
+		f"--concurrency={max(concurrency for concurrency, _ in options)}",
+		f"--prefetch-multiplier={min(prefetch for _, prefetch in options)}",
+		f"--hostname={'-'.join(stages)}@%h",
+	]
+
+
+def main(argv: Sequence[str] = None) -> None:
+	"""
+	Run a worker for one or more ingest stages, sized by INGEST_<STAGE>_CONCURRENCY
+	and INGEST_<STAGE>_PREFETCH, e.g.
+	python -m app.tasks.stage_worker extract chunk
+	python -m app.tasks.stage_worker download embed upsert finalize
+	python -m app.tasks.stage_worker fast   (small interactive files, end to end)
+	"""
+	stages = list(argv if argv is not None else sys.argv[1:])
+	unknown = [stage for stage in stages if stage not in STAGE_WORKER_DEFAULTS]
+	if not stages or unknown:
+		sys.exit(f"Usage: python -m app.tasks.stage_worker STAGE [STAGE ...] (stages: {', '.join(STAGE_WORKER_DEFAULTS)})")
+	celery_app.worker_main(worker_argv(stages))
+
+
+if __name__ == "__main__":
+	main()
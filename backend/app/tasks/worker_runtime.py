@@ -0,0 +1,53 @@
+import asyncio
+import logging
+import threading
+from typing import Any, Coroutine
+
+from celery.signals import worker_process_init, worker_process_shutdown
+
+from app.services.registry import registry
+from app.services.extraction_sandbox import close_extraction_sandbox
+
+logger = logging.getLogger(__name__)
+
+# One long-lived event loop per worker thread (a single one under the prefork pool)
+_local = threading.local()
+
+
+def get_worker_loop() -> asyncio.AbstractEventLoop:
+	loop = getattr(_local, "loop", None)
+	if loop is None or loop.is_closed():
+		loop = asyncio.new_event_loop()
+		asyncio.set_event_loop(loop)
+		_local.loop = loop
+	return loop
+
+
+def run_async(coro: Coroutine[Any, Any, Any]) -> Any:
+	"""
+	Run a coroutine to completion on the worker's persistent event loop
+	"""
+	return get_worker_loop().run_until_complete(coro)
+
+
+@worker_process_init.connect
+def init_worker_process(**kwargs) -> None:
+	# Build clients after fork: sockets, connection pools and the Pinecone index
+	# handle must not be shared with the parent process
+	get_worker_loop()
+	status = registry.startup()
+	logger.info(f"Worker process services initialized: {status}")
+
+
+@worker_process_shutdown.connect
+def shutdown_worker_process(**kwargs) -> None:
+	loop = getattr(_local, "loop", None)
+	if loop is None or loop.is_closed():
+		return
+	try:
+		loop.run_until_complete(registry.shutdown())
+	except Exception as e:
+		logger.warning(f"Error shutting down worker services: {e}")
+	finally:
+		loop.close()
+	close_extraction_sandbox()
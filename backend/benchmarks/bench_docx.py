@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark DOCX text extraction: the python-docx object model vs the streaming
+zip/XML extractor used by ingestion.
+
+Each method runs in a fresh process so its peak RSS is measured in isolation.
+
+    python benchmarks/bench_docx.py                     # generate a ~200 page document
+    python benchmarks/bench_docx.py report.docx --repeat 5
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _extract_python_docx(path: str) -> int:
+    # The previous extract_text_from_docx: full object model, += concatenation, no tables
+    import docx
+    text = ""
+    for paragraph in docx.Document(path).paragraphs:
+        text += paragraph.text + "\n"
+    return len(text.strip())
+
+
+def _extract_streaming(path: str) -> int:
+    from app.services.text_extractor import TextExtractor
+    # Consume segments the way the chunker does, without holding the document
+    return sum(len(segment) for segment in TextExtractor.iter_docx_paragraphs(path))
+
+
+METHODS = {
+    "python-docx": _extract_python_docx,
+    "streaming": _extract_streaming,
+}
+
+
+def _run(method: str, path: str, queue) -> None:
+    # Load both code paths before measuring so imports count against neither
+    import docx  # noqa: F401
+    from app.services import text_extractor  # noqa: F401
+    func = METHODS[method]
+    baseline = _peak_rss_mb()
+    started = time.perf_counter()
+    chars = func(path)
+    elapsed = time.perf_counter() - started
+    queue.put({"seconds": elapsed, "chars": chars, "peak_rss_mb": _peak_rss_mb(), "rss_growth_mb": _peak_rss_mb() - baseline})
+
+
+def _measure(method: str, path: str) -> dict:
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_run, args=(method, path, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def _generate(path: str, pages: int) -> None:
+    import docx
+    document = docx.Document()
+    sentence = "Retrieval quality depends on chunking, embedding and ranking choices. "
+    for page in range(pages):
+        document.add_heading(f"Section {page + 1}", level=2)
+        for _ in range(8):
+            document.add_paragraph(sentence * 6)
+        if page % 4 == 0:
+            table = document.add_table(rows=6, cols=4)
+            for row in table.rows:
+                for cell in row.cells:
+                    cell.text = "metric value"
+    document.save(path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", help="DOCX file to extract (default: generate one)")
+    parser.add_argument("--pages", type=int, default=200, help="pages to generate when no path is given")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per method; the fastest is reported")
+    args = parser.parse_args()
+
+    path = args.path
+    generated = None
+    if path is None:
+        fd, generated = tempfile.mkstemp(suffix=".docx")
+        os.close(fd)
+        _generate(generated, args.pages)
+        path = generated
+
+    try:
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        print(f"{path}: {size_mb:.1f} MB")
+        print(f"{'method':<12} {'seconds':>8} {'chars':>10} {'Mchar/s':>8} {'peak RSS MB':>12} {'RSS growth MB':>14}")
+        for method in METHODS:
+            runs = [_measure(method, path) for _ in range(max(1, args.repeat))]
+            best = min(runs, key=lambda run: run["seconds"])
+            peak = max(run["peak_rss_mb"] for run in runs)
+            growth = max(run["rss_growth_mb"] for run in runs)
+            # Throughput in extracted characters: the .docx itself is zip-compressed
+            throughput = best["chars"] / best["seconds"] / 1e6 if best["seconds"] else float("inf")
+            print(f"{method:<12} {best['seconds']:>8.3f} {best['chars']:>10} {throughput:>8.1f} {peak:>12.1f} {growth:>14.1f}")
+    finally:
+        if generated:
+            os.unlink(generated)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark the installed PDF backends on a directory of sample PDFs.
+
+For every backend this reports pages/sec and how its extracted text compares
+with the reference backend (PyPDF2 unless --reference says otherwise):
+character count ratio and word overlap. Backends are set up in pdf_backends;
+choose the production order with PDF_BACKENDS.
+
+    python benchmarks/bench_pdf.py samples/
+    python benchmarks/bench_pdf.py samples/ --backends pymupdf,pypdf2 --reference pymupdf
+"""
+
+import argparse
+import re
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.pdf_backends import PDF_BACKENDS  # noqa: E402
+
+_WORDS = re.compile(r"\w+")
+
+
+def _extract(backend, path: Path) -> dict:
+    # No fallback here: a backend that cannot read a page fails the file, so it shows up per backend
+    started = time.perf_counter()
+    with backend.open(str(path)) as document:
+        pages = document.page_count
+        text = "".join(document.page_text(page) + "\n" for page in range(pages))
+    return {"seconds": time.perf_counter() - started, "pages": pages, "text": text}
+
+
+def _word_overlap(text: str, reference: str) -> float:
+    # Multiset overlap of words, insensitive to line breaks and reading-order differences
+    words, reference_words = Counter(_WORDS.findall(text.lower())), Counter(_WORDS.findall(reference.lower()))
+    total = sum(reference_words.values())
+    return sum((words & reference_words).values()) / total if total else 1.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", help="directory searched recursively for *.pdf")
+    parser.add_argument("--backends", default=",".join(PDF_BACKENDS), help="comma-separated backends to compare")
+    parser.add_argument("--reference", default="pypdf2", help="backend the others are compared against")
+    args = parser.parse_args()
+
+    files = sorted(Path(args.directory).rglob("*.pdf"))
+    if not files:
+        sys.exit(f"No PDF files found under {args.directory}")
+
+    names = [name.strip() for name in args.backends.split(",") if name.strip()]
+    if args.reference not in names:
+        names.insert(0, args.reference)
+    backends = []
+    for name in names:
+        backend = PDF_BACKENDS.get(name)
+        if backend is None:
+            sys.exit(f"Unknown backend {name}; known: {', '.join(PDF_BACKENDS)}")
+        if backend.is_available():
+            backends.append(backend)
+        else:
+            print(f"skipping {name}: module {backend.module} is not installed")
+    if not any(backend.name == args.reference for backend in backends):
+        sys.exit(f"Reference backend {args.reference} is not installed")
+
+    # results[backend][file] = extraction result, or None if the backend failed on that file
+    results = {backend.name: {} for backend in backends}
+    for path in files:
+        for backend in backends:
+            try:
+                results[backend.name][path] = _extract(backend, path)
+            except Exception as e:
+                print(f"{backend.name} failed on {path}: {e}")
+                results[backend.name][path] = None
+
+    reference = results[args.reference]
+    print(f"\n{len(files)} file(s), reference backend: {args.reference}")
+    print(f"{'backend':<10} {'files':>6} {'pages':>7} {'seconds':>8} {'pages/s':>8} {'chars':>10} {'char ratio':>10} {'word overlap':>12}")
+    for backend in backends:
+        done = {path: result for path, result in results[backend.name].items() if result is not None}
+        pages = sum(result["pages"] for result in done.values())
+        seconds = sum(result["seconds"] for result in done.values())
+        chars = sum(len(result["text"]) for result in done.values())
+        # Parity only over files both this backend and the reference extracted
+        shared = [path for path in done if reference.get(path) is not None]
+        reference_chars = sum(len(reference[path]["text"]) for path in shared)
+        ratio = sum(len(done[path]["text"]) for path in shared) / reference_chars if reference_chars else float("nan")
+        overlaps = [_word_overlap(done[path]["text"], reference[path]["text"]) for path in shared]
+        overlap = sum(overlaps) / len(overlaps) if overlaps else float("nan")
+        rate = pages / seconds if seconds else float("inf")
+        print(f"{backend.name:<10} {len(done):>6} {pages:>7} {seconds:>8.2f} {rate:>8.1f} {chars:>10} {ratio:>10.3f} {overlap:>12.1%}")
+
+
+if __name__ == "__main__":
+    main()
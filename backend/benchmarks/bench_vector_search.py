@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark exact search in the local vector store (VECTOR_STORE=local) for one
+user's partition, across partition sizes, with and without a metadata filter.
+
+    python benchmarks/bench_vector_search.py
+    python benchmarks/bench_vector_search.py --sizes 1000 5000 --dimension 1024 --queries 500
+"""
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.local_vector_store import LocalVectorStore  # noqa: E402
+
+
+def _vectors(user_id: str, count: int, dimension: int, rng: np.random.Generator) -> list:
+    embeddings = rng.standard_normal((count, dimension), dtype=np.float32)
+    return [
+        {
+            "id": f"uploads/{user_id}/doc{i // 200}.pdf_chunk_{i}",
+            "embedding": embeddings[i].tolist(),
+            "metadata": {"user_id": user_id, "file_key": f"uploads/{user_id}/doc{i // 200}.pdf", "chunk_index": i, "text": "chunk"},
+        }
+        for i in range(count)
+    ]
+
+
+def _percentiles(samples: list) -> tuple:
+    ordered = sorted(samples)
+    return statistics.median(ordered), ordered[int(0.99 * (len(ordered) - 1))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 2000, 5000, 20000], help="vectors in the partition")
+    parser.add_argument("--dimension", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=300, help="timed searches per size")
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'vectors':>8} {'matrix MB':>10} {'p50 ms':>8} {'p99 ms':>8} {'filtered p50 ms':>16} {'filtered p99 ms':>16}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            store = LocalVectorStore(embedding_dimension=args.dimension, directory=directory)
+            store.upsert_vectors(_vectors("bench", size, args.dimension, rng))
+            queries = rng.standard_normal((args.queries, args.dimension), dtype=np.float32).tolist()
+            file_filter = {"user_id": "bench", "file_key": {"$in": ["uploads/bench/doc0.pdf", "uploads/bench/doc1.pdf"]}}
+            # Warm up: maps the matrix and builds the filter columns
+            store.search_similar(queries[0], top_k=args.top_k, user_id="bench", filter_dict=file_filter)
+
+            timings = {}
+            for label, filter_dict in (("plain", None), ("filtered", file_filter)):
+                samples = []
+                for query in queries:
+                    started = time.perf_counter()
+                    store.search_similar(query, top_k=args.top_k, filter_dict=filter_dict, user_id="bench")
+                    samples.append(1000 * (time.perf_counter() - started))
+                timings[label] = _percentiles(samples)
+            matrix_mb = size * args.dimension * 4 / (1024 * 1024)
+            print(f"{size:>8} {matrix_mb:>10.1f} {timings['plain'][0]:>8.3f} {timings['plain'][1]:>8.3f} "
+                  f"{timings['filtered'][0]:>16.3f} {timings['filtered'][1]:>16.3f}")
+
+
+if __name__ == "__main__":
+    main()
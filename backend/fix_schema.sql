@@ -33,6 +33,15 @@ BEGIN
     END IF;
 END $$;
 
+-- Add chunk-level ingest progress columns to processing_jobs (resumable ingestion)
+ALTER TABLE processing_jobs ADD COLUMN IF NOT EXISTS total_chunks INTEGER;
+ALTER TABLE processing_jobs ADD COLUMN IF NOT EXISTS embedded_chunks INTEGER DEFAULT 0;
+ALTER TABLE processing_jobs ADD COLUMN IF NOT EXISTS upserted_chunks INTEGER DEFAULT 0;
+ALTER TABLE processing_jobs ADD COLUMN IF NOT EXISTS checkpoint JSONB;
+
+-- Bulk ingest looks up the latest job of many files at once
+CREATE INDEX IF NOT EXISTS idx_processing_jobs_file_id ON processing_jobs(file_id);
+
 -- Create indexes if they don't exist
 CREATE INDEX IF NOT EXISTS idx_files_user_id ON files(user_id);
 CREATE INDEX IF NOT EXISTS idx_files_status ON files(status);
@@ -21,7 +21,12 @@ CREATE TABLE IF NOT EXISTS processing_jobs (
     user_id TEXT NOT NULL,
     status TEXT DEFAULT 'queued',
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-    completed_at TIMESTAMP WITH TIME ZONE
+    completed_at TIMESTAMP WITH TIME ZONE,
+    -- Chunk-level ingest progress; checkpoint holds embedded/upserted chunk index ranges for resume
+    total_chunks INTEGER,
+    embedded_chunks INTEGER DEFAULT 0,
+    upserted_chunks INTEGER DEFAULT 0,
+    checkpoint JSONB
 );
 
 -- Create indexes
@@ -29,6 +34,7 @@ CREATE INDEX IF NOT EXISTS idx_files_user_id ON files(user_id);
 CREATE INDEX IF NOT EXISTS idx_files_status ON files(status);
 CREATE INDEX IF NOT EXISTS idx_processing_jobs_user_id ON processing_jobs(user_id);
 CREATE INDEX IF NOT EXISTS idx_processing_jobs_status ON processing_jobs(status);
+CREATE INDEX IF NOT EXISTS idx_processing_jobs_file_id ON processing_jobs(file_id);
 
 -- Enable Row Level Security
 ALTER TABLE files ENABLE ROW LEVEL SECURITY;
@@ -0,0 +1,28 @@
+from app.services.artifact_store import ExtractedTextCache, LocalArtifactStore
+
+
+def test_tee_stores_text_only_after_full_extraction(tmp_path):
+	cache = ExtractedTextCache(LocalArtifactStore(str(tmp_path)))
+	key = cache.make_key("user_1", "etag-abc", "application/pdf", "pypdf2")
+	assert cache.get(key) is None
+
+	# A consumer that stops early (e.g. the embed stage failed) leaves no artifact behind
+	partial = cache.tee(key, iter(["page one\n", "page two\n"]))
+	next(partial)
+	partial.close()
+	assert cache.get(key) is None
+
+	segments = ["page one\n", "page two\n", "ünïcode page\n"]
+	assert list(cache.tee(key, iter(segments))) == segments
+	assert "".join(cache.get(key)) == "".join(segments)
+	assert list(tmp_path.rglob("*.tmp")) == []
+
+
+def test_key_changes_with_content_hash_type_and_engine():
+	cache = ExtractedTextCache(LocalArtifactStore("/unused"), prefix="artifacts/")
+	key = cache.make_key("user_1", "etag-abc", "application/pdf", "pypdf2")
+	assert key.startswith("artifacts/user_1/") and key.endswith(".txt.gz")
+	assert key == cache.make_key("user_1", "etag-abc", "application/pdf", "pypdf2")
+	assert key != cache.make_key("user_1", "etag-def", "application/pdf", "pypdf2")
+	assert key != cache.make_key("user_1", "etag-abc", "application/pdf", "pymupdf,pypdf2")
+	assert key != cache.make_key("user_1", "etag-abc", "text/plain")
@@ -0,0 +1,108 @@
+import pytest
+
+from app.models.file import BulkProcessingRequest
+from app.routes import processing
+from app.services import ingest_groups
+from app.services.ingest_groups import get_group_progress, record_job_status
+
+
+class FakeRedis:
+	def __init__(self):
+		self.hashes = {}
+
+	def pipeline(self, transaction=False):
+		return FakePipeline(self)
+
+	async def hset(self, key, field=None, value=None, mapping=None):
+		values = self.hashes.setdefault(key, {})
+		for name, item in (mapping or {field: value}).items():
+			values[str(name).encode()] = str(item).encode()
+
+	async def hexists(self, key, field):
+		return field.encode() in self.hashes.get(key, {})
+
+	async def hgetall(self, key):
+		return dict(self.hashes.get(key, {}))
+
+	async def expire(self, key, seconds):
+		return True
+
+
+class FakePipeline:
+	def __init__(self, redis):
+		self.redis = redis
+		self.calls = []
+
+	def __getattr__(self, name):
+		return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+	async def execute(self):
+		return [await getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+
+class FakeSupabase:
+	def __init__(self):
+		self.calls = []
+		self.files = {"uploads/u1/b.txt": {"id": "f-b", "file_key": "uploads/u1/b.txt", "status": "error"},
+			"uploads/u1/c.txt": {"id": "f-c", "file_key": "uploads/u1/c.txt", "status": "processed"}}
+
+	async def get_files_by_keys(self, file_keys, user_id):
+		self.calls.append("get_files_by_keys")
+		return {key: row for key, row in self.files.items() if key in file_keys}
+
+	async def create_file_records(self, files_data):
+		self.calls.append("create_file_records")
+		return [{"id": f"f-new-{i}", "file_key": data["file_key"], "status": "uploaded"} for i, data in enumerate(files_data)]
+
+	async def get_latest_jobs_by_files(self, file_ids, user_id):
+		self.calls.append("get_latest_jobs_by_files")
+		return {"f-b": {"id": "job-b", "file_id": "f-b"}} if "f-b" in file_ids else {}
+
+	async def create_processing_jobs(self, file_ids, user_id, status="queued"):
+		self.calls.append("create_processing_jobs")
+		return {file_id: f"job-{file_id}" for file_id in file_ids}
+
+	async def update_jobs_status(self, job_ids, status):
+		self.calls.append(("update_jobs_status", sorted(job_ids), status))
+		return len(job_ids)
+
+
+@pytest.mark.asyncio
+async def test_bulk_ingest_batches_records_and_tracks_group_progress(monkeypatch):
+	redis, supabase, dispatched = FakeRedis(), FakeSupabase(), []
+	monkeypatch.setattr(ingest_groups, "get_async_redis", lambda: redis)
+	monkeypatch.setattr(processing, "get_supabase_service", lambda: supabase)
+
+	async def enqueue_ingest(payloads, lane):
+		assert lane == "bulk"
+		dispatched.extend(payloads)
+
+	monkeypatch.setattr(processing, "enqueue_ingest", enqueue_ingest)
+
+	files = [{"file_key": f"uploads/u1/{name}", "file_name": name, "file_size": 10, "content_type": "text/plain"}
+		for name in ("a.txt", "b.txt", "c.txt", "a.txt", "../x.txt", "d.txt")]
+	response = await processing.process_files_bulk(BulkProcessingRequest(user_id="u1", files=files), current_user="u1")
+
+	# A constant number of database calls, whatever the number of files
+	assert supabase.calls == [
+		"get_files_by_keys", "create_file_records", "get_latest_jobs_by_files",
+		"create_processing_jobs", ("update_jobs_status", ["job-b"], "queued"),
+	]
+	statuses = {job.file_key: job.status for job in response.jobs}
+	assert statuses == {
+		"uploads/u1/a.txt": "queued", "uploads/u1/b.txt": "queued", "uploads/u1/c.txt": "already_processed",
+		"uploads/u1/../x.txt": "rejected", "uploads/u1/d.txt": "queued",
+	}
+	assert response.queued == 3 and len(dispatched) == 3
+	assert {payload["group_id"] for payload in dispatched} == {response.group_id}
+
+	job_ids = [payload["job_id"] for payload in dispatched]
+	await record_job_status(response.group_id, job_ids[0], "completed")
+	await record_job_status(response.group_id, job_ids[1], "failed")
+	await record_job_status(response.group_id, job_ids[1], "failed")
+	await record_job_status(response.group_id, "unknown-job", "completed")
+	progress = await get_group_progress(response.group_id)
+	assert progress["counts"] == {"completed": 1, "failed": 1, "queued": 1}
+	assert progress["percent_complete"] == 66.7
+	assert progress["failed_job_ids"] == [job_ids[1]]
+	assert progress["user_id"] == "u1"
@@ -0,0 +1,53 @@
+import pytest
+from app.services.chunker import TokenChunker, approx_token_count
+
+
+def _document(sentences=300):
+	words = ["retrieval", "vector", "index", "query", "chunk", "token", "model", "latency"]
+	return "".join(
+		" ".join(words[(i + j) % len(words)] for j in range(3 + i % 17)) + (".\n\n" if i % 9 == 0 else ". ")
+		for i in range(sentences)
+	)
+
+
+def test_chunks_respect_token_budget_and_sentence_boundaries():
+	chunker = TokenChunker(max_tokens=60, overlap_tokens=12)
+	chunks = [chunk for _, chunk in chunker.iter_chunks([_document()])]
+	assert len(chunks) > 5
+	assert all(approx_token_count(chunk) <= 60 for chunk in chunks)
+	assert all(chunk.endswith(".") for chunk in chunks)
+	stats = chunker.stats
+	assert stats["chunks"] == len(chunks)
+	assert stats["max_chunk_tokens"] <= 60
+	assert 0 < stats["overlap_ratio"] < 0.25
+	assert stats["embedded_tokens"] == stats["tokens"] + stats["overlap_tokens"]
+
+
+def test_streamed_segments_match_whole_document():
+	text = _document()
+	whole = list(TokenChunker(80, 16).iter_chunks([text]))
+	pieces = [text[i:i + 37] for i in range(0, len(text), 37)]
+	assert list(TokenChunker(80, 16).iter_chunks(pieces)) == whole
+
+
+def test_zero_overlap_and_oversized_sentences():
+	chunker = TokenChunker(max_tokens=50, overlap_tokens=0)
+	text = "word " * 400 + "x" * 1000
+	chunks = [chunk for _, chunk in chunker.iter_chunks([text])]
+	assert all(approx_token_count(chunk) <= 50 for chunk in chunks)
+	assert chunker.stats["overlap_tokens"] == 0
+	assert chunker.stats["tokens"] == chunker.stats["embedded_tokens"]
+	assert list(TokenChunker().iter_chunks(["", "  \n "])) == []
+
+
+def test_rejects_overlap_not_smaller_than_chunk():
+	with pytest.raises(ValueError):
+		TokenChunker(max_tokens=10, overlap_tokens=10)
+
+
+def test_boundary_less_stream_is_force_split_within_the_pending_bound():
+	chunker = TokenChunker(max_tokens=50, overlap_tokens=5)
+	segments = [("word " * 13000)[:65000] for _ in range(50)]
+	pieces = list(chunker._iter_sentences(segments))
+	assert "".join(pieces) == "".join(segments)
+	assert max(len(piece) for piece in pieces) <= chunker._max_pending_chars
@@ -0,0 +1,80 @@
+import json
+import time
+import pytest
+from app.services.embedding_batcher import EmbeddingBatcher, _decode_results
+
+
+class FakeNIM:
+	embed_batch_max_items = 4
+	embed_max_concurrency = 2
+
+	def __init__(self):
+		self.calls = []
+
+	def _plan_embedding_batches(self, items):
+		return [items[i:i + self.embed_batch_max_items] for i in range(0, len(items), self.embed_batch_max_items)]
+
+	async def generate_embeddings_batch(self, texts, max_concurrent=None, input_type="query"):
+		self.calls.append((input_type, list(texts)))
+		return [None if text == "bad" else [float(len(text)), 1.0] for text in texts]
+
+
+class FakePipeline:
+	def __init__(self, redis):
+		self.redis = redis
+		self.ops = []
+
+	def rpush(self, key, value):
+		self.ops.append(("rpush", key, value))
+
+	def expire(self, key, ttl):
+		self.ops.append(("expire", key, ttl))
+
+	def xack(self, stream, group, *ids):
+		self.ops.append(("xack", ids))
+
+	def xdel(self, stream, *ids):
+		self.ops.append(("xdel", ids))
+
+	async def execute(self):
+		self.redis.ops.extend(self.ops)
+
+
+class FakeRedis:
+	def __init__(self):
+		self.ops = []
+
+	def pipeline(self, transaction=False):
+		return FakePipeline(self)
+
+
+def _entry(entry_id, texts, input_type="passage", deadline=None):
+	return (entry_id, {
+		b"reply": f"reply:{entry_id.decode()}".encode(),
+		b"input_type": input_type.encode(),
+		b"texts": json.dumps(texts).encode(),
+		b"count": str(len(texts)).encode(),
+		b"deadline": str(deadline or time.time() + 60).encode(),
+	})
+
+
+@pytest.mark.asyncio
+async def test_flush_packs_requests_from_many_tasks_and_routes_replies():
+	nim, redis = FakeNIM(), FakeRedis()
+	batcher = EmbeddingBatcher(nim, redis=redis, stream="s", group="g", consumer="c")
+	await batcher.flush([
+		_entry(b"1-0", ["note one", "bad"]),
+		_entry(b"2-0", ["a page"]),
+		_entry(b"3-0", ["q"], input_type="query"),
+		_entry(b"4-0", ["late"], deadline=time.time() - 1),
+	])
+
+	# One NIM call per input type, spanning both passage requests; the expired request is skipped
+	assert nim.calls == [("passage", ["note one", "bad", "a page"]), ("query", ["q"])]
+	replies = {op[1]: _decode_results(op[2]) for op in redis.ops if op[0] == "rpush"}
+	assert replies[b"reply:1-0"] == [[8.0, 1.0], None]
+	assert replies[b"reply:2-0"] == [[6.0, 1.0]]
+	assert replies[b"reply:3-0"] == [[1.0, 1.0]]
+	acked = next(op[1] for op in redis.ops if op[0] == "xack")
+	assert set(acked) == {b"1-0", b"2-0", b"3-0", b"4-0"}
+	assert batcher.stats["texts"] == 4 and batcher.stats["expired"] == 1
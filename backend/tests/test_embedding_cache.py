@@ -0,0 +1,58 @@
+import pytest
+from fakeredis import aioredis
+
+from app.services import redis_client
+from app.services.embedding_cache import DEFAULT_REDIS_TTL_SECONDS, DiskEmbeddingStore, EmbeddingCache, RedisEmbeddingStore
+from app.services.nim_service import NIMService
+
+
+@pytest.mark.asyncio
+async def test_memory_tier_evicts_least_recently_used():
+	cache = EmbeddingCache(max_memory_items=2)
+	await cache.put_many({"a": [0.5], "b": [1.5]})
+	assert await cache.get("a") == [0.5]
+	await cache.put("c", [2.5])
+	assert await cache.get("b") is None
+	stats = cache.stats()
+	assert stats["evictions"] == 1
+	assert stats["memory_hits"] == 1
+	assert stats["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_disk_tier_survives_new_cache_instance(tmp_path):
+	key = EmbeddingCache.make_key("nvidia/nv-embedqa-e5-v5", "query", "hello")
+	first = EmbeddingCache(max_memory_items=10, persistent=DiskEmbeddingStore(str(tmp_path)))
+	await first.put(key, [0.25, -1.0])
+	second = EmbeddingCache(max_memory_items=10, persistent=DiskEmbeddingStore(str(tmp_path)))
+	assert await second.get(key) == [0.25, -1.0]
+	assert second.stats()["persistent_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_redis_tier_keys_expire_by_default(monkeypatch):
+	redis = aioredis.FakeRedis()
+	monkeypatch.setattr(redis_client, "get_async_redis", lambda: redis)
+	cache = EmbeddingCache(max_memory_items=0, persistent=RedisEmbeddingStore())
+	await cache.put("k", [0.5])
+	assert 0 < await redis.ttl("emb:k") <= DEFAULT_REDIS_TTL_SECONDS
+	assert await cache.get("k") == [0.5]
+
+
+@pytest.mark.asyncio
+async def test_batch_only_requests_uncached_unique_texts(monkeypatch):
+	service = NIMService()
+	service.cache = EmbeddingCache(max_memory_items=100)
+	await service.cache.put(EmbeddingCache.make_key(service.embedding_model, "query", "seen"), [9.0])
+	calls = []
+
+	async def fake_request(inputs, input_type="query", max_retries=2):
+		calls.append(list(inputs))
+		return [[float(len(text))] for text in inputs]
+
+	monkeypatch.setattr(service, "_request_embeddings", fake_request)
+	results = await service.generate_embeddings_batch(["seen", "new", "new"])
+	assert calls == [["new"]]
+	assert results == [[9.0], [3.0], [3.0]]
+	assert await service.generate_embeddings_batch(["new"]) == [[3.0]]
+	assert calls == [["new"]]
@@ -0,0 +1,69 @@
+import billiard
+import pytest
+from app.services import extraction_sandbox
+from app.services.extraction_sandbox import ExtractionError, ExtractionSandbox
+
+
+def test_sandbox_streams_segments_and_is_reused(tmp_path):
+	path = tmp_path / "notes.txt"
+	path.write_text("hello sandbox", encoding="utf-8")
+	sandbox = ExtractionSandbox(timeout_seconds=60, cpu_seconds=30, memory_mb=0)
+	try:
+		assert "".join(sandbox.extract(str(path), "text/plain")) == "hello sandbox"
+		pid = sandbox._process.pid
+		assert "".join(sandbox.extract(str(path), "text/plain")) == "hello sandbox"
+		assert sandbox._process.pid == pid
+		with pytest.raises(ExtractionError) as excinfo:
+			sandbox.extract(str(path), "application/unknown")
+		assert excinfo.value.error_code == "extraction_failed"
+	finally:
+		sandbox.close()
+
+
+def test_sandbox_reports_wall_clock_timeout(tmp_path):
+	path = tmp_path / "notes.txt"
+	path.write_text("hello", encoding="utf-8")
+	sandbox = ExtractionSandbox(timeout_seconds=0.01, cpu_seconds=30, memory_mb=0)
+	try:
+		with pytest.raises(ExtractionError) as excinfo:
+			sandbox.extract(str(path), "text/plain")
+		assert excinfo.value.error_code == "extraction_timeout"
+		assert sandbox._process is None
+	finally:
+		sandbox.close()
+
+
+def _extract_in_worker(path):
+	sandbox = ExtractionSandbox(timeout_seconds=60, cpu_seconds=30, memory_mb=0)
+	try:
+		return "".join(sandbox.extract(path, "text/plain"))
+	finally:
+		sandbox.close()
+
+
+def test_sandbox_starts_inside_a_daemonic_prefork_worker(tmp_path):
+	# Celery's prefork pool runs tasks in daemonic billiard processes
+	path = tmp_path / "notes.txt"
+	path.write_text("hello worker", encoding="utf-8")
+	pool = billiard.Pool(1)
+	try:
+		assert pool.apply(_extract_in_worker, (str(path),)) == "hello worker"
+	finally:
+		pool.terminate()
+		pool.join()
+
+
+def test_sandbox_reports_a_failed_start(tmp_path, monkeypatch):
+	path = tmp_path / "notes.txt"
+	path.write_text("hello", encoding="utf-8")
+
+	def fail(*args, **kwargs):
+		raise OSError("no more processes")
+
+	monkeypatch.setattr(extraction_sandbox.subprocess, "Popen", fail)
+	sandbox = ExtractionSandbox(timeout_seconds=60, cpu_seconds=30, memory_mb=0)
+	with pytest.raises(ExtractionError) as excinfo:
+		sandbox.extract(str(path), "text/plain")
+	assert excinfo.value.error_code == "extraction_failed"
+	assert sandbox._process is None
+	sandbox.close()
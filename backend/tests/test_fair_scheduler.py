@@ -0,0 +1,43 @@
+import pytest
+from fakeredis import aioredis
+
+from app.services.fair_scheduler import FairScheduler, file_cost
+
+
+def _entries(user_id, count, cost=1):
+	return [{"user_id": user_id, "job_id": f"{user_id}-{i}", "cost": cost, "payload": {"job_id": f"{user_id}-{i}"}} for i in range(count)]
+
+
+def _jobs(payloads):
+	return [payload["job_id"] for payload in payloads]
+
+
+@pytest.mark.asyncio
+async def test_drr_shares_the_lane_across_users():
+	scheduler = FairScheduler("bulk", redis=aioredis.FakeRedis(), max_inflight=4, user_cap=0, quantum=1)
+	# A large import arrives first, then a single file from another user
+	await scheduler.submit(_entries("alice", 10))
+	await scheduler.submit(_entries("bob", 2))
+	assert _jobs(await scheduler.dispatch()) == ["alice-0", "bob-0", "alice-1", "bob-1"]
+
+	# No free slots: nothing more is dispatched until jobs finish
+	assert await scheduler.dispatch() == []
+	assert await scheduler.release("alice-0")
+	assert not await scheduler.release("alice-0")
+	assert _jobs(await scheduler.dispatch()) == ["alice-2"]
+
+
+@pytest.mark.asyncio
+async def test_user_cap_and_cost_weighting():
+	scheduler = FairScheduler("interactive", redis=aioredis.FakeRedis(), max_inflight=10, user_cap=1, quantum=1)
+	await scheduler.submit(_entries("alice", 3))
+	await scheduler.submit(_entries("bob", 3))
+	assert _jobs(await scheduler.dispatch()) == ["alice-0", "bob-0"]
+	await scheduler.release("bob-0")
+	assert _jobs(await scheduler.dispatch()) == ["bob-1"]
+
+	# A 4MB file costs four small ones: the small files of another user are not held up behind it
+	weighted = FairScheduler("bulk", redis=aioredis.FakeRedis(), max_inflight=10, user_cap=0, quantum=1)
+	await weighted.submit(_entries("carol", 1, cost=file_cost(4 * 1024 * 1024)))
+	await weighted.submit(_entries("dave", 3))
+	assert _jobs(await weighted.dispatch()) == ["dave-0", "dave-1", "dave-2", "carol-0"]
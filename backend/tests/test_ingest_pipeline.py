@@ -0,0 +1,76 @@
+import pytest
+from app.services.ingest_pipeline import embed_and_upsert
+
+
+class FakeNIM:
+	embed_batch_max_items = 2
+	embed_max_concurrency = 1
+
+	async def generate_embeddings_batch(self, texts):
+		return [None if t == "bad" else [float(len(t))] for t in texts]
+
+
+class FakePinecone:
+	def __init__(self):
+		self.batches = []
+
+	def upsert_vectors(self, vectors):
+		self.batches.append([v["id"] for v in vectors])
+		return {"total": len(vectors), "accepted": len(vectors), "skipped": 0, "errors": []}
+
+
+@pytest.mark.asyncio
+async def test_embed_and_upsert_streams_each_batch_to_pinecone():
+	pinecone = FakePinecone()
+	chunks = enumerate(["a", "bb", "bad", "dddd", "eeeee"])
+	summary = await embed_and_upsert(
+		chunks, FakeNIM(), pinecone,
+		build_vector=lambda i, text, emb: {"id": f"chunk_{i}", "embedding": emb},
+	)
+	assert pinecone.batches == [["chunk_0", "chunk_1"], ["chunk_3"], ["chunk_4"]]
+	assert summary["chunks"] == 5
+	assert summary["embedded"] == 4
+	assert summary["failed_indices"] == [2]
+	assert summary["upsert"]["accepted"] == 4
+
+
+class FakeJobs:
+	def __init__(self):
+		self.rows = {"job-1": {"id": "job-1", "status": "processing"}}
+
+	async def get_job(self, job_id):
+		return self.rows.get(job_id)
+
+	async def update_job_progress(self, job_id, progress):
+		self.rows[job_id].update(progress)
+		return True
+
+
+@pytest.mark.asyncio
+async def test_checkpoint_resume_only_processes_remaining_chunks():
+	from app.services.ingest_checkpoint import IngestCheckpoint, job_progress
+
+	jobs = FakeJobs()
+	build = lambda i, text, emb: {"id": f"chunk_{i}", "embedding": emb}
+	texts = ["a", "bb", "bad", "dddd", "eeeee"]
+
+	first = await IngestCheckpoint.load(jobs, "job-1", "etag|v1")
+	summary = await embed_and_upsert(enumerate(texts), FakeNIM(), FakePinecone(), build_vector=build, progress=first)
+	await first.flush()
+	assert summary["failed_indices"] == [2]
+	assert jobs.rows["job-1"]["checkpoint"]["upserted"] == [[0, 2], [3, 5]]
+	assert job_progress(jobs.rows["job-1"])["percent_complete"] == 80.0
+
+	# The retry re-reads every chunk but only embeds and upserts the one that failed
+	texts[2] = "ccc"
+	pinecone = FakePinecone()
+	second = await IngestCheckpoint.load(jobs, "job-1", "etag|v1")
+	summary = await embed_and_upsert(enumerate(texts), FakeNIM(), pinecone, build_vector=build, progress=second)
+	await second.flush()
+	assert pinecone.batches == [["chunk_2"]]
+	assert summary["resumed"] == 4
+	assert second.upserted_count == 5
+	assert job_progress(jobs.rows["job-1"])["percent_complete"] == 100.0
+
+	# A different source fingerprint starts from scratch
+	assert (await IngestCheckpoint.load(jobs, "job-1", "etag|v2")).upserted_count == 0
@@ -0,0 +1,218 @@
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+from app.services import artifact_store
+from app.services.artifact_store import LocalArtifactStore
+from app.services.registry import registry
+from app.tasks import ingest_stages
+from app.tasks.processing_tasks import _process_file
+from app.tasks.celery_app import WeightedLaneCycle, celery_app
+from app.tasks.ingest_stages import (
+	classify_ingest,
+	ingest_signature,
+	download_stage,
+	extract_stage,
+	chunk_stage,
+	embed_stage,
+	upsert_stage,
+	finalize_stage,
+)
+from app.tasks.stage_worker import worker_argv
+
+TEXT = "Staged ingestion splits the work. " * 400
+
+
+class FakeS3:
+	bucket_name = "uploads"
+
+	async def get_object_info(self, file_key):
+		return {"size": len(TEXT), "etag": "etag-1", "content_type": "text/plain"}
+
+	async def download_file(self, file_key):
+		fd, path = tempfile.mkstemp(suffix=".txt")
+		with os.fdopen(fd, "w") as f:
+			f.write(TEXT)
+		return path
+
+	def cleanup_temp_file(self, path):
+		os.unlink(path)
+
+
+class FakeSupabase:
+	def __init__(self):
+		self.files = {}
+		self.jobs = {"job-1": {"id": "job-1", "status": "queued"}}
+		self.job_statuses = []
+
+	async def get_file_by_key_and_user(self, file_key, user_id):
+		return {"id": "file-1", "status": "uploaded"}
+
+	async def update_file_status(self, file_id, status, chunks_count=None, file_size=None, last_error=None):
+		self.files[file_id] = {"status": status, "chunks_count": chunks_count}
+		return True
+
+	async def update_file_last_error(self, file_id, last_error):
+		self.files.setdefault(file_id, {"status": "uploaded", "chunks_count": None})["last_error"] = last_error
+		return True
+
+	async def update_job_status(self, job_id, status):
+		self.jobs[job_id]["status"] = status
+		self.job_statuses.append(status)
+		return True
+
+	async def get_job(self, job_id):
+		return self.jobs.get(job_id)
+
+	async def update_job_progress(self, job_id, progress):
+		self.jobs[job_id].update(progress)
+		return True
+
+
+class FakeNIM:
+	embed_batch_max_items = 4
+	embed_max_concurrency = 1
+
+	async def generate_embeddings_batch(self, texts):
+		return [[float(len(text)), 1.0] for text in texts]
+
+
+class FakePinecone:
+	def __init__(self, failures=0):
+		self.ids = []
+		self.failures = failures
+
+	def upsert_vectors(self, vectors):
+		if self.failures:
+			self.failures -= 1
+			return {"total": len(vectors), "accepted": 0, "skipped": len(vectors), "errors": ["unavailable"], "failed_ids": [vector["id"] for vector in vectors]}
+		self.ids.extend(vector["id"] for vector in vectors)
+		return {"total": len(vectors), "accepted": len(vectors), "skipped": 0, "errors": []}
+
+
+class FakeScheduler:
+	released = []
+
+	def __init__(self, lane):
+		self.lane = lane
+
+	async def release(self, job_id):
+		FakeScheduler.released.append(job_id)
+		return True
+
+
+def test_stages_hand_artifacts_through_the_store(tmp_path, monkeypatch):
+	monkeypatch.setenv("EXTRACTED_TEXT_CACHE", "none")
+	monkeypatch.setenv("EXTRACTION_SANDBOX_ENABLED", "false")
+	monkeypatch.setattr(artifact_store, "_stage_store", LocalArtifactStore(str(tmp_path)))
+	supabase, pinecone = FakeSupabase(), FakePinecone()
+	monkeypatch.setattr(registry, "_services", {"s3": FakeS3(), "supabase": supabase, "nim": FakeNIM(), "pinecone": pinecone})
+
+	ctx = {"file_key": "uploads/u1/notes.txt", "file_name": "notes.txt", "user_id": "u1", "content_type": "text/plain", "job_id": "job-1"}
+	ctx = download_stage.apply(args=[ctx]).get()
+	assert len(list(tmp_path.rglob("source"))) == 1
+	for stage in (extract_stage, chunk_stage, embed_stage, upsert_stage):
+		ctx = stage.apply(args=[ctx]).get()
+	assert set(ctx["timings"]) == {"download", "extract", "chunk", "embed", "upsert"}
+	result = finalize_stage.apply(args=[ctx]).get()
+
+	count = ctx["chunks"]["count"]
+	assert count > 1
+	assert pinecone.ids == [f"uploads/u1/notes.txt_chunk_{i}" for i in range(count)]
+	assert supabase.files["file-1"] == {"status": "processed", "chunks_count": count}
+	assert supabase.jobs["job-1"]["status"] == "completed"
+	assert supabase.jobs["job-1"]["upserted_chunks"] == count
+	assert result["status"] == "completed"
+	# Intermediate artifacts are removed once the file is finalized
+	assert [path for path in tmp_path.rglob("*") if path.is_file()] == []
+
+
+def test_stages_route_to_their_own_queues():
+	assert celery_app.amqp.router.route({}, "ingest.extract")["queue"].name == "ingest.extract"
+	assert celery_app.amqp.router.route({}, "ingest.embed")["queue"].name == "ingest.embed"
+
+	argv = worker_argv(["extract", "chunk"])
+	assert "--queues=ingest.extract.interactive,ingest.extract,ingest.chunk.interactive,ingest.chunk" in argv
+	assert "--concurrency=2" in argv and "--prefetch-multiplier=1" in argv
+
+
+def test_lanes_route_single_uploads_ahead_of_imports():
+	assert classify_ingest(100 * 1024) == "fast"
+	assert classify_ingest(5 * 1024 * 1024) == "interactive"
+	assert classify_ingest(20 * 1024 * 1024) == "bulk"
+	assert classify_ingest(100, bulk=True) == "bulk"
+
+	payload = {"file_key": "uploads/u1/a.txt", "file_name": "a.txt", "user_id": "u1"}
+	assert ingest_signature(payload, "fast").options["queue"] == "ingest.fast"
+	interactive = ingest_signature(payload, "interactive")
+	assert [task.options["queue"] for task in interactive.tasks][:2] == ["ingest.download.interactive", "ingest.extract.interactive"]
+	assert interactive.tasks[0].args[0]["lane"] == "interactive"
+
+	# With both lanes backed up, interactive queues come first in 4 of every 5 polls
+	cycle = WeightedLaneCycle()
+	cycle.update(["ingest.embed", "ingest.embed.interactive", "ingest.fast"])
+	leads = []
+	for _ in range(10):
+		first = cycle.consume(3)[0]
+		leads.append(first)
+		cycle.rotate(first)
+	assert sum(queue != "ingest.embed" for queue in leads) == 8
+	assert {"ingest.embed.interactive", "ingest.fast"} <= set(leads)
+
+
+@pytest.mark.parametrize("max_retries", [1, 0])
+def test_checkpointed_retry_keeps_the_job_and_its_fair_slot(tmp_path, monkeypatch, max_retries):
+	monkeypatch.setenv("EXTRACTED_TEXT_CACHE", "none")
+	monkeypatch.setenv("EXTRACTION_SANDBOX_ENABLED", "false")
+	monkeypatch.setenv("INGEST_MAX_RETRIES", str(max_retries))
+	monkeypatch.setattr(artifact_store, "_stage_store", LocalArtifactStore(str(tmp_path)))
+	monkeypatch.setattr(ingest_stages, "FairScheduler", FakeScheduler)
+	monkeypatch.setattr(FakeScheduler, "released", [])
+
+	async def pump_lane(lane):
+		return 0
+
+	monkeypatch.setattr(ingest_stages, "pump_lane", pump_lane)
+	supabase, pinecone = FakeSupabase(), FakePinecone(failures=1)
+	monkeypatch.setattr(registry, "_services", {"s3": FakeS3(), "supabase": supabase, "nim": FakeNIM(), "pinecone": pinecone})
+
+	ctx = {"file_key": "uploads/u1/notes.txt", "file_name": "notes.txt", "user_id": "u1", "content_type": "text/plain", "job_id": "job-1", "fair": True, "lane": "bulk"}
+	for stage in (download_stage, extract_stage, chunk_stage, embed_stage):
+		ctx = stage.apply(args=[ctx]).get()
+	# The first upsert attempt lands nothing; an eager retry runs straight away if one is allowed
+	upsert_stage.apply(args=[ctx])
+
+	if max_retries:
+		# While retrying, the job is still processing and holds its fair-scheduling lease
+		assert "failed" not in supabase.job_statuses and FakeScheduler.released == []
+		assert supabase.files["file-1"]["last_error"].startswith("ingest_incomplete")
+		assert pinecone.ids
+	else:
+		# Out of retries: only now is the job failed, the file in error and the lease freed
+		assert supabase.job_statuses[-1] == "failed" and supabase.files["file-1"]["status"] == "error"
+		assert FakeScheduler.released == ["job-1"]
+		assert [path for path in tmp_path.rglob("*") if path.is_file()] == []
+
+
+def test_fast_path_failure_before_extraction_fails_the_job_and_frees_its_slot(monkeypatch):
+	class MissingS3(FakeS3):
+		async def get_object_info(self, file_key):
+			return None
+
+	monkeypatch.setattr(ingest_stages, "FairScheduler", FakeScheduler)
+	monkeypatch.setattr(FakeScheduler, "released", [])
+
+	async def pump_lane(lane):
+		return 0
+
+	monkeypatch.setattr(ingest_stages, "pump_lane", pump_lane)
+	supabase = FakeSupabase()
+	monkeypatch.setattr(registry, "_services", {"s3": MissingS3(), "supabase": supabase, "nim": FakeNIM(), "pinecone": FakePinecone()})
+
+	payload = {"file_key": "uploads/u1/notes.txt", "file_name": "notes.txt", "user_id": "u1", "content_type": "text/plain", "job_id": "job-1", "fair": True, "lane": "fast"}
+	with pytest.raises(RuntimeError):
+		asyncio.run(_process_file(payload))
+	assert supabase.job_statuses == ["processing", "failed"]
+	assert FakeScheduler.released == ["job-1"]
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+from fakeredis import aioredis
+
+from app.models.file import JobStatusBatchRequest
+from app.routes import processing
+from app.services import job_events
+from app.services.job_events import JobEventHub, get_job_states, publish_job_event, stream_job_states
+
+
+@pytest.mark.asyncio
+async def test_stream_pushes_snapshots_until_the_job_completes():
+	redis = aioredis.FakeRedis()
+	hub = JobEventHub(redis=redis)
+	await publish_job_event("job-1", redis=redis, status="queued", user_id="u1")
+
+	received = []
+
+	async def consume():
+		async for state in stream_job_states("job-1", hub=hub, heartbeat_seconds=0.05):
+			received.append(state)
+
+	consumer = asyncio.create_task(consume())
+	# Let the hub subscribe before publishing
+	await asyncio.sleep(0.2)
+	await publish_job_event("job-1", redis=redis, status="processing")
+	await asyncio.sleep(0.1)
+	await publish_job_event("job-1", redis=redis, total_chunks=40, embedded_chunks=20, upserted_chunks=10)
+	await asyncio.sleep(0.1)
+	await publish_job_event("job-1", redis=redis, status="completed", upserted_chunks=40)
+	await asyncio.wait_for(consumer, timeout=2)
+	await hub.close()
+
+	states = [state for state in received if state is not None]
+	assert states[0]["status"] == "queued"
+	assert {"status": "processing", "total_chunks": 40, "upserted_chunks": 10}.items() <= states[-2].items()
+	assert states[-1]["status"] == "completed" and states[-1]["user_id"] == "u1"
+	assert hub.watchers == {}
+
+
+@pytest.mark.asyncio
+async def test_stream_ends_on_failed_but_not_on_a_retry():
+	redis = aioredis.FakeRedis()
+	hub = JobEventHub(redis=redis)
+	await publish_job_event("job-2", redis=redis, status="processing", user_id="u1")
+	stream = stream_job_states("job-2", hub=hub, heartbeat_seconds=0.05)
+	assert (await stream.__anext__())["status"] == "processing"
+
+	# A checkpointed retry only records the error; the stream stays open
+	await publish_job_event("job-2", redis=redis, status="processing", last_error="ingest_incomplete: 3 of 9 chunks")
+	state = None
+	while state is None:
+		state = await asyncio.wait_for(stream.__anext__(), timeout=2)
+	assert state["last_error"].startswith("ingest_incomplete")
+
+	await publish_job_event("job-2", redis=redis, status="failed")
+	states = [state async for state in stream if state is not None]
+	assert [state["status"] for state in states] == ["failed"]
+	await hub.close()
+
+
+class FakeSupabase:
+	def __init__(self):
+		self.calls = []
+
+	async def get_jobs_by_ids(self, job_ids, user_id):
+		self.calls.append(sorted(job_ids))
+		rows = {"c-3": {"id": "c-3", "user_id": "u1", "status": "completed"}}
+		return {job_id: rows[job_id] for job_id in job_ids if job_id in rows}
+
+
+@pytest.mark.asyncio
+async def test_batch_status_reads_live_state_before_the_database(monkeypatch):
+	redis, supabase = aioredis.FakeRedis(), FakeSupabase()
+	monkeypatch.setattr(job_events, "get_async_redis", lambda: redis)
+	monkeypatch.setattr(processing, "get_supabase_service", lambda: supabase)
+	await publish_job_event("a-1", redis=redis, status="processing", user_id="u1", total_chunks=10, upserted_chunks=5)
+	await publish_job_event("b-2", redis=redis, status="processing", user_id="u2")
+
+	request = JobStatusBatchRequest(job_ids=["a-1", "b-2", "c-3", "a-1", "d-4"])
+	response = await processing.get_processing_status_batch(request, current_user="u1")
+
+	assert supabase.calls == [["b-2", "c-3", "d-4"]]
+	assert [(job["job_id"], job["status"], job["percent_complete"]) for job in response["jobs"]] == [
+		("a-1", "processing", 50.0), ("c-3", "completed", 100.0),
+	]
+	# Another user's job is indistinguishable from an unknown one
+	assert response["missing"] == ["b-2", "d-4"]
+	assert (await get_job_states(["b-2"], redis=redis))["b-2"]["user_id"] == "u2"
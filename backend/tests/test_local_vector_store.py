@@ -0,0 +1,67 @@
+import numpy as np
+
+from app.services.exact_search import MetadataColumns, top_k_indices
+from app.services.local_vector_store import LocalVectorStore
+
+DIM = 8
+
+
+def _vector(user_id, i, **metadata):
+	rng = np.random.default_rng(i)
+	file_key = metadata.pop("file_key", f"uploads/{user_id}/notes.txt")
+	return {
+		"id": f"{file_key}_chunk_{i}",
+		"embedding": rng.standard_normal(DIM).tolist(),
+		"metadata": {"user_id": user_id, "file_key": file_key, "chunk_index": i, **metadata},
+	}
+
+
+def test_top_k_matches_a_full_sort():
+	scores = np.random.default_rng(0).standard_normal(1000).astype(np.float32)
+	mask = scores > -0.5
+	expected = [i for i in np.argsort(-scores) if mask[i]][:10]
+	assert top_k_indices(scores, mask, 10).tolist() == expected
+	assert top_k_indices(scores, np.zeros(1000, dtype=bool), 10).tolist() == []
+
+
+def test_metadata_filters_follow_the_pinecone_operators():
+	columns = MetadataColumns([{"k": "a", "n": 1}, {"k": "b", "n": 5}, {"n": 9}, None])
+	assert columns.mask({"k": {"$eq": "a"}}).tolist() == [True, False, False, False]
+	assert columns.mask({"k": {"$ne": "a"}}).tolist() == [False, True, True, True]
+	assert columns.mask({"k": {"$in": ["a", "b"]}}).tolist() == [True, True, False, False]
+	assert columns.mask({"k": {"$nin": ["b", "z"]}}).tolist() == [True, False, True, True]
+	assert columns.mask({"n": {"$gt": 1, "$lte": 9}}).tolist() == [False, True, True, False]
+	assert columns.mask({"n": {"$lt": "5"}}).tolist() == [False, False, False, False]
+
+
+def test_upsert_search_and_delete_in_per_user_partitions(tmp_path):
+	store = LocalVectorStore(embedding_dimension=DIM, directory=str(tmp_path))
+	vectors = [_vector("u1", i) for i in range(20)] + [_vector("u2", i, file_key="uploads/u2/other.pdf") for i in range(5)]
+	result = store.upsert_vectors(vectors + [{"id": "bad", "embedding": [0.0] * 3, "metadata": {}}])
+	assert (result["accepted"], result["failed_ids"]) == (25, ["bad"])
+
+	# A stored vector is its own best match, and only the user's partition is searched
+	matches = store.search_similar(vectors[3]["embedding"], top_k=3, user_id="u1")
+	assert matches[0]["id"] == vectors[3]["id"] and abs(matches[0]["score"] - 1.0) < 1e-5
+	assert len(matches) == 3 and all(match["metadata"]["user_id"] == "u1" for match in matches)
+	filtered = store.search_similar(vectors[3]["embedding"], top_k=20, filter_dict={"user_id": "u1", "chunk_index": {"$gte": 15}})
+	assert sorted(match["metadata"]["chunk_index"] for match in filtered) == [15, 16, 17, 18, 19]
+	assert {match["metadata"]["user_id"] for match in store.search_similar(vectors[3]["embedding"], top_k=25)} == {"u1", "u2"}
+
+	# Re-upserting an id overwrites it in place; deletes are visible immediately
+	moved = dict(vectors[0], embedding=vectors[1]["embedding"])
+	store.upsert_vectors([moved])
+	assert store.delete_vectors([vectors[1]["id"]], user_id="u1")
+	matches = store.search_similar(vectors[1]["embedding"], top_k=1, user_id="u1")
+	assert matches[0]["id"] == vectors[0]["id"] and abs(matches[0]["score"] - 1.0) < 1e-5
+	assert store.get_index_stats()["namespaces"] == {"u1": {"vector_count": 19}, "u2": {"vector_count": 5}}
+
+	# Another instance (e.g. another worker process) reads the same files
+	reopened = LocalVectorStore(embedding_dimension=DIM, directory=str(tmp_path))
+	assert reopened.get_index_stats()["total_vector_count"] == 24
+	reopened.upsert_vectors([_vector("u1", 100 + i) for i in range(2000)])
+	assert store.get_index_stats()["namespaces"]["u1"] == {"vector_count": 2019}
+
+	assert store.delete_user_vectors("u2")
+	assert reopened.search_similar(vectors[-1]["embedding"], user_id="u2") == []
+	assert set(reopened.get_index_stats()["namespaces"]) == {"u1"}
@@ -1,4 +1,8 @@
+import json
+import asyncio
+import httpx
 import pytest
+from app.services import nim_service as nim_module
 from app.services.nim_service import NIMService
 
 @pytest.mark.asyncio
@@ -7,4 +11,71 @@ async def test_parse_embedding_response_numeric_list(monkeypatch):
 	content = "[0.1, 0.2, 0.3]"
 	vec = service._parse_embedding_response(content)
 	assert isinstance(vec, list)
-	assert len(vec) == 3
\ No newline at end of file
+	assert len(vec) == 3
+
+def test_plan_embedding_batches_respects_item_and_token_limits(monkeypatch):
+	service = NIMService()
+	service.embed_batch_max_items = 3
+	service.embed_batch_max_tokens = 100
+	items = [(i, "x" * 40) for i in range(7)] + [(7, "y" * 380)]
+	batches = service._plan_embedding_batches(items)
+	assert [[i for i, _ in b] for b in batches] == [[0, 1, 2], [3, 4, 5], [6], [7]]
+
+
+@pytest.mark.asyncio
+async def test_generate_embeddings_batch_packs_inputs_and_keeps_failures_as_none(monkeypatch):
+	service = NIMService()
+	service.cache = None
+	service.embed_batch_max_items = 2
+	calls = []
+
+	async def fake_request(inputs, input_type="query", max_retries=2):
+		calls.append(list(inputs))
+		return [None if text == "bad" else [float(len(text))] for text in inputs]
+
+	monkeypatch.setattr(service, "_request_embeddings", fake_request)
+	results = await service.generate_embeddings_batch(["a", "bad", "ccc", "", "dddd"])
+	assert calls == [["a", "bad"], ["ccc", "dddd"]]
+	assert results == [[1.0], None, [3.0], None, [4.0]]
+
+
+@pytest.mark.asyncio
+async def test_request_embeddings_maps_response_indices_through_shared_client(monkeypatch):
+	def handler(request):
+		inputs = json.loads(request.content)["input"]
+		data = [{"index": i, "embedding": [float(len(t))]} for i, t in enumerate(inputs)]
+		return httpx.Response(200, json={"data": list(reversed(data))})
+
+	client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+	monkeypatch.setattr(nim_module, "get_http_client", lambda: client)
+	service = NIMService()
+	try:
+		assert await service._request_embeddings(["a", "bb", "ccc"]) == [[1.0], [2.0], [3.0]]
+	finally:
+		await client.aclose()
+
+
+def test_http_clients_are_kept_per_loop_and_all_closed_on_shutdown(monkeypatch):
+	monkeypatch.setenv("NIM_HTTP2", "false")
+
+	async def get_client():
+		return nim_module.get_http_client()
+
+	# e.g. a worker thread's persistent loop, alternating with another loop
+	worker_loop = asyncio.new_event_loop()
+	worker_client = worker_loop.run_until_complete(get_client())
+
+	async def shutdown():
+		own = nim_module.get_http_client()
+		assert own is not worker_client
+		await nim_module.close_http_client()
+		return own
+
+	try:
+		own = asyncio.run(shutdown())
+		assert own.is_closed and not worker_client.is_closed
+		# The worker loop's client is closed the next time that loop runs
+		worker_loop.run_until_complete(asyncio.sleep(0.05))
+		assert worker_client.is_closed
+	finally:
+		worker_loop.close()
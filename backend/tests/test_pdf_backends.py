@@ -0,0 +1,45 @@
+import pytest
+from app.services.pdf_backends import PdfBackend, PdfDocument, get_pdf_backends, iter_page_texts
+
+
+class _FakeDocument(PdfDocument):
+	def __init__(self, name, pages, fail_on):
+		self.name = name
+		self.page_count = pages
+		self.fail_on = fail_on
+
+	def page_text(self, page_number):
+		if page_number in self.fail_on:
+			raise RuntimeError("broken page")
+		return f"{self.name}:{page_number}" if page_number != 2 else ""
+
+
+class _FakeBackend(PdfBackend):
+	def __init__(self, name, fail_on=(), fail_open=False):
+		self.name = name
+		self.fail_on = set(fail_on)
+		self.fail_open = fail_open
+
+	def open(self, file_path):
+		if self.fail_open:
+			raise ValueError("cannot parse")
+		return _FakeDocument(self.name, 5, self.fail_on)
+
+
+def test_failed_page_switches_the_rest_of_the_document_to_the_next_backend():
+	backends = [_FakeBackend("fast", fail_on={3}), _FakeBackend("safe", fail_on={4})]
+	# Empty pages are dropped; the last backend skips pages it cannot read
+	assert list(iter_page_texts("doc.pdf", backends=backends)) == ["fast:0", "fast:1", "safe:3"]
+
+
+def test_backend_that_cannot_open_falls_through_and_last_error_is_raised():
+	backends = [_FakeBackend("fast", fail_open=True), _FakeBackend("safe")]
+	assert list(iter_page_texts("doc.pdf", start=3, backends=backends)) == ["safe:3", "safe:4"]
+	with pytest.raises(ValueError):
+		list(iter_page_texts("doc.pdf", backends=[_FakeBackend("fast", fail_open=True)]))
+
+
+def test_get_pdf_backends_skips_unknown_and_missing_engines():
+	names = [backend.name for backend in get_pdf_backends("nonexistent, pypdf2")]
+	assert names == ["pypdf2"]
+	assert get_pdf_backends("nonexistent")[0].name == "pypdf2"
@@ -0,0 +1,88 @@
+from types import SimpleNamespace
+
+from app.services.namespace_migration import NamespaceMigrator
+from app.services.pinecone_service import PineconeService
+
+DIM = 4
+
+
+class FakeIndex:
+	def __init__(self):
+		self.namespaces = {}
+		self.queries = []
+
+	def upsert(self, vectors, namespace=""):
+		for vector in vectors:
+			self.namespaces.setdefault(namespace, {})[vector["id"]] = vector
+		return {"upserted_count": len(vectors)}
+
+	def query(self, vector, top_k, include_metadata, filter, namespace=""):
+		self.queries.append(namespace)
+		return SimpleNamespace(matches=[
+			SimpleNamespace(id=vector_id, score=1.0, metadata=record["metadata"])
+			for vector_id, record in self.namespaces.get(namespace, {}).items()
+		][:top_k])
+
+	def list_paginated(self, prefix=None, limit=100, pagination_token=None, namespace=""):
+		# Like Pinecone, the token is a position in id order, so deletes do not shift later pages
+		ids = sorted(i for i in self.namespaces.get(namespace, {}) if (not prefix or i.startswith(prefix)) and i > (pagination_token or ""))
+		page = ids[:limit]
+		return {"vectors": [{"id": i} for i in page], "pagination": {"next": page[-1]} if len(ids) > limit else None}
+
+	def fetch(self, ids, namespace=""):
+		records = self.namespaces.get(namespace, {})
+		return {"vectors": {i: {"values": records[i]["values"], "metadata": records[i]["metadata"]} for i in ids if i in records}}
+
+	def delete(self, ids=None, delete_all=False, namespace=""):
+		if delete_all:
+			self.namespaces.pop(namespace, None)
+		for i in ids or []:
+			self.namespaces.get(namespace, {}).pop(i, None)
+
+
+def _service(index):
+	service = object.__new__(PineconeService)
+	service.index = index
+	service.embedding_dimension = DIM
+	return service
+
+
+def _vector(user_id, i):
+	file_key = f"uploads/{user_id}/notes.txt"
+	return {"id": f"{file_key}_chunk_{i}", "embedding": [0.1] * DIM, "metadata": {"user_id": user_id, "file_key": file_key, "text": "t"}}
+
+
+def test_migrating_mode_dual_writes_and_per_user_mode_reads_the_user_namespace(monkeypatch):
+	index = FakeIndex()
+	service = _service(index)
+	monkeypatch.setenv("PINECONE_NAMESPACE_MODE", "migrating")
+	result = service.upsert_vectors([_vector("u1", 0), _vector("u2", 0)])
+	assert result["accepted"] == 2 and result["failed_ids"] == []
+	assert set(index.namespaces) == {"", "user-u1", "user-u2"} and len(index.namespaces[""]) == 2
+
+	service.search_similar([0.1] * DIM, top_k=5, filter_dict={"user_id": "u1"}, user_id="u1")
+	monkeypatch.setenv("PINECONE_NAMESPACE_MODE", "per_user")
+	matches = service.search_similar([0.1] * DIM, top_k=5, filter_dict={"user_id": "u1"}, user_id="u1")
+	assert index.queries == ["", "user-u1"]
+	assert [match["metadata"]["user_id"] for match in matches] == ["u1"]
+
+	# Deleting a user drops their namespace
+	assert service.delete_user_vectors("u2")
+	assert "user-u2" not in index.namespaces
+
+
+def test_migration_copies_the_shared_namespace_into_user_namespaces(monkeypatch):
+	index = FakeIndex()
+	service = _service(index)
+	service.upsert_vectors([_vector(user_id, i) for user_id in ("u1", "u2", "u3") for i in range(25)])
+	index.upsert([{"id": "legacy", "values": [0.0] * DIM, "metadata": {}}])
+
+	stats = NamespaceMigrator(service, workers=3, page_size=10).migrate()
+	assert (stats["listed"], stats["pages"], stats["copied"], stats["orphaned"], stats["failed"]) == (76, 8, 75, 1, 0)
+	assert {ns: len(vectors) for ns, vectors in index.namespaces.items()} == {"": 76, "user-u1": 25, "user-u2": 25, "user-u3": 25}
+
+	# A single user can be migrated (and removed from the shared namespace) by id prefix
+	monkeypatch.setenv("PINECONE_USER_NAMESPACE_PREFIX", "tenant-")
+	stats = NamespaceMigrator(service, workers=2, page_size=10, delete_source=True).migrate(user_id="u2")
+	assert (stats["copied"], stats["deleted"]) == (25, 25)
+	assert len(index.namespaces["tenant-u2"]) == 25 and len(index.namespaces[""]) == 51
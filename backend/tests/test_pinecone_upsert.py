@@ -0,0 +1,68 @@
+import threading
+import time
+
+from app.services.pinecone_service import PineconeService, estimate_upsert_bytes, pack_upsert_batches
+
+DIM = 8
+
+
+class FakeIndex:
+	def __init__(self, fail_once=(), fail_always=()):
+		self.fail_once = set(fail_once)
+		self.fail_always = set(fail_always)
+		self.sent = []
+		self.in_flight = self.max_in_flight = 0
+		self.lock = threading.Lock()
+
+	def upsert(self, vectors, namespace=""):
+		first = vectors[0]["id"]
+		with self.lock:
+			self.sent.append(first)
+			self.in_flight += 1
+			self.max_in_flight = max(self.max_in_flight, self.in_flight)
+		try:
+			time.sleep(0.05)
+			if first in self.fail_always or first in self.fail_once:
+				self.fail_once.discard(first)
+				raise ConnectionError(f"upsert of {first} failed")
+			return {"upserted_count": len(vectors)}
+		finally:
+			with self.lock:
+				self.in_flight -= 1
+
+
+def _service(index):
+	service = object.__new__(PineconeService)
+	service.index = index
+	service.embedding_dimension = DIM
+	return service
+
+
+def _vectors(count, text="x" * 400):
+	return [{"id": f"v{i}", "embedding": [0.5] * DIM, "metadata": {"user_id": "u1", "file_key": "k", "text": text}} for i in range(count)]
+
+
+def test_batches_are_packed_by_request_bytes():
+	vectors = [{"id": v["id"], "values": v["embedding"], "metadata": v["metadata"]} for v in _vectors(10)]
+	size = estimate_upsert_bytes(vectors[0])
+	batches = list(pack_upsert_batches(vectors, max_bytes=3 * size, max_count=1000))
+	assert [len(batch) for batch in batches] == [3, 3, 3, 1]
+	assert [len(batch) for batch in pack_upsert_batches(vectors, max_bytes=10**6, max_count=4)] == [4, 4, 2]
+
+
+def test_parallel_upsert_retries_only_failed_batches(monkeypatch):
+	monkeypatch.setenv("PINECONE_UPSERT_CONCURRENCY", "4")
+	monkeypatch.setattr(PineconeService._upsert_batch.retry, "sleep", lambda seconds: None)
+	vectors = _vectors(12)
+	size = estimate_upsert_bytes({"id": "v0", "values": vectors[0]["embedding"], "metadata": vectors[0]["metadata"]})
+	monkeypatch.setenv("PINECONE_UPSERT_MAX_BYTES", str(2 * size + 16))
+	index = FakeIndex(fail_once={"v2"}, fail_always={"v8"})
+
+	result = _service(index).upsert_vectors(vectors)
+
+	assert index.max_in_flight > 1
+	# v2's batch succeeds on its second attempt, v8's is given up after three; the others go once
+	assert sorted(index.sent) == sorted(["v0", "v2", "v2", "v4", "v6", "v8", "v8", "v8", "v10"])
+	assert result["accepted"] == 10
+	assert result["failed_ids"] == ["v8", "v9"]
+	assert len(result["errors"]) == 1 and result["errors"][0].startswith("batch[5]")
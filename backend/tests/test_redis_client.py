@@ -0,0 +1,38 @@
+import asyncio
+
+from app.services import redis_client
+
+
+class FakeAsyncRedis:
+	def __init__(self):
+		self.closed_on = None
+
+	async def aclose(self):
+		self.closed_on = asyncio.get_running_loop()
+
+
+def test_async_clients_are_kept_per_loop_and_all_closed_on_shutdown(monkeypatch):
+	monkeypatch.setattr(redis_client.aioredis.Redis, "from_url", staticmethod(lambda url: FakeAsyncRedis()))
+
+	async def get_client():
+		return redis_client.get_async_redis()
+
+	# e.g. a worker thread's persistent loop, alternating with another loop
+	worker_loop = asyncio.new_event_loop()
+	worker_client = worker_loop.run_until_complete(get_client())
+	assert worker_loop.run_until_complete(get_client()) is worker_client
+
+	async def shutdown():
+		own = redis_client.get_async_redis()
+		assert own is not worker_client
+		await redis_client.close_async_redis()
+		return own, asyncio.get_running_loop()
+
+	try:
+		own, own_loop = asyncio.run(shutdown())
+		assert own.closed_on is own_loop and worker_client.closed_on is None
+		# The worker loop's client is closed the next time that loop runs
+		worker_loop.run_until_complete(asyncio.sleep(0.05))
+		assert worker_client.closed_on is worker_loop
+	finally:
+		worker_loop.close()
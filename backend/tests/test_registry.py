@@ -0,0 +1,43 @@
+from app.services.registry import ServiceRegistry
+
+
+def test_registry_builds_each_service_once_and_refresh_rebuilds():
+	registry = ServiceRegistry()
+	built = []
+	registry._factories["pinecone"] = lambda: built.append("pinecone") or object()
+	first = registry.pinecone
+	assert registry.pinecone is first
+	assert built == ["pinecone"]
+	assert registry.refresh("pinecone") is not first
+	assert built == ["pinecone", "pinecone"]
+
+
+def test_registry_startup_reports_failures_without_raising():
+	registry = ServiceRegistry()
+	registry._factories["s3"] = lambda: object()
+
+	def broken():
+		raise ValueError("index unavailable")
+
+	registry._factories["pinecone"] = broken
+	assert registry.startup(["s3", "pinecone"]) == {"s3": True, "pinecone": False}
+
+
+def test_revalidate_endpoint_needs_the_operator_key(monkeypatch):
+	from fastapi import FastAPI
+	from fastapi.testclient import TestClient
+
+	from app.routes import query
+
+	app = FastAPI()
+	app.include_router(query.router)
+	client = TestClient(app)
+	monkeypatch.delenv("BACKEND_API_KEY", raising=False)
+	monkeypatch.setattr(query.registry, "revalidate", lambda: {"index_name": "idx", "ready": True})
+
+	monkeypatch.delenv("OPERATOR_API_KEY", raising=False)
+	assert client.post("/health/revalidate").status_code == 403
+	monkeypatch.setenv("OPERATOR_API_KEY", "ops-secret")
+	assert client.post("/health/revalidate", headers={"X-Operator-Key": "wrong"}).status_code == 401
+	response = client.post("/health/revalidate", headers={"X-Operator-Key": "ops-secret"})
+	assert response.status_code == 200 and response.json() == {"pinecone": {"index_name": "idx", "ready": True}}
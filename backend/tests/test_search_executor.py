@@ -0,0 +1,66 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import pinecone_service as pinecone_module
+from app.services.pinecone_service import PineconeService
+from app.services.search_executor import BoundedExecutor, SearchBusyError
+
+
+@pytest.mark.asyncio
+async def test_bounded_executor_rejects_beyond_its_queue():
+	executor = BoundedExecutor("test-search", workers=1, max_queue=1)
+	calls = [asyncio.create_task(executor.run(time.sleep, 0.2)) for _ in range(2)]
+	await asyncio.sleep(0.05)
+	assert executor.metrics()["queue_depth"] == 1 and executor.metrics()["running"] == 1
+	with pytest.raises(SearchBusyError):
+		await executor.run(time.sleep, 0.2)
+	await asyncio.gather(*calls)
+
+	metrics = executor.metrics()
+	assert (metrics["submitted"], metrics["completed"], metrics["rejected"], metrics["max_queue_depth"]) == (2, 2, 1, 1)
+	assert metrics["queue_depth"] == 0 and metrics["avg_wait_ms"] > 50
+	executor.shutdown()
+
+
+class FlakyIndex:
+	def __init__(self):
+		self.calls = 0
+
+	def query(self, vector, top_k, include_metadata, filter, namespace=""):
+		self.calls += 1
+		time.sleep(0.1)
+		if self.calls == 1:
+			raise ConnectionError("transient")
+		return SimpleNamespace(matches=[SimpleNamespace(id="k_chunk_0", score=0.9, metadata={"user_id": "u1"})])
+
+
+@pytest.mark.asyncio
+async def test_async_search_keeps_the_loop_free_through_retries(monkeypatch):
+	executor = BoundedExecutor("test-search", workers=2, max_queue=4)
+	monkeypatch.setattr(pinecone_module, "get_search_executor", lambda: executor)
+	service = object.__new__(PineconeService)
+	service.index = FlakyIndex()
+	service.embedding_dimension = 4
+
+	ticks = 0
+
+	async def ticker():
+		nonlocal ticks
+		while True:
+			await asyncio.sleep(0.01)
+			ticks += 1
+
+	ticking = asyncio.create_task(ticker())
+	started = time.monotonic()
+	matches = await service.search_similar_async([0.1] * 4, top_k=3, filter_dict={"user_id": "u1"})
+	elapsed = time.monotonic() - started
+	ticking.cancel()
+
+	assert [match["id"] for match in matches] == ["k_chunk_0"]
+	assert service.index.calls == 2
+	# The 1s backoff and both queries ran while the loop kept ticking
+	assert elapsed >= 1.0 and ticks >= 0.5 * elapsed / 0.01
+	executor.shutdown()
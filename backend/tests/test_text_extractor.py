@@ -1,9 +1,35 @@
 import os
 import tempfile
+import billiard
 import pytest
+from app.services import text_extractor
+from app.services.extraction_sandbox import ExtractionSandbox
 from app.services.text_extractor import TextExtractor
 
 
+def _write_pdf(path, page_texts):
+	"""Write a minimal multi-page PDF with one line of Helvetica text per page"""
+	objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+	kids = []
+	for text in page_texts:
+		stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+		objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+		objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+		kids.append(f"{len(objects)} 0 R")
+	objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+	out = b"%PDF-1.4\n"
+	offsets = []
+	for number, body in enumerate(objects, start=1):
+		offsets.append(len(out))
+		out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+	xref = len(out)
+	out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+	out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+	out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+	with open(path, "wb") as f:
+		f.write(out)
+
+
 def test_chunk_text_basic():
 	text = "This is a sentence. Another sentence! And a third one?" * 50
 	chunks = TextExtractor.chunk_text(text, chunk_size=100, overlap=20)
@@ -19,4 +45,74 @@ def test_extract_text_from_txt():
 		content = TextExtractor.extract_text_from_txt(path)
 		assert content == 'hello world'
 	finally:
-		os.unlink(path)
\ No newline at end of file
+		os.unlink(path)
+
+def test_iter_text_streams_txt_blocks():
+	with tempfile.NamedTemporaryFile(delete=False, suffix='.txt', mode='w', encoding='utf-8') as f:
+		f.write('x' * 70000)
+		path = f.name
+	try:
+		blocks = list(TextExtractor.iter_text(path, 'text/plain'))
+		assert len(blocks) == 2
+		assert "".join(blocks) == 'x' * 70000
+	finally:
+		os.unlink(path)
+
+
+def test_parallel_pdf_extraction_matches_serial(tmp_path):
+	path = str(tmp_path / "doc.pdf")
+	_write_pdf(path, [f"Page {i} says hello." for i in range(12)])
+	serial = list(TextExtractor.iter_pdf_pages(path, workers=1))
+	parallel = list(TextExtractor.iter_pdf_pages(path, workers=2, parallel_min_pages=2))
+	assert len(serial) == 12
+	assert "Page 3 says hello." in serial[3]
+	assert parallel == serial
+
+
+def _extract_pdf_in_worker(path):
+	# Forget any pool an earlier test left in the forking parent
+	text_extractor._pdf_pool = None
+	warnings = []
+	text_extractor.logger.warning = warnings.append
+	direct = list(TextExtractor.iter_pdf_pages(path, workers=2, parallel_min_pages=2))
+	pool_tried = text_extractor._pdf_pool is not None or bool(warnings)
+	# The sandbox child is a regular process, so it may use the page pool
+	os.environ.update(PDF_EXTRACT_WORKERS="2", PDF_PARALLEL_MIN_PAGES="2")
+	sandbox = ExtractionSandbox(timeout_seconds=60, cpu_seconds=30, memory_mb=0)
+	try:
+		sandboxed = list(sandbox.extract(path, "application/pdf"))
+	finally:
+		sandbox.close()
+	return direct, pool_tried, sandboxed
+
+
+def test_pdf_extraction_in_a_daemonic_prefork_worker(tmp_path):
+	path = str(tmp_path / "doc.pdf")
+	_write_pdf(path, [f"Page {i} says hello." for i in range(12)])
+	serial = [page + "\n" for page in TextExtractor.iter_pdf_pages(path, workers=1)]
+	pool = billiard.Pool(1)
+	try:
+		direct, pool_tried, sandboxed = pool.apply(_extract_pdf_in_worker, (path,))
+	finally:
+		pool.terminate()
+		pool.join()
+	assert [page + "\n" for page in direct] == serial and not pool_tried
+	assert sandboxed == serial
+
+
+def test_iter_docx_paragraphs_streams_paragraphs_and_tables_in_order(tmp_path):
+	import docx
+	document = docx.Document()
+	document.add_paragraph("Before the table.")
+	table = document.add_table(rows=2, cols=2)
+	table.cell(0, 0).text = "name"
+	table.cell(0, 1).text = "value"
+	table.cell(1, 0).text = "latency"
+	table.cell(1, 1).text = "12 ms"
+	document.add_paragraph("After the table.")
+	path = tmp_path / "report.docx"
+	document.save(str(path))
+
+	segments = list(TextExtractor.iter_docx_paragraphs(str(path)))
+	assert segments == ["Before the table.\n", "name | value\n", "latency | 12 ms\n", "After the table.\n"]
+	assert TextExtractor.extract_text_from_docx(str(path)) == "".join(segments).strip()
@@ -0,0 +1,110 @@
+import asyncio
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+from fakeredis import aioredis
+
+from app.services import vector_cache
+from app.services.pinecone_service import PineconeService
+from app.services.vector_cache import TenantVectorCache, _CachedTenant
+
+DIM = 4
+
+
+class FakeIndex:
+	def __init__(self):
+		self.vectors = {}
+		self.queries = 0
+
+	def upsert(self, vectors, namespace=""):
+		for vector in vectors:
+			self.vectors[vector["id"]] = vector
+		return {"upserted_count": len(vectors)}
+
+	def query(self, vector, top_k, include_metadata, filter, namespace=""):
+		self.queries += 1
+		user_id = filter["user_id"]["$eq"]
+		return SimpleNamespace(matches=[
+			SimpleNamespace(id=vector_id, score=0.5, metadata=record["metadata"])
+			for vector_id, record in self.vectors.items() if record["metadata"]["user_id"] == user_id
+		][:top_k])
+
+	def list(self, prefix=None, namespace=""):
+		ids = sorted(i for i in self.vectors if i.startswith(prefix or ""))
+		for start in range(0, len(ids), 2):
+			yield ids[start:start + 2]
+
+	def fetch(self, ids, namespace=""):
+		return {"vectors": {i: {"values": self.vectors[i]["values"], "metadata": self.vectors[i]["metadata"]} for i in ids}}
+
+
+def _vector(user_id, i, values):
+	file_key = f"uploads/{user_id}/notes.txt"
+	return {"id": f"{file_key}_chunk_{i}", "embedding": values, "metadata": {"user_id": user_id, "file_key": file_key, "text": f"chunk {i}"}}
+
+
+@pytest.fixture
+def redis(monkeypatch):
+	server = fakeredis.FakeServer()
+	monkeypatch.setattr(vector_cache, "get_redis", lambda: fakeredis.FakeRedis(server=server))
+	monkeypatch.setattr(vector_cache, "get_async_redis", lambda: aioredis.FakeRedis(server=server))
+	yield fakeredis.FakeRedis(server=server)
+	vector_cache.shutdown_vector_cache()
+
+
+def test_entries_are_evicted_least_recently_used_by_bytes():
+	vectors = [(f"v{i}", [1.0] * DIM, {"user_id": "u"}) for i in range(10)]
+	size = _CachedTenant("u", "1", vectors).nbytes
+	cache = TenantVectorCache(loader=None, max_bytes=2 * size)
+	for user_id in ("a", "b"):
+		assert cache.put(_CachedTenant(user_id, "1", vectors))
+	assert cache.get("a", "1") is not None
+	cache.put(_CachedTenant("c", "1", vectors))
+	assert cache.get("b", "1") is None and cache.get("a", "1") is not None
+	# A version mismatch drops the entry
+	assert cache.get("a", "2") is None and cache.get("a", "1") is None
+	assert not cache.put(_CachedTenant("big", "1", vectors * 3))
+	metrics = cache.metrics()
+	assert (metrics["users"], metrics["evictions"], metrics["stale"], metrics["oversized"]) == (1, 1, 1, 1)
+	cache.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_cached_users_are_searched_in_memory_until_their_version_changes(monkeypatch, redis):
+	monkeypatch.setenv("VECTOR_CACHE_MAX_MB", "1")
+	monkeypatch.setenv("VECTOR_CACHE_SETTLE_SECONDS", "0")
+	index = FakeIndex()
+	service = object.__new__(PineconeService)
+	service.index = index
+	service.embedding_dimension = DIM
+	service.upsert_vectors([_vector("u1", i, [1.0, float(i), 0.0, 0.0]) for i in range(5)] + [_vector("u2", 0, [1.0, 0.0, 0.0, 0.0])])
+	assert redis.get("vector-cache:version:u1") is not None
+
+	async def search(query=(1.0, 4.0, 0.0, 0.0)):
+		return await service.search_similar_async(list(query), top_k=2, filter_dict={"user_id": "u1"}, user_id="u1")
+
+	async def loaded():
+		for _ in range(100):
+			if vector_cache.get_vector_cache(None).metrics()["loading"] == 0:
+				return
+			await asyncio.sleep(0.01)
+
+	# A miss goes to Pinecone and loads the user in the background; later searches stay local
+	await search()
+	await loaded()
+	matches = await search()
+	assert index.queries == 1
+	assert [match["id"] for match in matches] == ["uploads/u1/notes.txt_chunk_4", "uploads/u1/notes.txt_chunk_3"]
+	assert matches[0]["score"] == pytest.approx(1.0)
+	file_matches = await service.search_similar_async([1.0, 4.0, 0.0, 0.0], top_k=10, filter_dict={"user_id": "u1", "file_key": {"$in": ["other"]}}, user_id="u1")
+	assert file_matches == [] and index.queries == 1
+
+	# Ingest bumps the user's version: the cached copy is dropped and reloaded with the new vector
+	service.upsert_vectors([_vector("u1", 9, [0.0, 1.0, 0.0, 0.0])])
+	await search()
+	assert index.queries == 2
+	await loaded()
+	assert [match["id"] for match in await search((0.0, 1.0, 0.0, 0.0))][0] == "uploads/u1/notes.txt_chunk_9"
+	assert index.queries == 2
+	assert vector_cache.get_vector_cache(None).metrics()["loads"] == 2
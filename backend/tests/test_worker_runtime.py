@@ -0,0 +1,12 @@
+import asyncio
+from app.tasks.worker_runtime import get_worker_loop, run_async
+
+
+def test_run_async_reuses_one_event_loop():
+	async def current_loop():
+		return asyncio.get_running_loop()
+
+	first = run_async(current_loop())
+	second = run_async(current_loop())
+	assert first is second is get_worker_loop()
+	assert not first.is_closed()